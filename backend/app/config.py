@@ -29,11 +29,43 @@ class Settings(BaseSettings):
     # Ollama VLM
     ollama_url: str = "http://localhost:11434"
     ollama_model: str = "llava:7b"
+    ollama_timeout_seconds: float = 60.0  # Read timeout for a generate call
+    ollama_connect_timeout_seconds: float = 5.0
+    ollama_health_timeout_seconds: float = 5.0
 
     # Gemini VLM (backend-managed for mobile clients)
     gemini_api_key: Optional[str] = None
     gemini_model: str = "gemini-2.5-flash"
     gemini_fallback_model: str = "gemini-flash-latest"
+    gemini_timeout_seconds: float = 45.0  # Read timeout for a generateContent call
+    gemini_connect_timeout_seconds: float = 15.0
+    gemini_http2: bool = True  # Multiplex Gemini requests over one HTTP/2 connection (needs httpx[http2])
+    
+    # Shared upstream HTTP clients (one connection pool per upstream)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 60.0  # Idle pooled connections are closed after this
+    oauth_timeout_seconds: float = 10.0  # Google OAuth token/userinfo requests
+    vision_stream_max_sentence_chars: int = 240  # Streamed run-on text is split at a space past this length
+    vision_routing_policy: str = "hedged"  # sequential (Ollama after Gemini fails), hedged, or race (both at once)
+    vision_hedge_delay_seconds: float = 4.0  # Hedge delay until enough Gemini latencies are recorded
+    vision_hedge_percentile: float = 95.0  # Hedge once Gemini is slower than this latency percentile
+    vision_hedge_min_delay_seconds: float = 1.0
+    vision_hedge_max_delay_seconds: float = 10.0
+    vision_latency_window: int = 100  # Recent Gemini latencies kept for the percentile
+    vision_breaker_window: int = 20  # Recent calls per engine/model the circuit breaker looks at
+    vision_breaker_min_calls: int = 5  # Calls needed in the window before the breaker can open
+    vision_breaker_failure_rate: float = 0.5  # Open when this fraction of windowed calls failed
+    vision_breaker_slow_call_seconds: float = 20.0  # Successful calls slower than this count as slow
+    vision_breaker_slow_call_rate: float = 0.8  # Open when this fraction of windowed calls were slow
+    vision_breaker_open_seconds: float = 30.0  # First cool-down before a half-open probe
+    vision_breaker_max_open_seconds: float = 300.0  # Cool-down doubles after failed probes, up to this
+    gemini_missing_model_ttl_seconds: float = 3600.0  # Skip a model that returned 404 for this long
+    response_cache_enabled: bool = True  # Reuse vision results for near-identical frames and the same prompt
+    response_cache_ttl_seconds: float = 15.0  # Cached scene descriptions go stale quickly
+    response_cache_max_distance: int = 4  # Max dHash Hamming distance (of 64 bits) for a hit
+    response_cache_max_entries: int = 2000
+    response_cache_max_bytes: int = 8388608  # 8MB (approximate JSON size of cached results)
     
     # Frontend URL (for email links)
     frontend_url: str = "http://localhost:5173"
@@ -50,6 +82,49 @@ class Settings(BaseSettings):
     # File uploads
     max_file_size: int = 10485760  # 10MB
     upload_dir: str = "./uploads"
+    upload_gc_grace_seconds: int = 3600  # Unreferenced blobs younger than this are kept
+    upload_gc_interval_seconds: int = 21600  # Background upload GC interval; 0 disables it
+    analyze_frame_persistence: str = "always"  # "always": save every analyze frame; "alert": save frames only as alert evidence
+    analyze_frame_sample_rate: float = 0.0  # In "alert" mode, also save this fraction of other frames for audit
+    analyze_frame_retention_days: int = 0  # Delete saved frames that are not alert evidence after this many days; 0 keeps them
+    
+    # Face recognition
+    face_model_pack: str = "buffalo_l"  # InsightFace model pack (buffalo_s, buffalo_l, ...)
+    face_det_size: int = 640  # Detector input size (square)
+    face_allowed_modules: str = "detection,recognition"  # Comma-separated InsightFace tasks; empty loads the whole pack
+    face_warmup_on_startup: bool = True  # Load the model and run a dummy inference at startup
+    face_adaptive_decode: bool = True  # Decode large JPEG frames at 1/2 or 1/4 scale for identification
+    face_decode_min_side: int = 1600  # Reduced decoding keeps at least this many pixels on the long side
+    face_detect_max_side: int = 960  # Downscale frames to this long side for detection only (0 disables)
+    face_gallery_cache_size: int = 256  # Max users with an in-memory gallery
+    face_embedding_dtype: str = "float32"  # float32 or float16 for new embeddings
+    face_ann_min_rows: int = 2000  # Gallery rows before an IVF index is built (0 disables)
+    face_ann_n_probe: int = 8  # IVF clusters scanned per query
+    face_match_mode: str = "prototypes"  # prototypes (centroid + k-means) or embeddings (every photo)
+    face_max_prototypes: int = 3  # k-means prototypes per person in addition to the centroid
+    face_outlier_threshold: float = 0.35  # Cosine similarity to centroid below which a photo is an outlier
+    face_match_min_confidence: float = 0.65  # Floor for calibrated match thresholds ((cosine + 1) / 2)
+    face_match_max_confidence: float = 0.8  # Ceiling for calibrated match thresholds
+    face_match_margin: float = 0.03  # Required confidence gap between the best and second-best person
+    face_match_max_top_k: int = 5  # Max candidates returned when a client asks for top-k
+    face_enroll_min_face_size: int = 80  # Reject enrollment faces smaller than this (px, shorter bbox side)
+    face_enroll_min_blur: float = 30.0  # Reject below this Laplacian variance (face crop at 112x112)
+    face_enroll_max_yaw: float = 0.35  # Reject when the nose is this far off-centre (fraction of eye distance)
+    face_enroll_min_det_score: float = 0.6  # Reject low-confidence detections
+    face_enroll_dedupe_similarity: float = 0.95  # Drop embeddings this similar to one already kept
+    face_track_ttl_seconds: float = 2.0  # Drop a session's face track after this long unseen
+    face_track_iou_threshold: float = 0.5  # Bbox IoU to associate a detection with a track
+    face_track_refresh_seconds: float = 1.0  # Re-run recognition on a track at least this often
+    face_track_refresh_frames: int = 10  # ...or after this many frames served from the track
+    face_track_similarity: float = 0.5  # Cosine similarity for a re-embedded face to keep its track
+    face_track_max_sessions: int = 1024  # Sessions with live tracks kept in memory
+    face_batch_max_images: int = 8  # Max frames per /identify/frames request
+    face_inference_workers: int = 2  # Threads running InsightFace inference
+    face_inference_max_queue: int = 16  # Queued + running calls before HTTP 503
+    face_onnx_intra_op_threads: int = 0  # ONNX Runtime threads per call (0 = default)
+    face_reembed_batch_size: int = 20  # Known persons fetched per re-embedding batch
+    face_reembed_workers: int = 1  # Persons re-embedded concurrently
+    face_reembed_pause_seconds: float = 0.5  # Pause between re-embedding batches
     
     class Config:
         env_file = ".env"
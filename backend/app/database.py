@@ -47,6 +47,7 @@ async def init_db():
         from app.models.known_person import KnownPerson
         from app.models.subscription import Subscription
         from app.models.audit_log import AuditLog
+        from app.models.audit_frame import AuditFrame
 
         # Initialize Beanie with document models
         await init_beanie(
@@ -57,6 +58,7 @@ async def init_db():
                 KnownPerson,
                 Subscription,
                 AuditLog,
+                AuditFrame,
             ],
         )
 
@@ -4,15 +4,28 @@ Drishti AI - FastAPI Application Entry Point
 Main application configuration with route registration, CORS, and lifecycle events.
 """
 
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 import os
 from datetime import datetime
 
 from app.config import get_settings
 from app.database import init_db, close_db
+from app.services.inference_executor import (
+    InferenceBusyError,
+    get_inference_stats,
+    run_inference,
+    shutdown_inference_executor,
+)
+from app.services.face_service import get_face_model_status, warm_up_face_model
+from app.services.face_reembed import reembed_job
+from app.services.blob_store import run_periodic_gc, wait_for_pending_writes
+from app.services.http_clients import close_http_clients, open_http_clients
+from app.services.upload_storage import UploadTooLargeError, clean_staging
 
 
 @asynccontextmanager
@@ -20,16 +33,44 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler for startup and shutdown events."""
     # Startup
     print("🚀 Starting Drishti AI FastAPI Server...")
+    settings = get_settings()
     await init_db()
     
+    # Pooled upstream clients (Gemini, Ollama, OAuth) reused across requests
+    open_http_clients()
+    
     # Create uploads directory
     uploads_dir = os.path.join(os.path.dirname(__file__), "..", "uploads")
     os.makedirs(uploads_dir, exist_ok=True)
     
+    # Partial uploads left behind by a crash or a failed request
+    removed = await clean_staging()
+    if removed:
+        print(f"🧹 Removed {removed} abandoned staging files")
+    
+    # Load and warm the face model in the background; /api/health/ready
+    # reports when it is done
+    warmup_task = None
+    if settings.face_warmup_on_startup:
+        warmup_task = asyncio.create_task(run_inference(warm_up_face_model))
+    
+    # Delete unreferenced upload blobs periodically
+    gc_task = None
+    if settings.upload_gc_interval_seconds > 0:
+        gc_task = asyncio.create_task(run_periodic_gc())
+    
     yield
     
     # Shutdown
     print("🛑 Shutting down Drishti AI Server...")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if gc_task is not None:
+        gc_task.cancel()
+    reembed_job.cancel()
+    await wait_for_pending_writes()
+    await close_http_clients()
+    shutdown_inference_executor()
     await close_db()
 
 
@@ -58,6 +99,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Face inference backpressure: ask clients to retry instead of queueing forever
+@app.exception_handler(InferenceBusyError)
+async def inference_busy_handler(request: Request, exc: InferenceBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+
+# Streamed uploads over max_file_size are aborted mid-stream
+@app.exception_handler(UploadTooLargeError)
+async def upload_too_large_handler(request: Request, exc: UploadTooLargeError):
+    return JSONResponse(
+        status_code=413,
+        content={"detail": str(exc)}
+    )
+
+
 # Mount static files for uploads
 uploads_path = os.path.join(os.path.dirname(__file__), "..", "uploads")
 if not os.path.exists(uploads_path):
@@ -94,10 +154,27 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "ollama": settings.ollama_url
+        "ollama": settings.ollama_url,
+        "faceInference": get_inference_stats(),
+        "faceModel": get_face_model_status()
     }
 
 
+@app.get("/api/health/ready")
+async def readiness_check():
+    """Readiness check: 503 until the face model is loaded and warm."""
+    face_model = get_face_model_status()
+    # Without startup warm-up the model loads lazily and never gates readiness
+    ready = face_model["ready"] or not settings.face_warmup_on_startup
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "faceModel": face_model
+        }
+    )
+
+
 # Root endpoint
 @app.get("/")
 async def root():
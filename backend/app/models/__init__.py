@@ -1,8 +1,9 @@
 # Models package
 from app.models.user import User
 from app.models.alert import Alert
-from app.models.known_person import KnownPerson
+from app.models.known_person import KnownPerson, KnownPersonSummary
 from app.models.subscription import Subscription
 from app.models.audit_log import AuditLog
+from app.models.audit_frame import AuditFrame
 
-__all__ = ["User", "Alert", "KnownPerson", "Subscription", "AuditLog"]
+__all__ = ["User", "Alert", "KnownPerson", "KnownPersonSummary", "Subscription", "AuditLog", "AuditFrame"]
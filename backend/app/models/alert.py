@@ -86,5 +86,6 @@ class Alert(Document):
         name = "alerts"
         indexes = [
             [("user_id", 1), ("created_at", -1)],
-            [("severity", 1), ("acknowledged", 1)]
+            [("severity", 1), ("acknowledged", 1)],
+            [("image_ref", 1)]
         ]
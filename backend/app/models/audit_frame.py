@@ -0,0 +1,30 @@
+"""
+Drishti AI - Audit Frame Model
+
+MongoDB document model for analyze frames kept for audit.
+"""
+
+from beanie import Document, Indexed
+from pydantic import Field
+from typing import Optional
+from datetime import datetime
+
+
+class AuditFrame(Document):
+    """A saved analyze frame that is not alert evidence (sampled or always-on persistence)."""
+    
+    # Blob path ("/uploads/blobs/...")
+    image_ref: Indexed(str)
+    
+    # Who sent the frame
+    user_id: Optional[Indexed(str)] = None  # User ID as string
+    session_id: Optional[str] = None
+    
+    # "always" (ANALYZE_FRAME_PERSISTENCE=always) or "sample" (audit sample rate)
+    reason: str
+    
+    # Timestamp; frames past ANALYZE_FRAME_RETENTION_DAYS are expired by the upload GC
+    created_at: Indexed(datetime) = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "audit_frames"
@@ -4,16 +4,47 @@ Drishti AI - Known Person Model
 MongoDB document model for known persons (face recognition).
 """
 
-from beanie import Document, Indexed
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from beanie import Document, Indexed, PydanticObjectId
+from bson.errors import InvalidId
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Optional, List
 from datetime import datetime
+import numpy as np
+
+from app.config import get_settings
+
+
+# Supported on-disk encodings for face embeddings (little-endian)
+EMBEDDING_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+
+# Embeddings stored before model tags existed all came from this pack
+LEGACY_EMBEDDING_MODEL = "buffalo_l"
+
+
+def current_embedding_model() -> str:
+    """Model tag recorded with new embeddings (the configured InsightFace pack)."""
+    return get_settings().face_model_pack
+
+
+def pack_embedding(embedding: Any, dtype: str = "float32") -> bytes:
+    """Pack an embedding (list or array of floats) into little-endian bytes."""
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPES[dtype]).tobytes()
+
+
+def unpack_embedding(data: bytes, dtype: str = "float32") -> np.ndarray:
+    """View packed embedding bytes as a numpy array without copying."""
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPES[dtype])
 
 
 class PersonImage(BaseModel):
     """Image record embedded document."""
     filename: str
     path: str
+    sha256: Optional[str] = None  # Content digest, for duplicate detection
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -32,8 +63,30 @@ class KnownPerson(Document):
     images: List[PersonImage] = Field(default_factory=list)
     
     # Face embeddings (512-dim vectors from InsightFace)
-    # Each embedding is a list of 512 floats
-    face_embeddings: List[List[float]] = Field(default_factory=list)
+    # Each embedding is stored as packed little-endian bytes (BinData)
+    # in the encoding named by embedding_dtype. Legacy documents holding
+    # lists of floats are packed transparently when loaded.
+    face_embeddings: List[bytes] = Field(default_factory=list)
+    embedding_dtype: str = Field(default_factory=lambda: get_settings().face_embedding_dtype)
+    # len(face_embeddings), stored so list endpoints can project it
+    # without loading the embeddings
+    embedding_count: int = 0
+    
+    # Matching prototypes derived from face_embeddings: normalized centroid
+    # first, then optional k-means centers (same encoding as embeddings)
+    face_prototypes: List[bytes] = Field(default_factory=list)
+    # Indices into face_embeddings flagged as poor-quality outliers
+    face_outliers: List[int] = Field(default_factory=list)
+    # Enrollment quality weight per embedding (0-1]; missing entries count as 1.0
+    face_qualities: List[float] = Field(default_factory=list)
+    # Model tag per embedding; missing entries are LEGACY_EMBEDDING_MODEL.
+    # Only embeddings from the configured model are matched.
+    face_embedding_models: List[str] = Field(default_factory=list)
+    # Model tag of the embeddings face_prototypes were computed from
+    face_prototypes_model: Optional[str] = None
+    # Low-end cosine similarity of this person's photos to their own
+    # centroid; used to calibrate the owner's match threshold
+    face_genuine_similarity: Optional[float] = None
     
     # Additional info
     notes: Optional[str] = None
@@ -47,10 +100,154 @@ class KnownPerson(Document):
     class Settings:
         name = "known_persons"
         indexes = [
-            [("for_user", 1), ("added_by", 1)]
+            [("for_user", 1), ("added_by", 1)],
+            [("images.path", 1)]
+        ]
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _pack_face_embeddings(cls, data: Any) -> Any:
+        """Pack float-list embeddings into the binary storage format."""
+        if not isinstance(data, dict):
+            return data
+        
+        # A new person with no embeddings yet gets the configured encoding,
+        # which add_face_embedding then uses
+        dtype = data.get("embedding_dtype") or get_settings().face_embedding_dtype
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        
+        data = dict(data)
+        data["embedding_dtype"] = dtype
+        for field in ("face_embeddings", "face_prototypes"):
+            data[field] = [
+                e if isinstance(e, bytes) else pack_embedding(e, dtype)
+                for e in data.get(field) or []
+            ]
+        data["embedding_count"] = len(data["face_embeddings"])
+        return data
+    
+    @classmethod
+    async def get_summary(cls, person_id: str) -> Optional["KnownPersonSummary"]:
+        """Fetch a person's metadata without loading its embeddings."""
+        try:
+            object_id = PydanticObjectId(person_id)
+        except (InvalidId, TypeError):
+            return None
+        return await cls.find_one(cls.id == object_id).project(KnownPersonSummary)
+    
+    def add_face_embedding(
+        self,
+        embedding: List[float],
+        quality: float = 1.0,
+        model: Optional[str] = None
+    ) -> None:
+        """Append an embedding in this document's storage encoding."""
+        # Legacy documents have no qualities or tags; keep the lists aligned
+        self.face_qualities = self.embedding_weights().tolist()
+        self.face_embedding_models = self.embedding_models()
+        self.face_embeddings.append(pack_embedding(embedding, self.embedding_dtype))
+        self.face_qualities.append(float(quality))
+        self.face_embedding_models.append(model or current_embedding_model())
+        self.embedding_count = len(self.face_embeddings)
+    
+    def replace_face_embeddings(
+        self,
+        embeddings: List[List[float]],
+        qualities: List[float],
+        model: str
+    ) -> None:
+        """Swap in a full set of embeddings computed with one model."""
+        self.face_embeddings = [pack_embedding(e, self.embedding_dtype) for e in embeddings]
+        self.face_qualities = [float(q) for q in qualities]
+        self.face_embedding_models = [model] * len(embeddings)
+        self.embedding_count = len(self.face_embeddings)
+    
+    def embedding_models(self) -> List[str]:
+        """Model tag of each embedding, defaulting to LEGACY_EMBEDDING_MODEL."""
+        models = list(self.face_embedding_models[:len(self.face_embeddings)])
+        return models + [LEGACY_EMBEDDING_MODEL] * (len(self.face_embeddings) - len(models))
+    
+    def current_model_mask(self) -> np.ndarray:
+        """Boolean mask of embeddings computed with the configured model."""
+        current = current_embedding_model()
+        return np.array([m == current for m in self.embedding_models()], dtype=bool)
+    
+    def needs_reembedding(self) -> bool:
+        """Whether any embedding comes from a model other than the configured one."""
+        return not bool(self.current_model_mask().all())
+    
+    def embedding_weights(self) -> np.ndarray:
+        """Quality weight of each embedding, defaulting to 1.0."""
+        weights = np.ones(len(self.face_embeddings), dtype=np.float32)
+        known = self.face_qualities[:len(weights)]
+        weights[:len(known)] = known
+        return weights
+    
+    def embedding_matrix(self, current_model_only: bool = False) -> np.ndarray:
+        """Return embeddings as an (n, dim) float32 matrix."""
+        packed = self.face_embeddings
+        if current_model_only:
+            packed = [e for e, current in zip(packed, self.current_model_mask()) if current]
+        return self._unpack_matrix(packed)
+    
+    def prototype_matrix(self) -> np.ndarray:
+        """Return matching prototypes as an (m, dim) float32 matrix."""
+        return self._unpack_matrix(self.face_prototypes)
+    
+    def _unpack_matrix(self, packed: List[bytes]) -> np.ndarray:
+        if not packed:
+            return np.empty((0, 0), dtype=np.float32)
+        rows = [unpack_embedding(e, self.embedding_dtype) for e in packed]
+        return np.vstack(rows).astype(np.float32, copy=False)
+    
+    def face_embedding_lists(self) -> List[List[float]]:
+        """Return embeddings as lists of floats for JSON responses."""
+        return [
+            unpack_embedding(e, self.embedding_dtype).astype(np.float32).tolist()
+            for e in self.face_embeddings
         ]
     
     def save(self, *args, **kwargs):
         """Update timestamp on save."""
         self.updated_at = datetime.utcnow()
         return super().save(*args, **kwargs)
+
+
+class KnownPersonSummary(BaseModel):
+    """
+    Known person metadata projection for list/detail endpoints.
+    
+    Excludes face_embeddings and reads the stored embedding_count, so
+    listing persons never transfers or decodes the embedding vectors.
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    relationship: str
+    added_by: str
+    for_user: str
+    images: List[PersonImage] = Field(default_factory=list)
+    embedding_count: int = 0
+    face_outliers: List[int] = Field(default_factory=list)
+    notes: Optional[str] = None
+    phone_number: Optional[str] = None
+    email: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    class Settings:
+        projection = {
+            "_id": 1,
+            "name": 1,
+            "relationship": 1,
+            "added_by": 1,
+            "for_user": 1,
+            "images": 1,
+            "embedding_count": 1,
+            "face_outliers": 1,
+            "notes": 1,
+            "phone_number": 1,
+            "email": 1,
+            "created_at": 1,
+            "updated_at": 1,
+        }
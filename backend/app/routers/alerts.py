@@ -12,6 +12,7 @@ from app.schemas.alert import CreateAlertRequest, AlertResponse, AlertStatsRespo
 from app.models.alert import Alert, AlertType, AlertSeverity, DetectedObject, Location
 from app.models.user import User, UserRole
 from app.middleware.auth import get_current_user
+from app.services.blob_store import release_blobs
 
 
 router = APIRouter(prefix="/api/alerts", tags=["Alerts"])
@@ -225,5 +226,6 @@ async def delete_alert(
         )
     
     await alert.delete()
+    await release_blobs([alert.image_ref])
     
     return {"message": "Alert deleted successfully"}
@@ -6,8 +6,11 @@ Manage favorite known persons for quick access.
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List
+from beanie import PydanticObjectId
+from beanie.operators import In
+from bson.errors import InvalidId
 from app.models.user import User
-from app.models.known_person import KnownPerson
+from app.models.known_person import KnownPerson, KnownPersonSummary
 from app.middleware.auth import get_current_user
 
 
@@ -24,17 +27,31 @@ async def get_favorites(user: User = Depends(get_current_user)):
     if not favorite_ids:
         return {"favorites": []}
     
-    # Fetch the actual known persons
+    # Fetch the actual known persons in one query, without embeddings
+    object_ids = []
+    for person_id in favorite_ids:
+        try:
+            object_ids.append(PydanticObjectId(person_id))
+        except (InvalidId, TypeError):
+            continue
+    
+    persons = await KnownPerson.find(
+        In(KnownPerson.id, object_ids),
+        KnownPerson.for_user == str(user.id)
+    ).project(KnownPersonSummary).to_list()
+    persons_by_id = {str(person.id): person for person in persons}
+    
+    # Preserve the user's favorites order
     favorites = []
     for person_id in favorite_ids:
-        person = await KnownPerson.get(person_id)
-        if person and person.for_user == str(user.id):
+        person = persons_by_id.get(person_id)
+        if person:
             favorites.append({
                 "id": str(person.id),
                 "name": person.name,
                 "relationship": person.relationship,
                 "images": [img.model_dump() for img in person.images],
-                "has_face_embeddings": len(person.face_embeddings) > 0
+                "has_face_embeddings": person.embedding_count > 0
             })
     
     return {"favorites": favorites}
@@ -5,27 +5,31 @@ Known person management with face recognition.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from typing import Optional, List
-import os
-import uuid
+from typing import Optional, List, Union
 from datetime import datetime
-import base64
 
 from app.schemas.known_person import (
     CreateKnownPersonRequest,
     UpdateKnownPersonRequest,
     KnownPersonResponse
 )
-from app.models.known_person import KnownPerson, PersonImage
+from app.models.known_person import KnownPerson, KnownPersonSummary, PersonImage
 from app.models.user import User, UserRole
 from app.middleware.auth import get_current_user
-from app.services.face_service import extract_embedding_from_base64
+from app.services.face_enrollment import ENROLL_ACCEPTED, enroll_images, enrollment_report
+from app.services.face_gallery import update_cached_gallery, invalidate_user_gallery
+from app.services.face_prototypes import refresh_person_prototypes
+from app.services.blob_store import release_blobs, store_staged
+from app.services.upload_storage import StagedUpload, discard_uploads, stage_uploads
 
 
 router = APIRouter(prefix="/api/known-persons", tags=["Known Persons"])
 
 
-def _serialize_known_person(person: KnownPerson, include_embeddings: bool = False) -> dict:
+def _serialize_known_person(
+    person: Union[KnownPerson, KnownPersonSummary],
+    include_embeddings: bool = False
+) -> dict:
     data = {
         "id": str(person.id),
         "name": person.name,
@@ -33,7 +37,8 @@ def _serialize_known_person(person: KnownPerson, include_embeddings: bool = Fals
         "added_by": person.added_by,
         "for_user": person.for_user,
         "images": [img.model_dump() for img in person.images],
-        "has_face_embeddings": len(person.face_embeddings) > 0,
+        "has_face_embeddings": person.embedding_count > 0,
+        "flagged_embeddings": person.face_outliers,
         "notes": person.notes,
         "phone_number": person.phone_number,
         "email": person.email,
@@ -41,10 +46,44 @@ def _serialize_known_person(person: KnownPerson, include_embeddings: bool = Fals
         "updated_at": person.updated_at.isoformat(),
     }
     if include_embeddings:
-        data["face_embeddings"] = person.face_embeddings
+        data["face_embeddings"] = person.face_embedding_lists()
     return data
 
 
+async def _enroll_uploads(person: KnownPerson, files: List[UploadFile]) -> List[dict]:
+    """
+    Stream, enroll and store uploaded photos for a person.
+    
+    Accepted files are moved into /uploads and appended to the person's
+    images and embeddings; every other staged file is deleted.
+    """
+    uploads = await stage_uploads(files)
+    try:
+        enrollment = await enroll_images(
+            uploads,
+            person.embedding_matrix(current_model_only=True),
+            [img.sha256 for img in person.images if img.sha256]
+        )
+        for upload, result in zip(uploads, enrollment):
+            if result["status"] == ENROLL_ACCEPTED:
+                await _store_upload(person, upload, result)
+    finally:
+        await discard_uploads(uploads)
+    return enrollment
+
+
+async def _store_upload(person: KnownPerson, upload: StagedUpload, result: dict) -> None:
+    # Content-addressed: the same photo enrolled for two persons is stored once
+    path = await store_staged(upload)
+    
+    person.images.append(PersonImage(
+        filename=upload.original_name or path.rsplit("/", 1)[-1],
+        path=path,
+        sha256=upload.sha256
+    ))
+    person.add_face_embedding(result["embedding"], result["quality"])
+
+
 @router.get("")
 async def list_known_persons(
     for_user_id: Optional[str] = None,
@@ -68,7 +107,11 @@ async def list_known_persons(
         # Regular user can see their own
         query = {"for_user": str(user.id)}
     
-    known_persons = await KnownPerson.find(query).sort(-KnownPerson.created_at).to_list()
+    # Only load embeddings when the caller asked for them
+    find_query = KnownPerson.find(query).sort(-KnownPerson.created_at)
+    if not include_embeddings:
+        find_query = find_query.project(KnownPersonSummary)
+    known_persons = await find_query.to_list()
     
     return {
         "knownPersons": [
@@ -85,7 +128,7 @@ async def get_known_person(
 ):
     """Get a single known person."""
     
-    person = await KnownPerson.get(person_id)
+    person = await KnownPerson.get_summary(person_id)
     
     if not person:
         raise HTTPException(
@@ -106,22 +149,7 @@ async def get_known_person(
             detail="Access denied"
         )
     
-    return {
-        "knownPerson": {
-            "id": str(person.id),
-            "name": person.name,
-            "relationship": person.relationship,
-            "added_by": person.added_by,
-            "for_user": person.for_user,
-            "images": [img.model_dump() for img in person.images],
-            "has_face_embeddings": len(person.face_embeddings) > 0,
-            "notes": person.notes,
-            "phone_number": person.phone_number,
-            "email": person.email,
-            "created_at": person.created_at.isoformat(),
-            "updated_at": person.updated_at.isoformat()
-        }
-    }
+    return {"knownPerson": _serialize_known_person(person)}
 
 
 @router.post("")
@@ -151,53 +179,27 @@ async def create_known_person(
     if image is not None:
         upload_files.append(image)
     
-    # Save uploaded images
-    images = []
-    face_embeddings = []
-    uploads_dir = os.path.join(os.path.dirname(__file__), "..", "..", "uploads")
-    os.makedirs(uploads_dir, exist_ok=True)
-    
-    for file in upload_files:
-        # Generate filename
-        ext = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-        filename = f"face-{uuid.uuid4().hex[:8]}.{ext}"
-        filepath = os.path.join(uploads_dir, filename)
-        
-        # Read file content
-        content = await file.read()
-        
-        # Save file
-        with open(filepath, "wb") as f:
-            f.write(content)
-        
-        images.append(PersonImage(
-            filename=filename,
-            path=f"/uploads/{filename}"
-        ))
-        
-        # Extract face embedding
-        image_base64 = base64.b64encode(content).decode("utf-8")
-        embedding = await extract_embedding_from_base64(image_base64)
-        if embedding:
-            face_embeddings.append(embedding)
-    
     # Create known person
     person = KnownPerson(
         name=name,
         relationship=relationship,
         added_by=str(user.id),
         for_user=target_user_id,
-        images=images,
-        face_embeddings=face_embeddings,
         notes=notes,
         phone_number=phone_number,
         email=email
     )
     
+    # Score and embed all photos concurrently; save accepted images only
+    enrollment = await _enroll_uploads(person, upload_files)
+    
+    refresh_person_prototypes(person)
     await person.insert()
+    await update_cached_gallery(person.for_user, person)
     
     return {
         "message": "Known person added successfully",
+        "enrollment": enrollment_report(enrollment),
         "person": _serialize_known_person(person, include_embeddings=True),
         # Compatibility payload for mobile screens expecting a direct person model.
         **_serialize_known_person(person, include_embeddings=True),
@@ -241,6 +243,7 @@ async def update_known_person(
     
     person.updated_at = datetime.utcnow()
     await person.save()
+    invalidate_user_gallery(person.for_user)
     
     return {
         "message": "Known person updated successfully",
@@ -273,40 +276,22 @@ async def add_images(
             detail="Access denied"
         )
     
-    uploads_dir = os.path.join(os.path.dirname(__file__), "..", "..", "uploads")
-    os.makedirs(uploads_dir, exist_ok=True)
-    
-    for file in files:
-        # Generate filename
-        ext = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-        filename = f"face-{uuid.uuid4().hex[:8]}.{ext}"
-        filepath = os.path.join(uploads_dir, filename)
-        
-        # Read and save file
-        content = await file.read()
-        with open(filepath, "wb") as f:
-            f.write(content)
-        
-        person.images.append(PersonImage(
-            filename=filename,
-            path=f"/uploads/{filename}"
-        ))
-        
-        # Extract face embedding
-        image_base64 = base64.b64encode(content).decode("utf-8")
-        embedding = await extract_embedding_from_base64(image_base64)
-        if embedding:
-            person.face_embeddings.append(embedding)
+    # Score, embed and dedupe against the person's existing images
+    enrollment = await _enroll_uploads(person, files)
     
+    refresh_person_prototypes(person)
     person.updated_at = datetime.utcnow()
     await person.save()
+    await update_cached_gallery(person.for_user, person)
     
     return {
         "message": "Images added successfully",
+        "enrollment": enrollment_report(enrollment),
         "knownPerson": {
             "id": str(person.id),
             "images_count": len(person.images),
-            "has_face_embeddings": len(person.face_embeddings) > 0
+            "has_face_embeddings": person.embedding_count > 0,
+            "flagged_embeddings": person.face_outliers
         }
     }
 
@@ -356,5 +341,7 @@ async def delete_known_person(
         )
     
     await person.delete()
+    invalidate_user_gallery(person.for_user)
+    await release_blobs(img.path for img in person.images)
     
     return {"message": "Known person deleted successfully"}
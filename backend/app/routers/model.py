@@ -4,26 +4,39 @@ Drishti AI - Model Router
 Image analysis and face recognition endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
-import os
-import base64
-from datetime import datetime
-import uuid
+import asyncio
+import json
+import random
 
 from app.models.user import User
 from app.models.alert import Alert, AlertType, AlertSeverity, DetectedObject
 from app.models.subscription import Subscription
-from app.models.known_person import KnownPerson
-from app.middleware.auth import get_current_user, get_current_user_optional
-from app.services.ollama_service import analyze_image, check_ollama_health
-from app.services.gemini_service import analyze_image_with_gemini, check_gemini_health
+from app.models.audit_frame import AuditFrame
+from app.middleware.auth import get_admin_user, get_current_user, get_current_user_optional
+from app.services.ollama_service import OLLAMA_ENGINE, check_ollama_health
+from app.services.gemini_service import check_gemini_health, gemini_available
+from app.services.circuit_breaker import get_breaker
 from app.services.alert_detector import analyze_for_alerts, extract_objects
 from app.services.email_service import send_alert_email
-from app.services.face_service import identify_face, extract_embedding_from_base64
+from app.services.face_service import (
+    identify_face,
+    identify_faces,
+    identify_faces_in_images,
+)
+from app.services.face_gallery import get_user_gallery
+from app.services.face_reembed import reembed_job
+from app.services.blob_store import UNTRACKED_FRAMES_DIRECTORY, store_bytes_background
+from app.services.upload_storage import read_upload
+from app.services.vision_router import route_vision_analysis
+from app.services.response_cache import dhash, response_cache
+from app.services.vision_stream import stream_vision_analysis
 from app.config import get_settings
 from app.database import is_database_available
+from app.utils.images import ImageInput, image_bytes, strip_data_url
 
 
 router = APIRouter(prefix="/api/model", tags=["Model"])
@@ -40,6 +53,24 @@ class AnalyzeRequest(BaseModel):
 class IdentifyRequest(BaseModel):
     """Request schema for face identification."""
     image: str  # Base64 encoded image
+    session_id: Optional[str] = None  # Continuous-mode session for face tracking
+    top_k: int = 1  # Return this many candidate persons when above 1
+
+
+class IdentifyFramesRequest(BaseModel):
+    """Request schema for identifying faces across several frames."""
+    images: List[str]  # Base64 encoded images
+    top_k: int = 1
+
+
+def _track_session_key(user: User, session_id: Optional[str]) -> Optional[str]:
+    """Scope face-track sessions to the user so sessions never cross accounts."""
+    return f"{user.id}:{session_id}" if session_id else None
+
+
+def _top_k(requested: int) -> int:
+    """Clamp a client-requested candidate count to the configured maximum."""
+    return min(max(requested, 1), max(get_settings().face_match_max_top_k, 1))
 
 
 @router.post("/analyze")
@@ -56,11 +87,7 @@ async def analyze(
         )
     
     # Normalize base64 image
-    image_base64 = request.image
-    if image_base64.startswith("data:"):
-        parts = image_base64.split(",", 1)
-        if len(parts) == 2:
-            image_base64 = parts[1]
+    image_base64 = strip_data_url(request.image)
     
     # Validate base64 length
     if len(image_base64) < 20:
@@ -69,54 +96,209 @@ async def analyze(
             detail="Invalid image data"
         )
     
-    # Save image to uploads directory
-    saved_image_url = None
-    settings = get_settings()
+    # Vision APIs take base64, so the string is passed through as-is
+    return await _analyze_image(
+        image_base64,
+        request.prompt,
+        request.image_mime or "image/jpeg",
+        request.session_id,
+        user
+    )
+
+
+@router.post("/analyze/stream")
+async def analyze_stream(
+    request: AnalyzeRequest,
+    user: Optional[User] = Depends(get_current_user_optional)
+):
+    """
+    Analyze an image and stream the description as Server-Sent Events.
     
-    try:
-        uploads_dir = os.path.join(os.path.dirname(__file__), "..", "..", "uploads")
-        os.makedirs(uploads_dir, exist_ok=True)
-        
-        # Generate filename
-        ext = request.image_mime.split("/")[1] if request.image_mime else "jpg"
-        filename = f"capture-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.{ext}"
-        filepath = os.path.join(uploads_dir, filename)
+    Events:
+        sentence: {"index", "text"} as soon as each sentence is complete
+        alert: keyword alert analysis whenever the detected severity rises
+        final: the same body /analyze returns (objects, alert, token counts)
+        error: {"detail"} if analysis fails
+    """
+    
+    if not request.image or not request.prompt:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Image and prompt are required"
+        )
+    
+    image_base64 = strip_data_url(request.image)
+    
+    if len(image_base64) < 20:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid image data"
+        )
+    
+    image_mime = request.image_mime or "image/jpeg"
+    
+    async def events():
+        saved_image_url = None
+        if get_settings().analyze_frame_persistence == "always":
+            saved_image_url = await _save_audit_frame(
+                image_base64, image_mime, "always", request.session_id, user
+            )
         
-        # Decode and save
-        image_bytes = base64.b64decode(image_base64)
-        with open(filepath, "wb") as f:
-            f.write(image_bytes)
+        cache_scope = _cache_scope(user, request.session_id)
+        frame_hash = await _frame_hash(image_base64, cache_scope)
+        cached = None
+        if frame_hash is not None:
+            cached = response_cache.get(cache_scope, request.prompt, frame_hash)
         
-        saved_image_url = f"/uploads/{filename}"
+        async for event, data in stream_vision_analysis(
+            image_base64, request.prompt, image_mime, cached=cached
+        ):
+            if event == "result":
+                if cached is None and frame_hash is not None:
+                    response_cache.put(cache_scope, request.prompt, frame_hash, data)
+                response = await _finish_analysis(
+                    data, image_base64, image_mime, request.session_id, user, saved_image_url
+                )
+                yield _sse_event("final", response)
+            elif event == "error":
+                yield _sse_event("error", {"detail": data["error"]})
+            elif event == "alert":
+                yield _sse_event("alert", {
+                    "detected": data["detected"],
+                    "severity": data["severity"],
+                    "type": data["type"],
+                    "keywords": data["keywords"]
+                })
+            else:
+                yield _sse_event(event, data)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Don't let nginx buffer the stream
+        }
+    )
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/analyze/upload")
+async def analyze_upload(
+    image: UploadFile = File(...),
+    prompt: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    user: Optional[User] = Depends(get_current_user_optional)
+):
+    """Analyze an image sent as a multipart file instead of base64 JSON."""
+    
+    content = await read_upload(image)
+    
+    if not prompt or len(content) < 16:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Image and prompt are required"
+        )
+    
+    image_mime = image.content_type if (image.content_type or "").startswith("image/") else "image/jpeg"
+    return await _analyze_image(content, prompt, image_mime, session_id, user)
+
+
+def _cache_scope(user: Optional[User], session_id: Optional[str]) -> Optional[str]:
+    """Response cache namespace; cached answers are never shared across users."""
+    if user is not None:
+        return f"user:{user.id}"
+    if session_id:
+        return f"session:{session_id}"
+    return None
+
+
+async def _frame_hash(image: ImageInput, cache_scope: Optional[str]) -> Optional[int]:
+    """Perceptual hash for the response cache, or None when caching does not apply."""
+    if cache_scope is None or not get_settings().response_cache_enabled:
+        return None
+    try:
+        return await asyncio.to_thread(dhash, image)
+    except Exception as e:
+        print(f"Frame hash failed: {e}")
+        return None
+
+
+async def _save_audit_frame(
+    image: ImageInput,
+    image_mime: str,
+    reason: str,
+    session_id: Optional[str],
+    user: Optional[User]
+) -> Optional[str]:
+    """
+    Save a frame that is not alert evidence and record it as an AuditFrame.
+    
+    The record is what keeps the blob from the upload GC (until
+    ANALYZE_FRAME_RETENTION_DAYS pass, when set). Without a database the
+    frame is still saved, where the GC does not collect it.
+    """
+    if not is_database_available():
+        return _persist_frame(image, image_mime, UNTRACKED_FRAMES_DIRECTORY)
+    
+    saved_image_url = _persist_frame(image, image_mime)
+    if saved_image_url:
+        await AuditFrame(
+            image_ref=saved_image_url,
+            user_id=str(user.id) if user else None,
+            session_id=session_id,
+            reason=reason
+        ).insert()
+    return saved_image_url
+
+
+def _persist_frame(image: ImageInput, image_mime: str, directory: str = "blobs") -> Optional[str]:
+    """
+    Queue a frame for saving to the content-addressed store.
+    
+    The blob path is known from the content hash, so it is returned at once
+    while the disk write finishes in the background.
+    """
+    try:
+        ext = image_mime.split("/")[-1] if image_mime else "jpg"
+        return store_bytes_background(image_bytes(image), ext, directory)
     except Exception as e:
         print(f"Failed to save image: {e}")
+        return None
+
+
+async def _analyze_image(
+    image: ImageInput,
+    prompt: str,
+    image_mime: str,
+    session_id: Optional[str],
+    user: Optional[User]
+) -> dict:
+    """Analyze, alert on and (when it is evidence) save one image."""
+    
+    saved_image_url = None
+    settings = get_settings()
     
-    # Analyze with backend-managed cloud vision first, then backend Ollama fallback.
+    if settings.analyze_frame_persistence == "always":
+        saved_image_url = await _save_audit_frame(image, image_mime, "always", session_id, user)
+    
+    # A near-identical frame with the same prompt skips the vision model
+    cache_scope = _cache_scope(user, session_id)
+    frame_hash = await _frame_hash(image, cache_scope)
     result = None
-    if settings.gemini_api_key:
-        result = await analyze_image_with_gemini(
-            image_base64=image_base64,
-            prompt=request.prompt,
-            image_mime=request.image_mime or "image/jpeg",
-        )
-
-    if not result or not result.get("success"):
-        ollama_result = await analyze_image(image_base64, request.prompt)
-        if ollama_result.get("success"):
-            ollama_result["engine"] = "ollama"
-            ollama_result["description"] = ollama_result.get("response", "")
-            ollama_result["objects"] = []
-            ollama_result["prompt_tokens"] = 0
-            ollama_result["completion_tokens"] = 0
-            ollama_result["inference_ms"] = 0
-            result = ollama_result
-        elif result and result.get("error"):
-            result = {
-                "success": False,
-                "error": f"Cloud vision failed: {result['error']}. Local backend fallback failed: {ollama_result.get('error', 'unknown error')}"
-            }
-        else:
-            result = ollama_result
+    if frame_hash is not None:
+        result = response_cache.get(cache_scope, prompt, frame_hash)
+    
+    if result is None:
+        # Backend-managed cloud vision and backend Ollama, per the routing policy
+        # (sequential fallback, hedged, or raced)
+        result = await route_vision_analysis(image, prompt, image_mime)
+        if result.get("success") and frame_hash is not None:
+            response_cache.put(cache_scope, prompt, frame_hash, result)
     
     if not result.get("success"):
         raise HTTPException(
@@ -124,6 +306,21 @@ async def analyze(
             detail=result.get("error", "AI analysis failed")
         )
     
+    return await _finish_analysis(result, image, image_mime, session_id, user, saved_image_url)
+
+
+async def _finish_analysis(
+    result: dict,
+    image: ImageInput,
+    image_mime: str,
+    session_id: Optional[str],
+    user: Optional[User],
+    saved_image_url: Optional[str]
+) -> dict:
+    """Create the alert (saving the frame as evidence) and build the analyze response."""
+    
+    settings = get_settings()
+    
     # Analyze for alerts
     alert_analysis = analyze_for_alerts(result["response"])
     detected_objects = result.get("objects") or extract_objects(result["response"])
@@ -131,9 +328,17 @@ async def analyze(
     alert_id = None
     
     can_use_db = is_database_available() and user is not None
+    create_alert = can_use_db and alert_analysis["detected"] and alert_analysis["severity"] != "low"
+    
+    # Frames become alert evidence; others are only kept at the audit sample rate
+    if saved_image_url is None:
+        if create_alert:
+            saved_image_url = _persist_frame(image, image_mime)
+        elif random.random() < settings.analyze_frame_sample_rate:
+            saved_image_url = await _save_audit_frame(image, image_mime, "sample", session_id, user)
 
     # Create alert if needed and DB/auth are available
-    if can_use_db and alert_analysis["detected"] and alert_analysis["severity"] != "low":
+    if create_alert:
         alert = Alert(
             user_id=str(user.id),
             type=AlertType(alert_analysis["type"]),
@@ -191,8 +396,9 @@ async def analyze(
         "promptTokens": result.get("prompt_tokens", 0),
         "completionTokens": result.get("completion_tokens", 0),
         "inferenceTimeMs": result.get("inference_ms", 0),
+        "cached": result.get("cached", False),
         "savedImageUrl": saved_image_url,
-        "sessionId": request.session_id,
+        "sessionId": session_id,
         "alert": {
             "detected": alert_analysis["detected"],
             "severity": alert_analysis["severity"],
@@ -206,13 +412,29 @@ async def analyze(
 
 
 @router.get("/health")
-async def health():
-    """Check backend vision engine health status."""
+async def health(probe: bool = False):
+    """
+    Vision engine health from the circuit breakers.
+    
+    Breaker state reflects real traffic, so no upstream calls are made;
+    pass probe=true to also query Ollama directly.
+    """
     settings = get_settings()
+    
+    ollama = {
+        "url": settings.ollama_url,
+        "model": settings.ollama_model,
+        "breaker": get_breaker(OLLAMA_ENGINE).snapshot(),
+    }
+    if probe:
+        ollama["probe"] = await check_ollama_health()
+    
     return {
-        "preferred": "gemini" if settings.gemini_api_key else "ollama",
+        "preferred": "gemini" if gemini_available() else "ollama",
+        "routingPolicy": settings.vision_routing_policy,
+        "responseCache": response_cache.stats(),
         "gemini": await check_gemini_health(),
-        "ollama": await check_ollama_health(),
+        "ollama": ollama,
     }
 
 
@@ -229,23 +451,41 @@ async def identify(
             detail="Image is required"
         )
     
-    # Get known persons for this user
-    known_persons = await KnownPerson.find(
-        KnownPerson.for_user == str(user.id)
-    ).to_list()
-    
-    # Convert to dict format for face service
-    known_persons_data = [
-        {
-            "id": str(kp.id),
-            "name": kp.name,
-            "relationship": kp.relationship,
-            "face_embeddings": kp.face_embeddings
-        }
-        for kp in known_persons if kp.face_embeddings
-    ]
+    return await _identify_image(request.image, request.session_id, request.top_k, user)
+
+
+@router.post("/identify/upload")
+async def identify_upload(
+    image: UploadFile = File(...),
+    session_id: Optional[str] = Form(None),
+    top_k: int = Form(1),
+    user: User = Depends(get_current_user)
+):
+    """Identify a face sent as a multipart file instead of base64 JSON."""
+    
+    content = await read_upload(image)
+    
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Image is required"
+        )
     
-    if not known_persons_data:
+    return await _identify_image(content, session_id, top_k, user)
+
+
+async def _identify_image(
+    image: ImageInput,
+    session_id: Optional[str],
+    top_k: int,
+    user: User
+) -> dict:
+    """Identify the main face in one image (base64 text or raw bytes)."""
+    
+    # Get the cached face gallery for this user
+    gallery = await get_user_gallery(str(user.id))
+    
+    if gallery.is_empty:
         return {
             "success": True,
             "identified": False,
@@ -255,9 +495,132 @@ async def identify(
         }
     
     # Identify face
-    result = await identify_face(request.image, known_persons_data)
+    result = await identify_face(
+        image,
+        gallery,
+        session_id=_track_session_key(user, session_id),
+        top_k=_top_k(top_k)
+    )
+    
+    return {
+        "success": True,
+        **result
+    }
+
+
+@router.post("/identify/batch")
+async def identify_batch(
+    request: IdentifyRequest,
+    user: User = Depends(get_current_user)
+):
+    """Identify every face in an image against known persons."""
+    
+    if not request.image:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Image is required"
+        )
+    
+    gallery = await get_user_gallery(str(user.id))
+    
+    if gallery.is_empty:
+        return {
+            "success": True,
+            "faces": [],
+            "identified_count": 0,
+            "message": "No known persons with face data found"
+        }
+    
+    result = await identify_faces(
+        request.image,
+        gallery,
+        session_id=_track_session_key(user, request.session_id),
+        top_k=_top_k(request.top_k)
+    )
     
     return {
         "success": True,
         **result
     }
+
+
+@router.post("/identify/frames")
+async def identify_frames(
+    request: IdentifyFramesRequest,
+    user: User = Depends(get_current_user)
+):
+    """Identify faces in several frames with a single request."""
+    
+    settings = get_settings()
+    
+    if not request.images:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one image is required"
+        )
+    
+    if len(request.images) > settings.face_batch_max_images:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.face_batch_max_images} images are allowed per request"
+        )
+    
+    gallery = await get_user_gallery(str(user.id))
+    
+    if gallery.is_empty:
+        return {
+            "success": True,
+            "results": [
+                {"faces": [], "identified_count": 0}
+                for _ in request.images
+            ],
+            "message": "No known persons with face data found"
+        }
+    
+    results = await identify_faces_in_images(request.images, gallery, top_k=_top_k(request.top_k))
+    
+    return {
+        "success": True,
+        "results": results
+    }
+
+
+@router.get("/reembed")
+async def reembed_status(admin: User = Depends(get_admin_user)):
+    """Progress of the face re-embedding job (admin only)."""
+    return {"job": reembed_job.status()}
+
+
+@router.post("/reembed")
+async def start_reembed(admin: User = Depends(get_admin_user)):
+    """Re-embed stored face images with the configured model (admin only)."""
+    
+    if not is_database_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database unavailable"
+        )
+    
+    if not reembed_job.start():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A re-embedding job is already running"
+        )
+    
+    return {
+        "message": "Re-embedding started",
+        "job": reembed_job.status()
+    }
+
+
+@router.delete("/reembed")
+async def cancel_reembed(admin: User = Depends(get_admin_user)):
+    """Cancel the running re-embedding job (admin only)."""
+    
+    if not reembed_job.cancel():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="No re-embedding job is running"
+        )
+    
+    return {"message": "Re-embedding cancelled"}
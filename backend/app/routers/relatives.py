@@ -1,15 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from typing import List, Optional
 from app.models.user import User
-from app.models.known_person import KnownPerson, PersonImage
+from app.models.known_person import KnownPerson, KnownPersonSummary, PersonImage
 from app.middleware.auth import get_current_user
-from app.services.face_service import extract_face_embedding, decode_base64_image
-import base64
+from app.services.face_enrollment import ENROLL_ACCEPTED, enroll_images, enrollment_report
+from app.services.face_gallery import update_cached_gallery, invalidate_user_gallery
+from app.services.face_prototypes import refresh_person_prototypes
+from app.services.blob_store import release_blobs, store_staged
+from app.services.upload_storage import stage_upload
 from datetime import datetime
 from bson import ObjectId
 
 router = APIRouter(prefix="/api/known-persons", tags=["Relatives"])
 
+
+async def _enroll_photo(image: UploadFile, person: Optional[KnownPerson] = None):
+    """
+    Stream one photo to disk, quality-gate and embed it, and keep it only if accepted.
+    
+    Returns:
+        (enrollment result, public /uploads path)
+    """
+    upload = await stage_upload(image)
+    try:
+        if person is None:
+            result = (await enroll_images([upload]))[0]
+        else:
+            # Deduplicate against the relative's existing photos
+            result = (await enroll_images(
+                [upload],
+                person.embedding_matrix(current_model_only=True),
+                [img.sha256 for img in person.images if img.sha256]
+            ))[0]
+        
+        if result["status"] != ENROLL_ACCEPTED:
+            return result, None
+        
+        # Stored under its content hash; identical photos share one file
+        return result, await store_staged(upload)
+    finally:
+        await upload.discard()
+
 @router.post("")
 async def create_relative(
     name: str = Form(...),
@@ -23,48 +54,15 @@ async def create_relative(
     """
     Create a new relative/known person with a face image.
     """
-    # Read image content
-    contents = await image.read()
-    
-    # Encode to base64 for storage/processing
-    image_base64 = base64.b64encode(contents).decode("utf-8")
-    
-    # Decode for face analysis
-    img_array = decode_base64_image(image_base64)
-    
-    if img_array is None:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid image format"
-        )
-        
-    # Extract embedding
-    embedding = extract_face_embedding(img_array)
+    # Stream, quality-gate and embed the photo
+    result, image_path = await _enroll_photo(image)
     
-    if embedding is None:
+    if result["status"] != ENROLL_ACCEPTED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No face detected in the image. Please try another photo."
+            detail=f"{result['reason']}. Please try another photo."
         )
         
-    # Save image to disk
-    import shutil
-    import os
-    import uuid
-    
-    # Create uploads directory if it doesn't exist
-    uploads_dir = "uploads"
-    os.makedirs(uploads_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(image.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(uploads_dir, unique_filename)
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
-        
     # Create person record
     person = KnownPerson(
         name=name,
@@ -74,17 +72,20 @@ async def create_relative(
         notes=notes,
         phone_number=phone_number,
         email=email,
-        face_embeddings=[embedding],
         images=[
             PersonImage(
                 filename=image.filename,
-                path=f"/uploads/{unique_filename}",
+                path=image_path,
+                sha256=result["sha256"],
                 uploaded_at=datetime.utcnow()
             )
         ]
     )
+    person.add_face_embedding(result["embedding"], result["quality"])
     
+    refresh_person_prototypes(person)
     await person.save()
+    await update_cached_gallery(person.for_user, person)
     
     # Return formatted response with explicit id
     return {
@@ -94,12 +95,13 @@ async def create_relative(
         "added_by": person.added_by,
         "for_user": person.for_user,
         "images": [img.model_dump() for img in person.images],
-        "has_face_embeddings": len(person.face_embeddings) > 0,
+        "has_face_embeddings": person.embedding_count > 0,
         "notes": person.notes,
         "phone_number": person.phone_number,
         "email": person.email,
         "created_at": person.created_at.isoformat(),
-        "updated_at": person.updated_at.isoformat()
+        "updated_at": person.updated_at.isoformat(),
+        "enrollment": enrollment_report([result])
     }
 
 @router.get("")
@@ -107,7 +109,9 @@ async def get_relatives(current_user: User = Depends(get_current_user)):
     """
     Get all relatives for the current user.
     """
-    persons = await KnownPerson.find(KnownPerson.for_user == str(current_user.id)).to_list()
+    persons = await KnownPerson.find(
+        KnownPerson.for_user == str(current_user.id)
+    ).project(KnownPersonSummary).to_list()
     
     # Format response with explicit id field
     return [
@@ -118,7 +122,7 @@ async def get_relatives(current_user: User = Depends(get_current_user)):
             "added_by": person.added_by,
             "for_user": person.for_user,
             "images": [img.model_dump() for img in person.images],
-            "has_face_embeddings": len(person.face_embeddings) > 0,
+            "has_face_embeddings": person.embedding_count > 0,
             "notes": person.notes,
             "phone_number": person.phone_number,
             "email": person.email,
@@ -133,7 +137,7 @@ async def get_relative(person_id: str, current_user: User = Depends(get_current_
     """
     Get a specific relative by ID.
     """
-    person = await KnownPerson.get(person_id)
+    person = await KnownPerson.get_summary(person_id)
     
     if not person:
         raise HTTPException(status_code=404, detail="Relative not found")
@@ -148,7 +152,7 @@ async def get_relative(person_id: str, current_user: User = Depends(get_current_
         "added_by": person.added_by,
         "for_user": person.for_user,
         "images": [img.model_dump() for img in person.images],
-        "has_face_embeddings": len(person.face_embeddings) > 0,
+        "has_face_embeddings": person.embedding_count > 0,
         "notes": person.notes,
         "phone_number": person.phone_number,
         "email": person.email,
@@ -189,6 +193,7 @@ async def update_relative(
         person.email = email
         
     await person.save()
+    invalidate_user_gallery(person.for_user)
     
     return {
         "id": str(person.id),
@@ -197,7 +202,7 @@ async def update_relative(
         "added_by": person.added_by,
         "for_user": person.for_user,
         "images": [img.model_dump() for img in person.images],
-        "has_face_embeddings": len(person.face_embeddings) > 0,
+        "has_face_embeddings": person.embedding_count > 0,
         "notes": person.notes,
         "phone_number": person.phone_number,
         "email": person.email,
@@ -219,6 +224,8 @@ async def delete_relative(person_id: str, current_user: User = Depends(get_curre
         raise HTTPException(status_code=403, detail="Not authorized to delete this relative")
         
     await person.delete()
+    invalidate_user_gallery(person.for_user)
+    await release_blobs(img.path for img in person.images)
     return {"message": "Relative deleted successfully"}
 
 @router.post("/{person_id}/photos")
@@ -238,48 +245,26 @@ async def add_relative_photo(
     if person.for_user != str(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to edit this relative")
         
-    # Process image
-    contents = await image.read()
-    image_base64 = base64.b64encode(contents).decode("utf-8")
-    img_array = decode_base64_image(image_base64)
+    # Process image, deduplicating against the relative's existing photos
+    result, image_path = await _enroll_photo(image, person)
     
-    if img_array is None:
-        raise HTTPException(status_code=400, detail="Invalid image format")
-        
-    embedding = extract_face_embedding(img_array)
-    
-    if embedding is None:
-        raise HTTPException(status_code=400, detail="No face detected in image")
-        
-    # Save image to disk
-    import shutil
-    import os
-    import uuid
-    
-    # Create uploads directory if it doesn't exist
-    uploads_dir = "uploads"
-    os.makedirs(uploads_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(image.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(uploads_dir, unique_filename)
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
+    if result["status"] != ENROLL_ACCEPTED:
+        raise HTTPException(status_code=400, detail=result["reason"])
         
     # Add embedding and image record
-    person.face_embeddings.append(embedding)
+    person.add_face_embedding(result["embedding"], result["quality"])
     person.images.append(
         PersonImage(
             filename=image.filename,
-            path=f"/uploads/{unique_filename}",
+            path=image_path,
+            sha256=result["sha256"],
             uploaded_at=datetime.utcnow()
         )
     )
     
+    refresh_person_prototypes(person)
     await person.save()
+    await update_cached_gallery(person.for_user, person)
     
     return {
         "id": str(person.id),
@@ -288,10 +273,11 @@ async def add_relative_photo(
         "added_by": person.added_by,
         "for_user": person.for_user,
         "images": [img.model_dump() for img in person.images],
-        "has_face_embeddings": len(person.face_embeddings) > 0,
+        "has_face_embeddings": person.embedding_count > 0,
         "notes": person.notes,
         "phone_number": person.phone_number,
         "email": person.email,
         "created_at": person.created_at.isoformat(),
-        "updated_at": person.updated_at.isoformat()
+        "updated_at": person.updated_at.isoformat(),
+        "enrollment": enrollment_report([result])
     }
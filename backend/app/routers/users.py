@@ -239,6 +239,18 @@ async def delete_account(
     for person in known_persons:
         await person.delete()
     
+    from app.services.face_gallery import invalidate_user_gallery
+    invalidate_user_gallery(str(user.id))
+    
+    # Delete user's audit frames
+    from app.models.audit_frame import AuditFrame
+    audit_frames = await AuditFrame.find(AuditFrame.user_id == str(user.id)).to_list()
+    await AuditFrame.find(AuditFrame.user_id == str(user.id)).delete()
+    
+    from app.services.blob_store import release_blobs
+    await release_blobs(img.path for person in known_persons for img in person.images)
+    await release_blobs(frame.image_ref for frame in audit_frames)
+    
     # Delete user account
     await user.delete()
     
@@ -4,9 +4,9 @@ Drishti AI - Auth Service
 Authentication business logic including Google OAuth.
 """
 
-import httpx
 from typing import Optional, Tuple
 from app.config import get_settings
+from app.services.http_clients import OAUTH, get_http_client
 from app.models.user import User, UserRole, AuthProvider
 from app.utils.security import hash_password, verify_password
 from app.utils.jwt import generate_token
@@ -81,67 +81,67 @@ async def google_auth(
     # If we have an authorization code, exchange it for tokens
     if code:
         try:
-            async with httpx.AsyncClient() as client:
-                # Exchange code for tokens
-                token_response = await client.post(
-                    "https://oauth2.googleapis.com/token",
-                    data={
-                        "code": code,
-                        "client_id": settings.google_client_id,
-                        "client_secret": settings.google_client_secret,
-                        "redirect_uri": f"{settings.frontend_url}/auth/google/callback",
-                        "grant_type": "authorization_code"
-                    }
-                )
-                
-                if token_response.status_code != 200:
-                    return None, None, f"Failed to exchange code: {token_response.text}"
-                
-                tokens = token_response.json()
-                access_token = tokens.get("access_token")
+            client = get_http_client(OAUTH)
+            # Exchange code for tokens
+            token_response = await client.post(
+                "https://oauth2.googleapis.com/token",
+                data={
+                    "code": code,
+                    "client_id": settings.google_client_id,
+                    "client_secret": settings.google_client_secret,
+                    "redirect_uri": f"{settings.frontend_url}/auth/google/callback",
+                    "grant_type": "authorization_code"
+                }
+            )
+            
+            if token_response.status_code != 200:
+                return None, None, f"Failed to exchange code: {token_response.text}"
+            
+            tokens = token_response.json()
+            access_token = tokens.get("access_token")
         except Exception as e:
             return None, None, f"Token exchange failed: {str(e)}"
     
     # Get user info using access token
     if access_token:
         try:
-            async with httpx.AsyncClient() as client:
-                user_info_response = await client.get(
-                    "https://www.googleapis.com/oauth2/v2/userinfo",
-                    headers={"Authorization": f"Bearer {access_token}"}
-                )
-                
-                if user_info_response.status_code != 200:
-                    return None, None, "Failed to get user info from Google"
-                
-                google_user_info = user_info_response.json()
+            client = get_http_client(OAUTH)
+            user_info_response = await client.get(
+                "https://www.googleapis.com/oauth2/v2/userinfo",
+                headers={"Authorization": f"Bearer {access_token}"}
+            )
+            
+            if user_info_response.status_code != 200:
+                return None, None, "Failed to get user info from Google"
+            
+            google_user_info = user_info_response.json()
         except Exception as e:
             return None, None, f"Failed to get user info: {str(e)}"
     
     # If we have an ID token, decode it
     elif id_token:
         try:
-            async with httpx.AsyncClient() as client:
-                # Verify token with Google
-                verify_response = await client.get(
-                    f"https://oauth2.googleapis.com/tokeninfo?id_token={id_token}"
-                )
-                
-                if verify_response.status_code != 200:
-                    return None, None, "Invalid ID token"
-                
-                token_info = verify_response.json()
-                
-                # Verify the token is for our app
-                if token_info.get("aud") != settings.google_client_id:
-                    return None, None, "Token not issued for this application"
-                
-                google_user_info = {
-                    "id": token_info.get("sub"),
-                    "email": token_info.get("email"),
-                    "name": token_info.get("name"),
-                    "verified_email": token_info.get("email_verified") == "true"
-                }
+            client = get_http_client(OAUTH)
+            # Verify token with Google
+            verify_response = await client.get(
+                f"https://oauth2.googleapis.com/tokeninfo?id_token={id_token}"
+            )
+            
+            if verify_response.status_code != 200:
+                return None, None, "Invalid ID token"
+            
+            token_info = verify_response.json()
+            
+            # Verify the token is for our app
+            if token_info.get("aud") != settings.google_client_id:
+                return None, None, "Token not issued for this application"
+            
+            google_user_info = {
+                "id": token_info.get("sub"),
+                "email": token_info.get("email"),
+                "name": token_info.get("name"),
+                "verified_email": token_info.get("email_verified") == "true"
+            }
         except Exception as e:
             return None, None, f"ID token verification failed: {str(e)}"
     
@@ -0,0 +1,319 @@
+"""
+Drishti AI - Content-Addressed Blob Store
+
+Stored images are named by their SHA-256 digest and sharded into two
+directory levels under /uploads/blobs (ab/cd/abcd....jpg), so identical
+uploads and repeated frames share one file and no directory grows flat.
+A blob is referenced by Alert.image_ref, KnownPerson.images[].path and
+AuditFrame.image_ref (until the audit frame's retention ends, if set); blobs with
+no references are deleted on release or by the garbage collector, once
+they are older than the grace period.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import aiofiles
+
+from app.config import get_settings
+from app.database import is_database_available
+from app.models.alert import Alert
+from app.models.audit_frame import AuditFrame
+from app.models.known_person import KnownPerson
+from app.services.upload_storage import (
+    UPLOADS_DIR,
+    StagedUpload,
+    clean_staging,
+    remove_if_stale,
+    remove_quietly,
+)
+
+
+BLOBS_DIR = os.path.join(UPLOADS_DIR, "blobs")
+BLOB_URL_PREFIX = "/uploads/blobs/"
+
+# Content-addressed like blobs, but never garbage collected: analyze frames
+# saved while MongoDB is unavailable, when no record can reference them
+UNTRACKED_FRAMES_DIRECTORY = "frames"
+
+_EXTENSION_ALIASES = {"jpeg": "jpg"}
+
+# Background writes from store_bytes_background(), held so they are not
+# garbage collected before finishing
+_pending_writes: set = set()
+
+
+def blob_extension(extension: Optional[str]) -> str:
+    """Normalize a file extension or image subtype ("jpeg" -> "jpg")."""
+    extension = (extension or "").lower().lstrip(".")
+    extension = "".join(c for c in extension if c.isalnum())[:8]
+    return _EXTENSION_ALIASES.get(extension, extension) or "jpg"
+
+
+def blob_relpath(sha256: str, extension: str, directory: str = "blobs") -> str:
+    """Sharded path of a blob relative to /uploads."""
+    return f"{directory}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{blob_extension(extension)}"
+
+
+def is_blob_path(path: Optional[str]) -> bool:
+    """Whether a public /uploads path points into the blob store."""
+    return bool(path) and path.startswith(BLOB_URL_PREFIX)
+
+
+def _claim_existing(filepath: str) -> bool:
+    """Refresh an existing blob's mtime so a concurrent GC pass keeps it."""
+    try:
+        os.utime(filepath)
+        return True
+    except OSError:
+        return False
+
+
+async def store_bytes(data, extension: str) -> str:
+    """
+    Store encoded image bytes, reusing the blob if the content already exists.
+
+    Args:
+        data: Encoded image bytes
+        extension: File extension or image subtype (e.g. "jpeg")
+
+    Returns:
+        Public path of the blob ("/uploads/blobs/...")
+    """
+    relpath = blob_relpath(hashlib.sha256(data).hexdigest(), extension)
+    await _write_blob(relpath, data)
+    return f"/uploads/{relpath}"
+
+
+def store_bytes_background(data, extension: str, directory: str = "blobs") -> str:
+    """
+    Like store_bytes(), but return the blob path at once and write it in a task.
+
+    The path is derived from the content hash, so it can be referenced
+    (e.g. by an alert) before the write finishes. Failures are logged.
+    Pass directory=UNTRACKED_FRAMES_DIRECTORY for files nothing will reference.
+    """
+    relpath = blob_relpath(hashlib.sha256(data).hexdigest(), extension, directory)
+
+    async def write() -> None:
+        try:
+            await _write_blob(relpath, data)
+        except Exception as e:
+            print(f"Failed to save image {relpath}: {e}")
+
+    task = asyncio.create_task(write())
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
+    return f"/uploads/{relpath}"
+
+
+async def wait_for_pending_writes() -> None:
+    """Wait for background blob writes (called on shutdown)."""
+    if _pending_writes:
+        await asyncio.gather(*list(_pending_writes), return_exceptions=True)
+
+
+async def _write_blob(relpath: str, data) -> None:
+    filepath = os.path.join(UPLOADS_DIR, relpath)
+
+    if not await asyncio.to_thread(_claim_existing, filepath):
+        await asyncio.to_thread(os.makedirs, os.path.dirname(filepath), exist_ok=True)
+        # Write under a temporary name so readers never see a partial blob
+        temp_path = f"{filepath}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            async with aiofiles.open(temp_path, "wb") as out:
+                await out.write(data)
+            await asyncio.to_thread(os.replace, temp_path, filepath)
+        except BaseException:
+            await asyncio.to_thread(remove_quietly, temp_path)
+            raise
+
+
+async def store_staged(upload: StagedUpload) -> str:
+    """
+    Move a staged upload into the blob store under its SHA-256 digest.
+
+    If the blob already exists the staged file is left for the caller's
+    discard_uploads() and the existing blob is reused.
+
+    Returns:
+        Public path of the blob ("/uploads/blobs/...")
+    """
+    relpath = blob_relpath(upload.sha256, upload.extension)
+    filepath = os.path.join(UPLOADS_DIR, relpath)
+
+    if await asyncio.to_thread(_claim_existing, filepath):
+        return f"/uploads/{relpath}"
+
+    await asyncio.to_thread(os.makedirs, os.path.dirname(filepath), exist_ok=True)
+    return await upload.commit(relpath)
+
+
+def _audit_frame_cutoff() -> Optional[datetime]:
+    """Creation time before which audit frames have expired (None: kept forever)."""
+    days = get_settings().analyze_frame_retention_days
+    return datetime.utcnow() - timedelta(days=days) if days > 0 else None
+
+
+def _live_audit_frames(query: dict) -> dict:
+    cutoff = _audit_frame_cutoff()
+    return {**query, "created_at": {"$gte": cutoff}} if cutoff else query
+
+
+async def blob_reference_count(path: str) -> int:
+    """Number of alerts, known persons and unexpired audit frames referencing a blob."""
+    alerts = await Alert.find({"image_ref": path}).count()
+    persons = await KnownPerson.find({"images.path": path}).count()
+    frames = await AuditFrame.find(_live_audit_frames({"image_ref": path})).count()
+    return alerts + persons + frames
+
+
+async def release_blobs(paths: Iterable[Optional[str]]) -> int:
+    """
+    Delete blobs that are no longer referenced after a document was removed.
+
+    Blobs stored within the grace period are left to the garbage collector,
+    since a concurrent request may be about to reference them.
+
+    Args:
+        paths: Public paths the removed document referenced
+
+    Returns:
+        Number of blobs deleted
+    """
+    grace_seconds = get_settings().upload_gc_grace_seconds
+    deleted = 0
+    for path in set(p for p in paths if is_blob_path(p)):
+        if await blob_reference_count(path):
+            continue
+        filepath = os.path.join(UPLOADS_DIR, path[len("/uploads/"):])
+        if await asyncio.to_thread(remove_if_stale, filepath, grace_seconds):
+            deleted += 1
+    return deleted
+
+
+def _scan_blobs() -> list:
+    """(public path, filesystem path) of every blob on disk."""
+    blobs = []
+    for root, _dirs, files in os.walk(BLOBS_DIR):
+        for name in files:
+            filepath = os.path.join(root, name)
+            relpath = os.path.relpath(filepath, UPLOADS_DIR).replace(os.sep, "/")
+            blobs.append((f"/uploads/{relpath}", filepath))
+    return blobs
+
+
+def _prune_empty_shards() -> None:
+    # Bottom-up, so a parent emptied by removing its last shard goes too
+    for root, _dirs, _files in os.walk(BLOBS_DIR, topdown=False):
+        if root != BLOBS_DIR:
+            try:
+                os.rmdir(root)  # Fails (and is skipped) unless empty
+            except OSError:
+                pass
+
+
+async def _referenced_blobs() -> set:
+    blob_filter = {"$regex": f"^{BLOB_URL_PREFIX}"}
+    alert_refs = await Alert.distinct("image_ref", {"image_ref": blob_filter})
+    person_refs = await KnownPerson.distinct("images.path", {"images.path": blob_filter})
+    frame_refs = await AuditFrame.distinct("image_ref", _live_audit_frames({"image_ref": blob_filter}))
+    return set(alert_refs) | set(person_refs) | set(frame_refs)
+
+
+async def _expire_audit_frames() -> int:
+    """Delete audit frame records past their retention; returns how many."""
+    cutoff = _audit_frame_cutoff()
+    if cutoff is None:
+        return 0
+    result = await AuditFrame.find({"created_at": {"$lt": cutoff}}).delete()
+    return result.deleted_count if result else 0
+
+
+async def collect_garbage(dry_run: bool = False, grace_seconds: Optional[float] = None) -> dict:
+    """
+    Delete unreferenced blobs and abandoned staging files.
+
+    Files modified within the grace period are kept: they may belong to a
+    request that has stored the file but not yet saved its document. Audit
+    frames past ANALYZE_FRAME_RETENTION_DAYS no longer count as references,
+    and their records are deleted.
+
+    Args:
+        dry_run: Only report what would be deleted
+        grace_seconds: Minimum age of deleted files (defaults to settings)
+
+    Returns:
+        Counts of scanned, referenced, deleted and recently stored blobs,
+        expired audit frames, removed staging files and freed bytes
+    """
+    if grace_seconds is None:
+        grace_seconds = get_settings().upload_gc_grace_seconds
+
+    # List files before querying references, so a blob stored and referenced
+    # in between is either not seen or seen as referenced
+    blobs = await asyncio.to_thread(_scan_blobs)
+    referenced = await _referenced_blobs()
+
+    now = time.time()
+    unreferenced = [filepath for path, filepath in blobs if path not in referenced]
+    stats = {
+        "scanned": len(blobs),
+        "referenced": len(blobs) - len(unreferenced),
+        "deleted": 0,
+        "recent": 0,
+        "auditFramesExpired": 0,
+        "stagingRemoved": 0,
+        "freedBytes": 0,
+        "dryRun": dry_run,
+    }
+
+    for filepath in unreferenced:
+        if dry_run:
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            if now - stat.st_mtime < grace_seconds:
+                stats["recent"] += 1
+            else:
+                stats["deleted"] += 1
+                stats["freedBytes"] += stat.st_size
+            continue
+
+        freed = await asyncio.to_thread(remove_if_stale, filepath, grace_seconds)
+        if freed:
+            stats["deleted"] += 1
+            stats["freedBytes"] += freed
+        else:
+            stats["recent"] += 1
+
+    if not dry_run:
+        stats["stagingRemoved"] = await clean_staging(grace_seconds)
+        stats["auditFramesExpired"] = await _expire_audit_frames()
+        await asyncio.to_thread(_prune_empty_shards)
+    return stats
+
+
+async def run_periodic_gc() -> None:
+    """Background loop running collect_garbage every upload_gc_interval_seconds."""
+    interval = get_settings().upload_gc_interval_seconds
+    while True:
+        await asyncio.sleep(interval)
+        if not is_database_available():
+            # Without references every blob would look unreferenced
+            continue
+        try:
+            stats = await collect_garbage()
+            if stats["deleted"] or stats["stagingRemoved"]:
+                print(
+                    f"🧹 Upload GC removed {stats['deleted']} blobs and "
+                    f"{stats['stagingRemoved']} staging files ({stats['freedBytes'] // 1024} KB)"
+                )
+        except Exception as e:
+            print(f"⚠️ Upload GC failed: {e}")
@@ -0,0 +1,160 @@
+"""
+Drishti AI - Circuit Breakers
+
+Per-engine and per-model circuit breakers for the vision backends. Each
+breaker keeps a rolling window of recent call outcomes; when too many of
+them fail or are slow it opens, and calls are skipped instead of paying a
+connect or timeout penalty. After a cool-down a single probe call is let
+through (half-open): success closes the breaker, failure re-opens it with
+a doubled cool-down.
+"""
+
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from app.config import get_settings
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one upstream engine or model."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._outcomes = deque(maxlen=max(get_settings().vision_breaker_window, 1))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._open_seconds = 0.0
+        self._probe_started: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._open_seconds:
+            self._state = HALF_OPEN
+            self._probe_started = None
+        return self._state
+
+    def available(self) -> bool:
+        """Whether calls may currently go through (without claiming a probe)."""
+        state = self.state
+        if state == HALF_OPEN:
+            return not self._probe_in_flight()
+        return state == CLOSED
+
+    def allow(self) -> bool:
+        """Claim permission for one call; in half-open state only one probe at a time."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight():
+            self._probe_started = time.monotonic()
+            return True
+        return False
+
+    def release(self) -> None:
+        """Give back an allow() that led to no call, so a half-open probe is not held."""
+        if self._state == HALF_OPEN:
+            self._probe_started = None
+
+    def record_success(self, latency: float) -> None:
+        """Record a completed call; slow successes count against the slow-call rate."""
+        if self._state == HALF_OPEN:
+            self._close()
+        self._outcomes.append((True, latency))
+        # Only a slow success can trip the breaker; a fast one never should
+        if latency >= get_settings().vision_breaker_slow_call_seconds:
+            self._evaluate()
+
+    def record_failure(self, error: str, latency: Optional[float] = None) -> None:
+        """Record an upstream failure (connect error, timeout, 5xx, 429)."""
+        self._last_error = error
+        if self._state == HALF_OPEN:
+            self._open(self._open_seconds * 2)
+            return
+        self._outcomes.append((False, latency))
+        self._evaluate()
+
+    def snapshot(self) -> dict:
+        """State and window statistics for /api/model/health."""
+        state = self.state
+        calls = len(self._outcomes)
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        latencies = sorted(latency for ok, latency in self._outcomes if ok)
+        return {
+            "state": state,
+            "calls": calls,
+            "failureRate": round(failures / calls, 3) if calls else 0.0,
+            "p95LatencyMs": int(latencies[int(0.95 * (len(latencies) - 1))] * 1000) if latencies else None,
+            "retryInSeconds": round(max(self._opened_at + self._open_seconds - time.monotonic(), 0), 1)
+            if state == OPEN else None,
+            "trips": self._trips,
+            "lastError": self._last_error,
+        }
+
+    def _probe_in_flight(self) -> bool:
+        # A probe that never reported back (e.g. cancelled by hedging) expires
+        timeout = get_settings().vision_breaker_open_seconds
+        return self._probe_started is not None and time.monotonic() - self._probe_started < timeout
+
+    def _evaluate(self) -> None:
+        settings = get_settings()
+        calls = len(self._outcomes)
+        if self._state != CLOSED or calls < settings.vision_breaker_min_calls:
+            return
+
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        slow = sum(
+            1 for ok, latency in self._outcomes
+            if ok and latency >= settings.vision_breaker_slow_call_seconds
+        )
+        if (
+            failures / calls >= settings.vision_breaker_failure_rate
+            or slow / calls >= settings.vision_breaker_slow_call_rate
+        ):
+            self._open(settings.vision_breaker_open_seconds)
+
+    def _open(self, seconds: float) -> None:
+        settings = get_settings()
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._open_seconds = min(
+            max(seconds, settings.vision_breaker_open_seconds),
+            settings.vision_breaker_max_open_seconds
+        )
+        self._probe_started = None
+        self._trips += 1
+        print(f"⚡ Circuit breaker {self.name} opened for {self._open_seconds:.0f}s: {self._last_error or 'slow calls'}")
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._open_seconds = 0.0
+        self._probe_started = None
+        self._outcomes.clear()
+        print(f"✅ Circuit breaker {self.name} closed")
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Breaker for an engine ("gemini", "ollama") or model ("gemini:<model>")."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def breaker_snapshots(prefix: str) -> Dict[str, dict]:
+    """Snapshots of every breaker whose name starts with prefix, keyed by the rest."""
+    return {
+        name[len(prefix):]: breaker.snapshot()
+        for name, breaker in _breakers.items()
+        if name.startswith(prefix)
+    }
@@ -0,0 +1,221 @@
+"""
+Drishti AI - Face Enrollment
+
+Quality-gated enrollment of known-person photos. Uploads are decoded,
+scored (face size, blur, pose, detector confidence) and embedded
+concurrently on the inference executor; poor samples are rejected or
+down-weighted, and byte-identical files and near-identical embeddings are
+dropped.
+"""
+
+import asyncio
+import cv2
+import numpy as np
+from typing import Iterable, List, Optional, Tuple
+
+from app.config import get_settings
+from app.services.face_service import decode_image_bytes, detect_faces
+from app.services.inference_executor import run_inference
+from app.services.upload_storage import StagedUpload
+from app.utils.vectors import normalize_rows
+
+
+ENROLL_ACCEPTED = "accepted"
+ENROLL_REJECTED = "rejected"
+ENROLL_DUPLICATE = "duplicate"
+
+# Blur is measured on the face crop resized to the recognizer's input size
+BLUR_CROP_SIZE = 112
+
+
+def face_quality_metrics(image: np.ndarray, face) -> dict:
+    """
+    Measure enrollment quality of one detected face.
+
+    Args:
+        image: numpy array (BGR format) the face was detected in
+        face: InsightFace Face with bbox, kps and det_score
+
+    Returns:
+        Dict with face_size (px), blur (Laplacian variance), yaw (nose offset
+        from the eye midpoint as a fraction of eye distance) and det_score
+    """
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = [int(round(v)) for v in face.bbox]
+    x1, y1 = max(x1, 0), max(y1, 0)
+    x2, y2 = min(x2, width), min(y2, height)
+    face_size = float(min(x2 - x1, y2 - y1)) if x2 > x1 and y2 > y1 else 0.0
+
+    blur = 0.0
+    if face_size > 0:
+        gray = cv2.cvtColor(image[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        gray = cv2.resize(gray, (BLUR_CROP_SIZE, BLUR_CROP_SIZE), interpolation=cv2.INTER_AREA)
+        blur = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    yaw = 0.0
+    if getattr(face, "kps", None) is not None:
+        left_eye, right_eye, nose = face.kps[0], face.kps[1], face.kps[2]
+        eye_distance = float(np.linalg.norm(right_eye - left_eye))
+        if eye_distance > 0:
+            yaw = float((nose[0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance)
+
+    return {
+        "face_size": face_size,
+        "blur": blur,
+        "yaw": yaw,
+        "det_score": float(face.det_score),
+    }
+
+
+def quality_gate(metrics: dict) -> Tuple[Optional[str], float]:
+    """
+    Decide whether a face is good enough to enroll.
+
+    Faces failing a hard threshold are rejected. Accepted faces get a weight
+    in [0.5, 1.0]: 0.5 just past a threshold, 1.0 once every metric is
+    comfortably clear of it.
+
+    Returns:
+        (rejection reason or None, quality weight)
+    """
+    settings = get_settings()
+
+    if metrics["det_score"] < settings.face_enroll_min_det_score:
+        return "Face detection confidence too low", 0.0
+    if metrics["face_size"] < settings.face_enroll_min_face_size:
+        return "Face too small; move closer or use a higher resolution photo", 0.0
+    if metrics["blur"] < settings.face_enroll_min_blur:
+        return "Photo too blurry", 0.0
+    if abs(metrics["yaw"]) > settings.face_enroll_max_yaw:
+        return "Face not looking at the camera", 0.0
+
+    min_det_score = min(settings.face_enroll_min_det_score, 0.99)
+    factors = [
+        0.5 + 0.5 * (metrics["det_score"] - min_det_score) / (1.0 - min_det_score),
+        metrics["face_size"] / (2 * max(settings.face_enroll_min_face_size, 1)),
+        metrics["blur"] / (2 * max(settings.face_enroll_min_blur, 1e-6)),
+        1.0 - 0.5 * abs(metrics["yaw"]) / max(settings.face_enroll_max_yaw, 1e-6),
+    ]
+    return None, float(np.clip(min(factors), 0.5, 1.0))
+
+
+def analyze_enrollment_image(image_data: bytes, gate: bool = True) -> dict:
+    """
+    Decode, score and embed one enrollment photo (blocking).
+
+    The largest face in the photo is the one enrolled.
+
+    Args:
+        image_data: Encoded image bytes
+        gate: Reject faces failing the quality thresholds; when False any
+            detected face is accepted (at the minimum weight if it fails)
+
+    Returns:
+        Result dict with status, reason, quality, metrics and embedding
+    """
+    image = decode_image_bytes(image_data)
+    if image is None:
+        return {"status": ENROLL_REJECTED, "reason": "Invalid image format"}
+
+    faces = detect_faces(image)
+    if not faces:
+        return {"status": ENROLL_REJECTED, "reason": "No face detected in the image"}
+
+    face = max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+    metrics = face_quality_metrics(image, face)
+    reason, quality = quality_gate(metrics)
+    if reason and not gate:
+        reason, quality = None, 0.5
+
+    result = {
+        "status": ENROLL_REJECTED if reason else ENROLL_ACCEPTED,
+        "reason": reason,
+        "quality": round(quality, 3),
+        "faces_detected": len(faces),
+        "metrics": {name: round(value, 3) for name, value in metrics.items()},
+    }
+    if reason is None:
+        result["embedding"] = face.embedding.tolist()
+    return result
+
+
+def analyze_enrollment_file(path: str, gate: bool = True) -> dict:
+    """Read a stored or staged photo and analyze it (blocking)."""
+    try:
+        # np.fromfile also copes with non-ASCII paths on Windows
+        image_data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return {"status": ENROLL_REJECTED, "reason": "Image file not found"}
+    return analyze_enrollment_image(image_data, gate)
+
+
+async def enroll_images(
+    uploads: List[StagedUpload],
+    existing_embeddings: Optional[np.ndarray] = None,
+    existing_hashes: Iterable[str] = ()
+) -> List[dict]:
+    """
+    Run the enrollment pipeline over uploaded photos.
+
+    Files whose SHA-256 matches an earlier upload or one of the person's
+    images are reported as duplicates without running inference. The rest
+    are analyzed concurrently (bounded by the inference worker count), then
+    accepted embeddings are deduplicated, best quality first, against each
+    other and the person's existing embeddings.
+
+    Args:
+        uploads: Staged upload files
+        existing_embeddings: (n, dim) embeddings the person already has
+        existing_hashes: SHA-256 digests of the person's stored images
+
+    Returns:
+        One result dict per upload, in upload order. Accepted results carry
+        "embedding" and "quality"; see enrollment_report() for responses.
+    """
+    settings = get_settings()
+    semaphore = asyncio.Semaphore(max(settings.face_inference_workers, 1))
+
+    async def analyze(upload: StagedUpload) -> dict:
+        async with semaphore:
+            return await run_inference(analyze_enrollment_file, upload.path)
+
+    results: List[Optional[dict]] = [None] * len(uploads)
+    seen_hashes = set(existing_hashes)
+    pending = []
+    for i, upload in enumerate(uploads):
+        if upload.sha256 in seen_hashes:
+            results[i] = {"status": ENROLL_DUPLICATE, "reason": "Same file as a photo already enrolled"}
+        else:
+            seen_hashes.add(upload.sha256)
+            pending.append(i)
+
+    analyzed = await asyncio.gather(*(analyze(uploads[i]) for i in pending))
+    for i, result in zip(pending, analyzed):
+        results[i] = result
+    for result, upload in zip(results, uploads):
+        result["filename"] = upload.original_name
+        result["sha256"] = upload.sha256
+
+    kept = []
+    if existing_embeddings is not None and len(existing_embeddings):
+        kept = list(normalize_rows(np.asarray(existing_embeddings, dtype=np.float32)))
+
+    accepted = [r for r in results if r["status"] == ENROLL_ACCEPTED]
+    for result in sorted(accepted, key=lambda r: -r["quality"]):
+        vector = normalize_rows(np.asarray([result["embedding"]], dtype=np.float32))[0]
+        if kept and float(np.max(np.stack(kept) @ vector)) >= settings.face_enroll_dedupe_similarity:
+            result["status"] = ENROLL_DUPLICATE
+            result["reason"] = "Near-identical to a photo already enrolled"
+            del result["embedding"]
+            continue
+        kept.append(vector)
+
+    return results
+
+
+def enrollment_report(results: List[dict]) -> List[dict]:
+    """Per-file enrollment status for API responses (without embeddings)."""
+    return [
+        {key: value for key, value in result.items() if key != "embedding"}
+        for result in results
+    ]
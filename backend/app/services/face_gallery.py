@@ -0,0 +1,517 @@
+"""
+Drishti AI - Face Gallery
+
+Per-user matrix of known-person face embeddings for fast identification.
+"""
+
+import copy
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Optional, List, Tuple
+
+from app.config import get_settings
+from app.models.known_person import KnownPerson
+from app.services.face_prototypes import person_gallery_rows, person_genuine_similarity
+from app.services.inference_executor import InferenceBusyError, run_inference
+from app.utils.vectors import normalize_rows, spherical_kmeans
+
+
+# In-process LRU cache of galleries keyed by user ID
+_gallery_cache: "OrderedDict[str, FaceGallery]" = OrderedDict()
+
+# Per-user write counter, bumped on every invalidation so a load that raced
+# a write is not cached. Only users with a load in flight have an entry
+# (counted in _gallery_loads), so neither dict outgrows the loads running.
+_gallery_versions: Dict[str, int] = {}
+_gallery_loads: Dict[str, int] = {}
+
+# Rows sampled when estimating impostor similarity for threshold calibration
+CALIBRATION_MAX_ROWS = 2000
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over gallery rows.
+
+    Rows are clustered with spherical k-means; a query only scores the rows
+    in its ``n_probe`` closest clusters instead of the whole gallery.
+    """
+
+    def __init__(self, centroids: np.ndarray, lists: List[np.ndarray]):
+        self.centroids = centroids
+        self.lists = lists
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """
+        Cluster normalized rows into n_lists inverted lists.
+
+        Args:
+            matrix: (rows, dim) L2-normalized embeddings
+            n_lists: Number of clusters
+            iterations: k-means iterations
+            seed: Random seed for centroid initialization
+
+        Returns:
+            IVFIndex over row numbers of matrix
+        """
+        centroids, assignments = spherical_kmeans(matrix, n_lists, iterations, seed)
+        lists = [np.flatnonzero(assignments == c).astype(np.int32) for c in range(len(centroids))]
+        return cls(centroids, lists)
+
+    def add(self, row_ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Assign new rows to their nearest existing cluster."""
+        assignments = np.argmax(vectors @ self.centroids.T, axis=1)
+        for c in np.unique(assignments):
+            self.lists[c] = np.concatenate([self.lists[c], row_ids[assignments == c]])
+
+    def remap(self, new_ids: np.ndarray) -> None:
+        """Renumber rows after removal; rows mapped to -1 are dropped."""
+        self.lists = [new_ids[rows][new_ids[rows] >= 0] for rows in self.lists]
+
+    def candidates(self, query: np.ndarray, n_probe: int) -> np.ndarray:
+        """Row numbers in the n_probe clusters closest to a normalized query."""
+        n_probe = min(n_probe, len(self.lists))
+        closest = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        return np.concatenate([self.lists[c] for c in closest])
+
+
+class FaceGallery:
+    """
+    All face embeddings of one user's known persons as a single matrix.
+
+    Rows are L2-normalized float32 embeddings stored contiguously, and
+    ``row_person`` maps each row back to an index into ``persons``, so a
+    query is one matrix-vector product followed by an argmax. Galleries of
+    at least ``face_ann_min_rows`` rows also get an IVFIndex so queries
+    only score a few clusters; smaller galleries use exact search.
+
+    Each gallery calibrates its own acceptance threshold from the
+    similarity between different persons' rows (impostor) and the genuine
+    similarity of each person's photos, see ``decide()``.
+    """
+
+    def __init__(
+        self,
+        persons: List[dict],
+        matrix: np.ndarray,
+        row_person: np.ndarray,
+        genuine: Optional[List[Optional[float]]] = None
+    ):
+        self.persons = persons
+        self.matrix = matrix
+        self.row_person = row_person
+        self.index: Optional[IVFIndex] = None
+        self.threshold = get_settings().face_match_min_confidence
+        self._person_rows = {person["id"]: i for i, person in enumerate(persons)}
+        self._genuine = dict(enumerate(genuine or []))
+        self._maybe_build_index()
+        self._calibrate()
+
+    @classmethod
+    def from_persons(cls, known_persons: List[dict]) -> "FaceGallery":
+        """
+        Build a gallery from known persons.
+
+        Args:
+            known_persons: List of dicts with id, name, relationship,
+                face_embeddings (an (n, dim) array or a list of embeddings)
+                and optional genuine_similarity
+
+        Returns:
+            FaceGallery (possibly empty)
+        """
+        persons = []
+        rows = []
+        row_person = []
+        genuine = []
+
+        for person in known_persons:
+            embeddings = np.asarray(person.get("face_embeddings", []), dtype=np.float32)
+            if embeddings.size == 0:
+                continue
+            embeddings = embeddings.reshape(len(embeddings), -1)
+
+            person_index = len(persons)
+            persons.append(_person_info(person))
+            genuine.append(person.get("genuine_similarity"))
+            rows.append(embeddings)
+            row_person.extend([person_index] * len(embeddings))
+
+        if not rows:
+            return cls([], np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int32))
+
+        matrix = np.ascontiguousarray(normalize_rows(np.vstack(rows)), dtype=np.float32)
+        return cls(persons, matrix, np.asarray(row_person, dtype=np.int32), genuine)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self) == 0
+
+    def set_person_rows(self, person: dict, embeddings) -> None:
+        """
+        Replace a (new or existing) person's rows in place.
+
+        Remaining rows keep their index clusters and new rows are assigned
+        to the nearest existing cluster; the index is built once the
+        gallery first crosses the ANN threshold.
+
+        Args:
+            person: Dict with id, name, relationship and optional
+                genuine_similarity
+            embeddings: (n, dim) array or list of raw embeddings
+        """
+        info = _person_info(person)
+        person_index = self._person_rows.get(info["id"])
+        if person_index is None:
+            person_index = len(self.persons)
+            self.persons.append(info)
+            self._person_rows[info["id"]] = person_index
+        else:
+            self.persons[person_index] = info
+            self._remove_rows(self.row_person == person_index)
+        self._genuine[person_index] = person.get("genuine_similarity")
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.size == 0:
+            self._calibrate()
+            return
+        vectors = normalize_rows(vectors.reshape(len(vectors), -1))
+
+        first_row = len(self)
+        if self.is_empty:
+            self.matrix = np.ascontiguousarray(vectors)
+        else:
+            self.matrix = np.ascontiguousarray(np.vstack([self.matrix, vectors]))
+        self.row_person = np.concatenate([
+            self.row_person,
+            np.full(len(vectors), person_index, dtype=np.int32)
+        ])
+
+        if self.index is not None:
+            self.index.add(np.arange(first_row, len(self), dtype=np.int32), vectors)
+        else:
+            self._maybe_build_index()
+        self._calibrate()
+
+    def with_person_rows(self, person: dict, embeddings) -> "FaceGallery":
+        """
+        Copy of this gallery with one person's rows replaced (see set_person_rows).
+
+        The copy shares no mutable state with this gallery, so it can be
+        built on a worker thread while requests keep searching the original.
+        """
+        updated = copy.copy(self)
+        updated.persons = list(self.persons)
+        updated._person_rows = dict(self._person_rows)
+        updated._genuine = dict(self._genuine)
+        if self.index is not None:
+            updated.index = IVFIndex(self.index.centroids, list(self.index.lists))
+        updated.set_person_rows(person, embeddings)
+        return updated
+
+    def _remove_rows(self, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        keep = ~mask
+        if self.index is not None:
+            new_ids = np.full(len(self), -1, dtype=np.int32)
+            new_ids[keep] = np.arange(int(keep.sum()), dtype=np.int32)
+            self.index.remap(new_ids)
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+        self.row_person = self.row_person[keep]
+
+    def _maybe_build_index(self) -> None:
+        settings = get_settings()
+        if settings.face_ann_min_rows > 0 and len(self) >= settings.face_ann_min_rows:
+            self.index = IVFIndex.build(self.matrix, n_lists=int(np.sqrt(len(self))))
+
+    def _calibrate(self) -> None:
+        """
+        Set the acceptance threshold from this gallery's similarity distribution.
+
+        The threshold sits above the highest similarities seen between
+        different persons, halfway to the low end of same-person
+        similarities when the two are separated, clipped to the configured
+        floor and ceiling. Without impostor data the floor is used.
+        """
+        settings = get_settings()
+        # Work in cosine similarity; confidences are (cosine + 1) / 2
+        floor = 2 * settings.face_match_min_confidence - 1
+        ceiling = max(2 * settings.face_match_max_confidence - 1, floor)
+
+        threshold = floor
+        impostor = self._impostor_similarity()
+        if impostor is not None:
+            threshold = impostor
+            genuine = [g for g in self._genuine.values() if g is not None]
+            if genuine:
+                genuine_low = float(np.percentile(genuine, 10))
+                if genuine_low > impostor:
+                    threshold = (impostor + genuine_low) / 2
+
+        self.threshold = (float(np.clip(threshold, floor, ceiling)) + 1) / 2
+
+    def _impostor_similarity(self) -> Optional[float]:
+        """99th percentile of each row's best similarity to another person's rows."""
+        rows = np.arange(len(self))
+        if len(rows) > CALIBRATION_MAX_ROWS:
+            rows = np.random.default_rng(0).choice(rows, CALIBRATION_MAX_ROWS, replace=False)
+
+        owners = self.row_person[rows]
+        if len(np.unique(owners)) < 2:
+            return None
+
+        matrix = self.matrix[rows]
+        similarities = matrix @ matrix.T
+        similarities[owners[:, None] == owners[None, :]] = -np.inf
+        return float(np.percentile(similarities.max(axis=1), 99))
+
+    def match(self, query_embedding: List[float]) -> Tuple[Optional[dict], float]:
+        """
+        Find the closest known person for a query embedding.
+
+        Args:
+            query_embedding: Raw (unnormalized) embedding
+
+        Returns:
+            (person dict or None, confidence in [0, 1])
+        """
+        return self.match_many([query_embedding])[0]
+
+    def match_many(self, query_embeddings) -> List[Tuple[Optional[dict], float]]:
+        """
+        Find the closest known person for several query embeddings at once.
+
+        Args:
+            query_embeddings: (n, dim) array or list of raw embeddings
+
+        Returns:
+            List of (person dict or None, confidence in [0, 1]) per query
+        """
+        return [
+            candidates[0] if candidates else (None, 0.0)
+            for candidates in self.search_many(query_embeddings, k=1)
+        ]
+
+    def search_many(self, query_embeddings, k: int = 2) -> List[List[Tuple[dict, float]]]:
+        """
+        Find the k closest distinct persons for several query embeddings.
+
+        Args:
+            query_embeddings: (n, dim) array or list of raw embeddings
+            k: Number of persons to return per query
+
+        Returns:
+            Per query, up to k (person dict, confidence in [0, 1]) pairs,
+            best first (empty for an empty gallery or a zero embedding)
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.size == 0:
+            return []
+        queries = queries.reshape(len(queries), -1)
+
+        if self.is_empty:
+            return [[] for _ in queries]
+
+        valid = np.linalg.norm(queries, axis=1) > 0
+        queries = normalize_rows(queries)
+        k = max(k, 1)
+
+        if self.index is None:
+            # (rows, dim) @ (dim, n) -> similarity of every row to every query
+            similarities = self.matrix @ queries.T
+
+        results = []
+        for i, query in enumerate(queries):
+            if not valid[i]:
+                results.append([])
+                continue
+
+            rows = None
+            if self.index is not None:
+                rows = self.index.candidates(query, max(get_settings().face_ann_n_probe, 1))
+                if len(rows) == 0:
+                    # Probed clusters emptied by removals: fall back to exact search
+                    rows = None
+            if rows is not None:
+                scores = self.matrix[rows] @ query
+            elif self.index is not None:
+                scores = self.matrix @ query
+            else:
+                scores = similarities[:, i]
+
+            results.append([
+                # Convert from [-1, 1] to [0, 1] to match cosine_similarity()
+                (self.persons[person_index], min(float((score + 1) / 2), 1.0))
+                for person_index, score in self._top_persons(rows, scores, k)
+            ])
+        return results
+
+    def _top_persons(self, rows: Optional[np.ndarray], scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Best score per person among scored rows, top k persons first."""
+        owners = self.row_person if rows is None else self.row_person[rows]
+        if len(scores) == 0:
+            return []
+
+        if k == 1:
+            best = int(np.argmax(scores))
+            return [(int(owners[best]), float(scores[best]))]
+
+        person_scores = np.full(len(self.persons), -np.inf, dtype=np.float32)
+        np.maximum.at(person_scores, owners, scores)
+        k = min(k, int(np.isfinite(person_scores).sum()))
+        top = np.argpartition(-person_scores, k - 1)[:k]
+        top = top[np.argsort(-person_scores[top])]
+        return [(int(p), float(person_scores[p])) for p in top]
+
+    def decide(self, candidates: List[Tuple[dict, float]], threshold: Optional[float] = None) -> dict:
+        """
+        Accept or reject the best candidate for a query.
+
+        The best person must reach the threshold (the gallery's calibrated
+        one unless overridden) and beat the second-best person by at least
+        ``face_match_margin``, so near-ties between two known persons are
+        reported as unidentified instead of guessed.
+
+        Args:
+            candidates: Output of search_many() for one query
+            threshold: Optional confidence threshold override
+
+        Returns:
+            dict with identified, person, confidence, margin and threshold
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if not candidates:
+            return {"identified": False, "person": None, "confidence": 0.0, "margin": 0.0, "threshold": threshold}
+
+        best_person, best_confidence = candidates[0]
+        second_confidence = candidates[1][1] if len(candidates) > 1 else 0.0
+        margin = best_confidence - second_confidence
+
+        identified = best_confidence >= threshold and margin >= get_settings().face_match_margin
+        return {
+            "identified": identified,
+            "person": best_person if identified else None,
+            "confidence": best_confidence,
+            "margin": margin,
+            "threshold": threshold,
+        }
+
+
+def _person_info(person: dict) -> dict:
+    return {
+        "id": str(person.get("id", "")),
+        "name": person.get("name", "Unknown"),
+        "relationship": person.get("relationship", ""),
+    }
+
+
+async def get_user_gallery(user_id: str) -> FaceGallery:
+    """
+    Get the face gallery for a user, loading it from MongoDB on a cache miss.
+    
+    Args:
+        user_id: User ID the known persons belong to
+        
+    Returns:
+        FaceGallery for the user (possibly empty)
+    """
+    gallery = _gallery_cache.get(user_id)
+    if gallery is not None:
+        _gallery_cache.move_to_end(user_id)
+        return gallery
+    
+    version = _gallery_versions.setdefault(user_id, 0)
+    _gallery_loads[user_id] = _gallery_loads.get(user_id, 0) + 1
+    try:
+        known_persons = await KnownPerson.find(
+            KnownPerson.for_user == user_id
+        ).to_list()
+        
+        # Index build and threshold calibration are O(rows^2); keep them off the event loop
+        gallery = await run_inference(FaceGallery.from_persons, [
+            {
+                "id": str(kp.id),
+                "name": kp.name,
+                "relationship": kp.relationship,
+                "face_embeddings": person_gallery_rows(kp),
+                "genuine_similarity": person_genuine_similarity(kp)
+            }
+            for kp in known_persons if kp.face_embeddings
+        ])
+        
+        # Skip caching if the user's persons changed while we were loading
+        changed = _gallery_versions[user_id] != version
+    finally:
+        _gallery_loads[user_id] -= 1
+        if not _gallery_loads[user_id]:
+            del _gallery_loads[user_id]
+            del _gallery_versions[user_id]
+    
+    if not changed:
+        _gallery_cache[user_id] = gallery
+        _gallery_cache.move_to_end(user_id)
+        
+        max_size = max(get_settings().face_gallery_cache_size, 0)
+        while len(_gallery_cache) > max_size:
+            _gallery_cache.popitem(last=False)
+    
+    return gallery
+
+
+def invalidate_user_gallery(user_id: str) -> None:
+    """Drop a user's cached gallery after any write to their known persons."""
+    _bump_gallery_version(user_id)
+    _gallery_cache.pop(user_id, None)
+
+
+async def update_cached_gallery(user_id: str, person: KnownPerson) -> None:
+    """
+    Refresh one person's rows in the user's cached gallery, if any.
+    
+    Enrollment updates the cached matrix and ANN index incrementally instead
+    of forcing a full reload from MongoDB. The updated copy (including
+    threshold recalibration) is built on the inference pool and swapped in;
+    if the pool is busy or the cache changed meanwhile, the entry is dropped
+    and the next identification reloads it.
+    
+    Args:
+        user_id: User ID the person belongs to
+        person: The saved KnownPerson
+    """
+    # Any load in flight predates this change and must not be cached
+    _bump_gallery_version(user_id)
+    
+    gallery = _gallery_cache.get(user_id)
+    if gallery is None:
+        return
+    
+    try:
+        updated = await run_inference(
+            gallery.with_person_rows,
+            {
+                "id": str(person.id),
+                "name": person.name,
+                "relationship": person.relationship,
+                "genuine_similarity": person_genuine_similarity(person)
+            },
+            person_gallery_rows(person)
+        )
+    except InferenceBusyError:
+        updated = None
+    
+    # Another update or an invalidation replaced the cached gallery meanwhile
+    if updated is None or _gallery_cache.get(user_id) is not gallery:
+        _gallery_cache.pop(user_id, None)
+        return
+    _gallery_cache[user_id] = updated
+
+
+def _bump_gallery_version(user_id: str) -> None:
+    # Without a load in flight there is nothing to mark stale
+    if user_id in _gallery_versions:
+        _gallery_versions[user_id] += 1
@@ -0,0 +1,181 @@
+"""
+Drishti AI - Face Prototypes
+
+Per-person centroid and k-means prototypes with outlier flagging, so a
+person is matched through a handful of vectors instead of every photo.
+"""
+
+import numpy as np
+from typing import Iterable, List, Optional, Tuple
+
+from app.config import get_settings
+from app.models.known_person import (
+    LEGACY_EMBEDDING_MODEL,
+    KnownPerson,
+    current_embedding_model,
+    pack_embedding,
+)
+from app.utils.vectors import normalize_rows, spherical_kmeans
+
+
+# Need at least this many embeddings before any can be called an outlier
+MIN_EMBEDDINGS_FOR_OUTLIERS = 3
+
+
+def compute_prototypes(
+    embeddings: np.ndarray,
+    max_prototypes: int = 3,
+    outlier_threshold: float = 0.35,
+    weights: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, List[int]]:
+    """
+    Compute matching prototypes for one person.
+
+    Args:
+        embeddings: (n, dim) raw embeddings
+        max_prototypes: Max k-means prototypes in addition to the centroid
+        outlier_threshold: Cosine similarity to the centroid below which an
+            embedding is flagged as an outlier
+        weights: Optional (n,) enrollment quality weights for the centroids
+
+    Returns:
+        ((m, dim) normalized prototypes with the centroid first,
+         indices of outlier embeddings)
+    """
+    if len(embeddings) == 0:
+        return np.empty((0, 0), dtype=np.float32), []
+
+    rows = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    if weights is None:
+        weights = np.ones(len(rows), dtype=np.float32)
+    weights = np.asarray(weights, dtype=np.float32)[:, None]
+    inliers = np.ones(len(rows), dtype=bool)
+
+    if len(rows) >= MIN_EMBEDDINGS_FOR_OUTLIERS:
+        centroid = normalize_rows((rows * weights).sum(axis=0, keepdims=True))[0]
+        similarities = rows @ centroid
+        inliers = similarities >= outlier_threshold
+
+        # Never drop the majority of a person's photos
+        if inliers.sum() < (len(rows) + 1) // 2:
+            keep = np.argsort(-similarities)[:(len(rows) + 1) // 2]
+            inliers = np.zeros(len(rows), dtype=bool)
+            inliers[keep] = True
+
+    inlier_rows = rows[inliers]
+    prototypes = [normalize_rows((inlier_rows * weights[inliers]).sum(axis=0, keepdims=True))[0]]
+
+    # Extra prototypes only when each cluster would have a few photos
+    if max_prototypes > 1 and len(inlier_rows) >= 2 * max_prototypes:
+        centers, _ = spherical_kmeans(inlier_rows, max_prototypes)
+        prototypes.extend(centers)
+
+    outliers = [int(i) for i in np.flatnonzero(~inliers)]
+    return np.vstack(prototypes).astype(np.float32), outliers
+
+
+def refresh_person_prototypes(person: KnownPerson) -> None:
+    """
+    Recompute and store a person's prototypes after embeddings change.
+
+    Only embeddings from the configured model take part; outlier indices
+    refer to positions in person.face_embeddings.
+    """
+    settings = get_settings()
+    embeddings, weights, indices = _current_embeddings(person)
+    prototypes, outliers = compute_prototypes(
+        embeddings,
+        max_prototypes=settings.face_max_prototypes,
+        outlier_threshold=settings.face_outlier_threshold,
+        weights=weights
+    )
+    person.face_prototypes = [pack_embedding(p, person.embedding_dtype) for p in prototypes]
+    person.face_prototypes_model = current_embedding_model()
+    person.face_outliers = [int(indices[i]) for i in outliers]
+    person.face_genuine_similarity = genuine_similarity(embeddings, outliers)
+
+
+def genuine_similarity(embeddings: np.ndarray, outliers: Iterable[int] = ()) -> Optional[float]:
+    """
+    Low-end similarity of a person's photos to the rest of their photos.
+
+    Each inlier embedding is compared with the centroid of the others
+    (leave-one-out), which mimics a new photo of the person being matched
+    against their prototype.
+
+    Returns:
+        10th percentile similarity, or None with fewer than two inliers
+    """
+    if len(embeddings) == 0:
+        return None
+
+    rows = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    outliers = [i for i in outliers if i < len(rows)]
+    if outliers and len(outliers) < len(rows):
+        rows = np.delete(rows, outliers, axis=0)
+    if len(rows) < 2:
+        return None
+
+    others = normalize_rows(rows.sum(axis=0, keepdims=True) - rows)
+    similarities = np.sum(rows * others, axis=1)
+    return float(np.percentile(similarities, 10))
+
+
+def person_genuine_similarity(person: KnownPerson) -> Optional[float]:
+    """Stored genuine similarity, recomputed when it predates the current model."""
+    if person.face_genuine_similarity is not None and _prototypes_current(person):
+        return person.face_genuine_similarity
+    embeddings, _, indices = _current_embeddings(person)
+    return genuine_similarity(embeddings, _local_outliers(person, indices))
+
+
+def person_gallery_rows(person: KnownPerson) -> np.ndarray:
+    """
+    Vectors a person contributes to the matching gallery.
+
+    In "prototypes" mode this is the stored centroid/prototypes (computed on
+    the fly for documents enrolled before prototypes existed or with another
+    model); in "embeddings" mode it is every non-outlier embedding. Either
+    way only embeddings from the configured model are used, so a person
+    awaiting re-embedding may contribute no rows.
+    """
+    settings = get_settings()
+
+    if settings.face_match_mode == "prototypes":
+        if person.face_prototypes and _prototypes_current(person):
+            return person.prototype_matrix()
+        embeddings, weights, _ = _current_embeddings(person)
+        prototypes, _ = compute_prototypes(
+            embeddings,
+            max_prototypes=settings.face_max_prototypes,
+            outlier_threshold=settings.face_outlier_threshold,
+            weights=weights
+        )
+        return prototypes
+
+    embeddings, _, indices = _current_embeddings(person)
+    outliers = _local_outliers(person, indices)
+    if outliers and len(outliers) < len(embeddings):
+        embeddings = np.delete(embeddings, outliers, axis=0)
+    return embeddings
+
+
+def _current_embeddings(person: KnownPerson) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Embeddings, weights and original indices for the configured model."""
+    mask = person.current_model_mask()
+    return (
+        person.embedding_matrix(current_model_only=True),
+        person.embedding_weights()[mask],
+        np.flatnonzero(mask)
+    )
+
+
+def _local_outliers(person: KnownPerson, indices: np.ndarray) -> List[int]:
+    """Map stored outlier indices to positions within the current-model subset."""
+    positions = {int(index): i for i, index in enumerate(indices)}
+    return [positions[i] for i in person.face_outliers if i in positions]
+
+
+def _prototypes_current(person: KnownPerson) -> bool:
+    # Prototypes stored before model tags existed came from the legacy pack
+    return (person.face_prototypes_model or LEGACY_EMBEDDING_MODEL) == current_embedding_model()
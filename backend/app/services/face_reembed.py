@@ -0,0 +1,186 @@
+"""
+Drishti AI - Face Re-embedding Job
+
+Background job that recomputes stored face embeddings from the images in
+/uploads after the configured face model changes. Persons are found by
+their per-embedding model tags, so the job is naturally resumable: a
+restarted job only picks up persons that still carry another model's
+embeddings.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+from app.config import get_settings
+from app.models.known_person import KnownPerson, current_embedding_model
+from app.services.face_enrollment import ENROLL_ACCEPTED, analyze_enrollment_file
+from app.services.face_gallery import invalidate_user_gallery
+from app.services.face_prototypes import refresh_person_prototypes
+from app.services.inference_executor import get_inference_stats, run_inference
+from app.services.upload_storage import upload_file_path
+
+
+# Poll interval while live traffic occupies every inference worker
+CAPACITY_POLL_SECONDS = 0.2
+
+
+def _pending_query(model: str, after_id=None) -> dict:
+    """Persons with embeddings that are untagged or tagged with another model."""
+    query = {
+        "face_embeddings.0": {"$exists": True},
+        "$or": [
+            {"face_embedding_models": {"$elemMatch": {"$ne": model}}},
+            {"$expr": {"$lt": [
+                {"$size": {"$ifNull": ["$face_embedding_models", []]}},
+                {"$size": "$face_embeddings"}
+            ]}},
+        ],
+    }
+    if after_id is not None:
+        query["_id"] = {"$gt": after_id}
+    return query
+
+
+class ReembedJob:
+    """Single background re-embedding run with progress counters."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._reset(model=None)
+
+    def _reset(self, model: Optional[str]) -> None:
+        self.state = "idle"
+        self.model = model
+        self.total = 0
+        self.processed = 0
+        self.updated = 0
+        self.failed: List[str] = []
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> bool:
+        """Start a run for the configured model; False if one is already running."""
+        if self.running:
+            return False
+        self._reset(model=current_embedding_model())
+        self.state = "running"
+        self.started_at = datetime.utcnow()
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    def cancel(self) -> bool:
+        """Cancel the current run; persons already re-embedded stay updated."""
+        if not self.running:
+            return False
+        self._task.cancel()
+        return True
+
+    def status(self) -> dict:
+        """Progress snapshot for the admin endpoint."""
+        return {
+            "state": self.state,
+            "model": self.model,
+            "total": self.total,
+            "processed": self.processed,
+            "updated": self.updated,
+            "failed": len(self.failed),
+            "failedPersonIds": self.failed[-50:],
+            "progress": round(self.processed / self.total, 3) if self.total else None,
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+    async def _run(self) -> None:
+        settings = get_settings()
+        model = self.model
+        workers = asyncio.Semaphore(max(settings.face_reembed_workers, 1))
+
+        async def process(person: KnownPerson) -> None:
+            async with workers:
+                try:
+                    if await self._reembed_person(person, model):
+                        self.updated += 1
+                    else:
+                        self.failed.append(str(person.id))
+                except Exception as e:
+                    print(f"⚠️ Re-embedding {person.id} failed: {e}")
+                    self.failed.append(str(person.id))
+                self.processed += 1
+
+        try:
+            self.total = await KnownPerson.find(_pending_query(model)).count()
+            print(f"🔁 Re-embedding {self.total} known persons with {model}")
+
+            after_id = None
+            while True:
+                batch = await KnownPerson.find(
+                    _pending_query(model, after_id)
+                ).sort("+_id").limit(max(settings.face_reembed_batch_size, 1)).to_list()
+                if not batch:
+                    break
+                after_id = batch[-1].id
+
+                await asyncio.gather(*(process(person) for person in batch))
+                await asyncio.sleep(max(settings.face_reembed_pause_seconds, 0))
+
+            self.state = "completed"
+            print(f"✅ Re-embedding finished: {self.updated} updated, {len(self.failed)} failed")
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"❌ Re-embedding job failed: {e}")
+        finally:
+            self.finished_at = datetime.utcnow()
+
+    async def _reembed_person(self, person: KnownPerson, model: str) -> bool:
+        """Recompute one person's embeddings from their stored images."""
+        image_paths = [image.path for image in person.images]
+
+        embeddings = []
+        qualities = []
+        for path in image_paths:
+            filepath = upload_file_path(path)
+            if filepath is None:
+                continue
+            await self._wait_for_capacity()
+            # Keep every usable face; the photos were accepted before.
+            # The file is read on the inference worker, not the event loop.
+            result = await run_inference(analyze_enrollment_file, filepath, gate=False)
+            if result["status"] == ENROLL_ACCEPTED:
+                embeddings.append(result["embedding"])
+                qualities.append(result["quality"])
+
+        if not embeddings:
+            return False
+
+        # Re-read so edits made while we were embedding are not overwritten
+        current = await KnownPerson.get(person.id)
+        if current is None or [image.path for image in current.images] != image_paths:
+            return False
+
+        current.replace_face_embeddings(embeddings, qualities, model)
+        refresh_person_prototypes(current)
+        await current.save()
+        invalidate_user_gallery(current.for_user)
+        return True
+
+    async def _wait_for_capacity(self) -> None:
+        """Yield to live traffic while every inference worker is busy."""
+        while True:
+            stats = get_inference_stats()
+            if stats["pending"] < stats["workers"]:
+                return
+            await asyncio.sleep(CAPACITY_POLL_SECONDS)
+
+
+reembed_job = ReembedJob()
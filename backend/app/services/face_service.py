@@ -4,15 +4,27 @@ Drishti AI - Face Recognition Service
 Face detection and recognition using InsightFace.
 """
 
+import threading
 import numpy as np
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Union
 import cv2
-import base64
 from io import BytesIO
 
+from app.config import get_settings
+from app.services.face_gallery import FaceGallery
+from app.services.inference_executor import run_inference
+from app.services.face_tracking import face_tracks
+from app.utils.images import ImageInput, image_bytes
+
+# InsightFace tasks this service reads: bbox/kps/det_score and embedding.
+# Landmark and gender/age heads would run per face without being used.
+REQUIRED_FACE_MODULES = ("detection", "recognition")
+
 # Lazy load InsightFace to avoid startup delay
 _face_app = None
 _initialized = False
+_warmed_up = False
+_init_lock = threading.Lock()
 
 
 def _init_face_app():
@@ -22,54 +34,183 @@ def _init_face_app():
     if _initialized:
         return _face_app
     
-    try:
-        from insightface.app import FaceAnalysis
-        
-        # Initialize with buffalo_l model (good balance of speed and accuracy)
-        _face_app = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
-        _face_app.prepare(ctx_id=0, det_size=(640, 640))
-        
-        _initialized = True
-        print("✅ InsightFace initialized successfully")
-        return _face_app
+    # Inference runs on a worker pool, so guard against concurrent first loads
+    with _init_lock:
+        if _initialized:
+            return _face_app
         
+        try:
+            from insightface.app import FaceAnalysis
+            
+            settings = get_settings()
+            allowed_modules = _resolve_allowed_modules(settings.face_allowed_modules)
+            
+            # buffalo_l by default (good balance of speed and accuracy)
+            _face_app = FaceAnalysis(
+                name=settings.face_model_pack,
+                allowed_modules=allowed_modules,
+                providers=["CPUExecutionProvider"]
+            )
+            _face_app.prepare(ctx_id=0, det_size=(settings.face_det_size, settings.face_det_size))
+            
+            if settings.face_onnx_intra_op_threads > 0:
+                _apply_intra_op_threads(_face_app, settings.face_onnx_intra_op_threads)
+            
+            _initialized = True
+            print(f"✅ InsightFace initialized successfully ({settings.face_model_pack})")
+            return _face_app
+            
+        except Exception as e:
+            print(f"⚠️ Failed to initialize InsightFace: {e}")
+            _initialized = True  # Mark as attempted
+            return None
+
+
+def _resolve_allowed_modules(value: str) -> Optional[List[str]]:
+    """Parse the allowed-modules setting, always keeping the required tasks."""
+    modules = [m.strip() for m in value.split(",") if m.strip()]
+    if not modules:
+        return None  # Load the whole pack
+    for required in REQUIRED_FACE_MODULES:
+        if required not in modules:
+            modules.append(required)
+    return modules
+
+
+def warm_up_face_model() -> bool:
+    """
+    Load the face model and run one dummy inference.
+    
+    The first ONNX Runtime call allocates buffers and picks kernels, so
+    running it at startup keeps that cost off the first user request.
+    
+    Returns:
+        True if the model is loaded and warm
+    """
+    global _warmed_up
+    
+    app = _init_face_app()
+    if app is None:
+        return False
+    
+    try:
+        size = get_settings().face_det_size
+        app.get(np.zeros((size, size, 3), dtype=np.uint8))
+        _warmed_up = True
+        print("🔥 InsightFace warm-up complete")
     except Exception as e:
-        print(f"⚠️ Failed to initialize InsightFace: {e}")
-        _initialized = True  # Mark as attempted
-        return None
+        print(f"⚠️ InsightFace warm-up failed: {e}")
+    
+    return _warmed_up
+
+
+def get_face_model_status() -> dict:
+    """Return face model readiness for health checks."""
+    settings = get_settings()
+    return {
+        "ready": _warmed_up,
+        "loaded": _initialized and _face_app is not None,
+        "modelPack": settings.face_model_pack,
+        "detSize": settings.face_det_size,
+        "modules": sorted(_face_app.models.keys()) if _face_app is not None else [],
+    }
+
+
+def _apply_intra_op_threads(face_app, num_threads: int) -> None:
+    """
+    Recreate each model's ONNX session with a fixed intra-op thread count.
+    
+    FaceAnalysis does not forward SessionOptions to its models, so the
+    sessions are rebuilt from the same model files after loading.
+    """
+    import onnxruntime
+    
+    session_options = onnxruntime.SessionOptions()
+    session_options.intra_op_num_threads = num_threads
+    
+    for model in face_app.models.values():
+        model.session = onnxruntime.InferenceSession(
+            model.model_file,
+            sess_options=session_options,
+            providers=["CPUExecutionProvider"]
+        )
+
+
+def _face_area(face) -> float:
+    return (face.bbox[2] - face.bbox[0]) * (face.bbox[3] - face.bbox[1])
 
 
-def decode_base64_image(image_base64: str) -> Optional[np.ndarray]:
+def decode_frame(image_data: ImageInput) -> Tuple[Optional[np.ndarray], int]:
     """
-    Decode a base64 image to numpy array.
+    Decode a camera frame for identification, at reduced size when possible.
+    
+    Large JPEGs are decoded directly at 1/2 or 1/4 scale by libjpeg
+    (cv2.IMREAD_REDUCED_COLOR_*), as long as the long side stays at least
+    face_decode_min_side pixels.
     
     Args:
-        image_base64: Base64 encoded image (with or without data URL prefix)
+        image_data: Base64 encoded image (with or without data URL prefix)
+            or raw encoded image bytes
         
     Returns:
-        numpy array (BGR format) or None if failed
+        (numpy array (BGR format) or None, reduction factor to map
+         coordinates back to the original image)
     """
     try:
-        # Strip data URL prefix if present
-        if image_base64.startswith("data:"):
-            parts = image_base64.split(",", 1)
-            if len(parts) == 2:
-                image_base64 = parts[1]
-        
-        # Decode base64
-        image_data = base64.b64decode(image_base64)
-        
-        # Convert to numpy array
-        nparr = np.frombuffer(image_data, np.uint8)
-        
-        # Decode image
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        return image
+        encoded = image_bytes(image_data)
+        reduction = _jpeg_reduction(encoded)
+        image = decode_image_bytes(encoded, reduction)
+        return image, reduction
         
     except Exception as e:
         print(f"Failed to decode image: {e}")
-        return None
+        return None, 1
+
+
+def decode_image_bytes(image_data: Union[bytes, memoryview], reduction: int = 1) -> Optional[np.ndarray]:
+    """
+    Decode encoded image bytes (JPEG, PNG, ...) to a BGR numpy array.
+    
+    Args:
+        image_data: Encoded image bytes (any buffer; not copied)
+        reduction: 1, 2, 4 or 8 to decode at a fraction of full size
+        
+    Returns:
+        numpy array (BGR format) or None if the data is not an image
+    """
+    nparr = np.frombuffer(image_data, np.uint8)
+    return cv2.imdecode(nparr, _REDUCED_DECODE_FLAGS.get(reduction, cv2.IMREAD_COLOR))
+
+
+_REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def _jpeg_reduction(image_data: Union[bytes, memoryview]) -> int:
+    """Largest JPEG decode reduction that keeps the long side above the minimum."""
+    settings = get_settings()
+    if not settings.face_adaptive_decode:
+        return 1
+    
+    try:
+        from PIL import Image
+        
+        # Only parses the header; no pixel data is decoded
+        with Image.open(BytesIO(image_data)) as header:
+            if header.format != "JPEG":
+                return 1
+            long_side = max(header.size)
+    except Exception:
+        return 1
+    
+    for reduction in (4, 2):
+        if long_side // reduction >= settings.face_decode_min_side:
+            return reduction
+    return 1
 
 
 def extract_face_embedding(image: np.ndarray) -> Optional[List[float]]:
@@ -89,13 +230,13 @@ def extract_face_embedding(image: np.ndarray) -> Optional[List[float]]:
     
     try:
         # Detect faces
-        faces = app.get(image)
+        faces = detect_faces(image)
         
         if not faces:
             return None
         
         # Get the largest face (most likely the main subject)
-        largest_face = max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+        largest_face = max(faces, key=_face_area)
         
         # Return embedding as list
         return largest_face.embedding.tolist()
@@ -105,15 +246,42 @@ def extract_face_embedding(image: np.ndarray) -> Optional[List[float]]:
         return None
 
 
-def extract_all_face_embeddings(image: np.ndarray) -> List[List[float]]:
+def detect_faces(image: np.ndarray) -> list:
     """
-    Extract all face embeddings from an image.
+    Detect all faces in an image and compute their embeddings.
     
     Args:
         image: numpy array (BGR format)
         
     Returns:
-        List of 512-dimensional embeddings
+        List of InsightFace Face objects (bbox, det_score, embedding)
+    """
+    app = _init_face_app()
+    
+    if app is None:
+        return []
+    
+    try:
+        return embed_faces(image, detect_faces_only(image))
+        
+    except Exception as e:
+        print(f"Failed to detect faces: {e}")
+        return []
+
+
+def detect_faces_only(image: np.ndarray) -> list:
+    """
+    Run only the face detector (no recognition).
+    
+    Frames larger than face_detect_max_side are downscaled for detection;
+    boxes and keypoints are mapped back so recognition crops come from the
+    full-resolution image.
+    
+    Args:
+        image: numpy array (BGR format)
+        
+    Returns:
+        List of InsightFace Face objects with bbox, kps and det_score
     """
     app = _init_face_app()
     
@@ -121,14 +289,72 @@ def extract_all_face_embeddings(image: np.ndarray) -> List[List[float]]:
         return []
     
     try:
-        faces = app.get(image)
-        return [face.embedding.tolist() for face in faces]
+        from insightface.app.common import Face
+        
+        max_side = get_settings().face_detect_max_side
+        scale = 1.0
+        det_image = image
+        if max_side > 0 and max(image.shape[:2]) > max_side:
+            scale = max_side / max(image.shape[:2])
+            det_image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        bboxes, kpss = app.det_model.detect(det_image, max_num=0, metric="default")
+        if scale != 1.0:
+            bboxes[:, 0:4] /= scale
+            if kpss is not None:
+                kpss /= scale
+        
+        return [
+            Face(
+                bbox=bboxes[i, 0:4],
+                kps=kpss[i] if kpss is not None else None,
+                det_score=bboxes[i, 4]
+            )
+            for i in range(bboxes.shape[0])
+        ]
         
     except Exception as e:
-        print(f"Failed to extract embeddings: {e}")
+        print(f"Failed to detect faces: {e}")
         return []
 
 
+def embed_faces(image: np.ndarray, faces: list) -> list:
+    """
+    Run the non-detection models (recognition) on already-detected faces.
+    
+    Args:
+        image: numpy array (BGR format) the faces were detected in
+        faces: Face objects from detect_faces_only()
+        
+    Returns:
+        The same faces with embedding set
+    """
+    app = _init_face_app()
+    
+    if app is None:
+        return faces
+    
+    for face in faces:
+        for taskname, model in app.models.items():
+            if taskname == "detection":
+                continue
+            model.get(image, face)
+    return faces
+
+
+def extract_all_face_embeddings(image: np.ndarray) -> List[List[float]]:
+    """
+    Extract all face embeddings from an image.
+    
+    Args:
+        image: numpy array (BGR format)
+        
+    Returns:
+        List of 512-dimensional embeddings
+    """
+    return [face.embedding.tolist() for face in detect_faces(image)]
+
+
 def cosine_similarity(embedding1: List[float], embedding2: List[float]) -> float:
     """
     Calculate cosine similarity between two embeddings.
@@ -160,23 +386,31 @@ def cosine_similarity(embedding1: List[float], embedding2: List[float]) -> float
 
 
 async def identify_face(
-    image_base64: str,
-    known_persons: List[dict],
-    threshold: float = 0.6
+    image_data: ImageInput,
+    gallery: FaceGallery,
+    threshold: Optional[float] = None,
+    session_id: Optional[str] = None,
+    top_k: int = 1
 ) -> dict:
     """
-    Identify a face against known persons.
+    Identify a face against a user's face gallery.
     
     Args:
-        image_base64: Base64 encoded image
-        known_persons: List of known persons with face_embeddings
-        threshold: Minimum similarity threshold for a match
+        image_data: Base64 encoded image or raw image bytes
+        gallery: FaceGallery built from the user's known persons
+        threshold: Confidence threshold override; defaults to the gallery's
+            calibrated threshold
+        session_id: Optional caller-scoped session key; enables the face
+            track cache so consecutive frames of the same face skip
+            recognition
+        top_k: When above 1, also return the top-k candidate persons
         
     Returns:
-        dict with identified, person, confidence, and optional error
+        dict with identified, person, confidence, optional candidates,
+        and optional error
     """
     # Decode image
-    image = decode_base64_image(image_base64)
+    image, _ = await run_inference(decode_frame, image_data)
     
     if image is None:
         return {
@@ -184,60 +418,255 @@ async def identify_face(
             "error": "Failed to decode image"
         }
     
-    # Extract embedding from the query image
-    query_embedding = extract_face_embedding(image)
+    if session_id:
+        matches = await _identify_tracked(image, gallery, session_id, largest_only=True, top_k=top_k)
+        if not matches:
+            return {
+                "identified": False,
+                "error": "No face detected in image"
+            }
+        _, candidates, tracked = matches[0]
+    else:
+        # Extract embedding from the query image
+        query_embedding = await run_inference(extract_face_embedding, image)
+        
+        if query_embedding is None:
+            return {
+                "identified": False,
+                "error": "No face detected in image"
+            }
+        
+        # Best persons (at least two for the margin test) in one matrix product
+        candidates = gallery.search_many([query_embedding], k=max(top_k, 2))[0]
+        tracked = False
+    
+    decision = gallery.decide(candidates, threshold)
     
-    if query_embedding is None:
-        return {
+    if decision["identified"]:
+        result = {
+            "identified": True,
+            "person": decision["person"],
+            "confidence": decision["confidence"],
+            "tracked": tracked
+        }
+    else:
+        result = {
             "identified": False,
-            "error": "No face detected in image"
+            "confidence": decision["confidence"],
+            "message": _no_match_message(decision),
+            "tracked": tracked
         }
     
-    # Find best match
-    best_match = None
-    best_confidence = 0.0
+    if top_k > 1:
+        result["candidates"] = _candidate_list(candidates, top_k)
+    return result
+
+
+async def identify_faces(
+    image_data: ImageInput,
+    gallery: FaceGallery,
+    threshold: Optional[float] = None,
+    session_id: Optional[str] = None,
+    top_k: int = 1
+) -> dict:
+    """
+    Identify every face in an image against a user's face gallery.
+    
+    Detection runs once for the whole frame and all face embeddings are
+    matched in a single matrix product.
     
-    for person in known_persons:
-        embeddings = person.get("face_embeddings", [])
+    Args:
+        image_data: Base64 encoded image or raw image bytes
+        gallery: FaceGallery built from the user's known persons
+        threshold: Confidence threshold override (defaults to calibrated)
+        session_id: Optional caller-scoped session key for the face track cache
+        top_k: When above 1, also return the top-k candidates per face
         
-        for embedding in embeddings:
-            similarity = cosine_similarity(query_embedding, embedding)
-            
-            if similarity > best_confidence:
-                best_confidence = similarity
-                best_match = person
+    Returns:
+        dict with faces (bbox, identified, person, confidence) and optional error
+    """
+    image, reduction = await run_inference(decode_frame, image_data)
     
-    if best_match and best_confidence >= threshold:
+    if image is None:
         return {
-            "identified": True,
-            "person": {
-                "id": str(best_match.get("id", "")),
-                "name": best_match.get("name", "Unknown"),
-                "relationship": best_match.get("relationship", "")
-            },
-            "confidence": best_confidence
+            "faces": [],
+            "error": "Failed to decode image"
+        }
+    
+    if session_id:
+        matches = await _identify_tracked(image, gallery, session_id, largest_only=False, top_k=top_k)
+        faces = [face for face, _, _ in matches]
+        tracked = [was_tracked for _, _, was_tracked in matches]
+        candidates = [face_candidates for _, face_candidates, _ in matches]
+    else:
+        faces = await run_inference(detect_faces, image)
+        # Largest faces first, matching extract_face_embedding's notion of main subject
+        faces.sort(key=_face_area, reverse=True)
+        candidates = gallery.search_many([face.embedding for face in faces], k=max(top_k, 2))
+        tracked = [False] * len(faces)
+    
+    if not faces:
+        return {
+            "faces": [],
+            "message": "No face detected in image"
         }
     
+    results = _build_face_results(faces, candidates, gallery, threshold, reduction, top_k)
+    for result, was_tracked in zip(results, tracked):
+        result["tracked"] = was_tracked
+    
     return {
-        "identified": False,
-        "confidence": best_confidence,
-        "message": "No matching face found"
+        "faces": results,
+        "identified_count": sum(1 for r in results if r["identified"])
     }
 
 
-async def extract_embedding_from_base64(image_base64: str) -> Optional[List[float]]:
+async def _identify_tracked(
+    image: np.ndarray,
+    gallery: FaceGallery,
+    session_id: str,
+    largest_only: bool,
+    top_k: int = 1
+) -> List[Tuple[object, List[Tuple[dict, float]], bool]]:
+    """
+    Detect faces and identify them through the session's face tracks.
+    
+    Detections that overlap a fresh track reuse its identity; only the
+    rest (new faces, stale tracks, drift) go through recognition.
+    
+    Returns:
+        (face, gallery candidates, tracked) per face, largest first
     """
-    Extract face embedding from a base64 encoded image.
+    faces = await run_inference(detect_faces_only, image)
+    faces.sort(key=_face_area, reverse=True)
+    if largest_only:
+        faces = faces[:1]
+    if not faces:
+        return []
+    
+    tracks = face_tracks.associate(session_id, [face.bbox for face in faces])
+    
+    pending = [
+        i for i, track in enumerate(tracks)
+        if track is None or track.needs_recognition()
+    ]
+    if pending:
+        await run_inference(embed_faces, image, [faces[i] for i in pending])
+        matches = gallery.search_many([faces[i].embedding for i in pending], k=max(top_k, 2))
+    
+    results = []
+    pending_matches = dict(zip(pending, matches)) if pending else {}
+    for i, (face, track) in enumerate(zip(faces, tracks)):
+        if i in pending_matches:
+            candidates = pending_matches[i]
+            face_tracks.record(session_id, track, face.bbox, face.embedding, candidates)
+            results.append((face, candidates, False))
+        else:
+            face_tracks.touch(track, face.bbox)
+            results.append((face, track.candidates, True))
+    
+    return results
+
+
+async def identify_faces_in_images(
+    images: List[ImageInput],
+    gallery: FaceGallery,
+    threshold: Optional[float] = None,
+    top_k: int = 1
+) -> List[dict]:
+    """
+    Identify every face across several images in one pass.
+    
+    Images are decoded on the inference pool, detection/recognition runs on the
+    shared InsightFace session, and all faces from all images are matched
+    against the gallery in a single matrix product.
     
     Args:
-        image_base64: Base64 encoded image
+        images: Base64 encoded images or raw image bytes
+        gallery: FaceGallery built from the user's known persons
+        threshold: Confidence threshold override (defaults to calibrated)
+        top_k: When above 1, also return the top-k candidates per face
         
     Returns:
-        512-dimensional embedding or None
+        List of per-image dicts in the same shape as identify_faces()
     """
-    image = decode_base64_image(image_base64)
+    # One inference slot for decoding the whole batch and one for detection,
+    # so a large batch cannot flood the pool past its queue limit
+    frames = await run_inference(_decode_frames, images)
+    faces_per_image = await run_inference(_detect_faces_in_images, [image for image, _ in frames])
     
-    if image is None:
-        return None
+    all_faces = [face for faces in faces_per_image for face in faces]
+    candidates = gallery.search_many([face.embedding for face in all_faces], k=max(top_k, 2))
     
-    return extract_face_embedding(image)
+    results = []
+    offset = 0
+    for (image, reduction), faces in zip(frames, faces_per_image):
+        if image is None:
+            results.append({"faces": [], "error": "Failed to decode image"})
+            continue
+        if not faces:
+            results.append({"faces": [], "message": "No face detected in image"})
+            continue
+        
+        face_results = _build_face_results(
+            faces, candidates[offset:offset + len(faces)], gallery, threshold, reduction, top_k
+        )
+        offset += len(faces)
+        results.append({
+            "faces": face_results,
+            "identified_count": sum(1 for r in face_results if r["identified"])
+        })
+    
+    return results
+
+
+def _decode_frames(images: List[ImageInput]) -> List[Tuple[Optional[np.ndarray], int]]:
+    return [decode_frame(image_data) for image_data in images]
+
+
+def _detect_faces_in_images(images: List[Optional[np.ndarray]]) -> List[list]:
+    faces_per_image = []
+    for image in images:
+        faces = detect_faces(image) if image is not None else []
+        faces.sort(key=_face_area, reverse=True)
+        faces_per_image.append(faces)
+    return faces_per_image
+
+
+def _build_face_results(
+    faces: list,
+    candidates: List[List[Tuple[dict, float]]],
+    gallery: FaceGallery,
+    threshold: Optional[float],
+    reduction: int = 1,
+    top_k: int = 1
+) -> List[dict]:
+    results = []
+    for face, face_candidates in zip(faces, candidates):
+        decision = gallery.decide(face_candidates, threshold)
+        result = {
+            # Boxes in original image coordinates even after reduced decoding
+            "bbox": [float(v) * reduction for v in face.bbox],
+            "detection_score": float(face.det_score),
+            "identified": decision["identified"],
+            "person": decision["person"],
+            "confidence": decision["confidence"]
+        }
+        if top_k > 1:
+            result["candidates"] = _candidate_list(face_candidates, top_k)
+        results.append(result)
+    return results
+
+
+def _candidate_list(candidates: List[Tuple[dict, float]], top_k: int) -> List[dict]:
+    return [
+        {"person": person, "confidence": confidence}
+        for person, confidence in candidates[:top_k]
+    ]
+
+
+def _no_match_message(decision: dict) -> str:
+    # Confident enough but too close to a second known person
+    if decision["confidence"] >= decision["threshold"]:
+        return "Ambiguous match between known persons"
+    return "No matching face found"
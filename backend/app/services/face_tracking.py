@@ -0,0 +1,157 @@
+"""
+Drishti AI - Face Tracking
+
+Short-lived per-session face tracks for continuous identification. A new
+detection that overlaps a recent track (bbox IoU) reuses the track's
+identity instead of re-running recognition, until the track is due for a
+periodic refresh.
+"""
+
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.config import get_settings
+
+
+class FaceTrack:
+    """A face followed across consecutive frames of one session."""
+
+    def __init__(self, bbox, embedding: np.ndarray, candidates: List[Tuple[dict, float]]):
+        now = time.monotonic()
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.embedding = embedding
+        self.candidates = candidates
+        self.last_seen = now
+        self.last_recognized = now
+        self.frames_since_recognition = 0
+
+    def needs_recognition(self) -> bool:
+        """Whether the cached identity is due for a refresh."""
+        settings = get_settings()
+        return (
+            time.monotonic() - self.last_recognized >= settings.face_track_refresh_seconds
+            or self.frames_since_recognition >= settings.face_track_refresh_frames
+        )
+
+
+def bbox_iou(a, b) -> float:
+    """Intersection over union of two [x1, y1, x2, y2] boxes."""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return float(intersection / union) if union > 0 else 0.0
+
+
+class FaceTrackCache:
+    """Bounded LRU of sessions, each holding its live face tracks."""
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, List[FaceTrack]]" = OrderedDict()
+
+    def associate(self, session_id: str, bboxes: list) -> List[Optional[FaceTrack]]:
+        """
+        Match detections to the session's live tracks by bbox IoU.
+
+        Matching is greedy by IoU; each track is used at most once.
+
+        Args:
+            session_id: Caller-scoped session key
+            bboxes: Detected [x1, y1, x2, y2] boxes
+
+        Returns:
+            Matched track (or None) for each bbox
+        """
+        settings = get_settings()
+        tracks = self._live_tracks(session_id)
+
+        pairs = sorted(
+            (
+                (bbox_iou(bbox, track.bbox), i, j)
+                for i, bbox in enumerate(bboxes)
+                for j, track in enumerate(tracks)
+            ),
+            reverse=True
+        )
+
+        matched: List[Optional[FaceTrack]] = [None] * len(bboxes)
+        used_tracks = set()
+        for iou, i, j in pairs:
+            if iou < settings.face_track_iou_threshold:
+                break
+            if matched[i] is None and j not in used_tracks:
+                matched[i] = tracks[j]
+                used_tracks.add(j)
+        return matched
+
+    def touch(self, track: FaceTrack, bbox) -> None:
+        """Record that a track was seen again without re-recognition."""
+        track.bbox = np.asarray(bbox, dtype=np.float32)
+        track.last_seen = time.monotonic()
+        track.frames_since_recognition += 1
+
+    def record(
+        self,
+        session_id: str,
+        track: Optional[FaceTrack],
+        bbox,
+        embedding,
+        candidates: List[Tuple[dict, float]]
+    ) -> FaceTrack:
+        """
+        Store a fresh recognition result (gallery candidates, best first).
+
+        An IoU-matched track whose stored embedding no longer resembles the
+        new one has drifted to a different face and is replaced. Without an
+        IoU match, the detection may still continue a track that moved
+        quickly; that is decided by embedding similarity.
+        """
+        settings = get_settings()
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm > 0 else vector
+
+        tracks = self._live_tracks(session_id)
+        if track is None:
+            for candidate in tracks:
+                if float(candidate.embedding @ vector) >= settings.face_track_similarity:
+                    track = candidate
+                    break
+        elif float(track.embedding @ vector) < settings.face_track_similarity:
+            if track in tracks:
+                tracks.remove(track)
+            track = None
+
+        if track is None:
+            track = FaceTrack(bbox, vector, candidates)
+            tracks.append(track)
+        else:
+            now = time.monotonic()
+            track.bbox = np.asarray(bbox, dtype=np.float32)
+            track.embedding = vector
+            track.candidates = candidates
+            track.last_seen = now
+            track.last_recognized = now
+            track.frames_since_recognition = 0
+
+        return track
+
+    def _live_tracks(self, session_id: str) -> List[FaceTrack]:
+        settings = get_settings()
+        now = time.monotonic()
+
+        tracks = [
+            t for t in self._sessions.get(session_id, [])
+            if now - t.last_seen < settings.face_track_ttl_seconds
+        ]
+        self._sessions[session_id] = tracks
+        self._sessions.move_to_end(session_id)
+
+        while len(self._sessions) > max(settings.face_track_max_sessions, 1):
+            self._sessions.popitem(last=False)
+        return tracks
+
+
+face_tracks = FaceTrackCache()
@@ -7,12 +7,19 @@ Backend-owned Gemini integration for mobile vision requests.
 from __future__ import annotations
 
 import json
+import re
 import time
-from typing import Any
+from typing import Any, AsyncIterator
 
 import httpx
 
 from app.config import get_settings
+from app.services.circuit_breaker import breaker_snapshots, get_breaker
+from app.services.http_clients import GEMINI, get_http_client
+from app.utils.images import ImageInput, image_base64
+
+
+GEMINI_ENGINE = "gemini"
 
 
 def _candidate_models() -> list[str]:
@@ -34,7 +41,55 @@ def _candidate_models() -> list[str]:
     return deduped
 
 
-def _build_payload(image_base64: str, prompt: str, image_mime: str) -> dict[str, Any]:
+# Models that returned 404, with the monotonic time until which they are skipped
+_missing_models: dict[str, float] = {}
+
+
+def _mark_missing(model: str) -> None:
+    _missing_models[model] = time.monotonic() + get_settings().gemini_missing_model_ttl_seconds
+
+
+def _usable_models() -> list[str]:
+    """Candidate models, minus recent 404s and models whose breaker is open."""
+    now = time.monotonic()
+    return [
+        model for model in _candidate_models()
+        if _missing_models.get(model, 0.0) <= now and get_breaker(f"gemini:{model}").available()
+    ]
+
+
+def gemini_available() -> bool:
+    """Configured, engine breaker not open, and at least one usable model."""
+    return (
+        bool(get_settings().gemini_api_key)
+        and get_breaker(GEMINI_ENGINE).available()
+        and bool(_usable_models())
+    )
+
+
+def _is_upstream_failure(status_code: int) -> bool:
+    """Responses that say Gemini (not the request) is unhealthy."""
+    return status_code == 429 or status_code >= 500
+
+
+def _record_outcome(model: str, started: float, error: str | None = None, engine_failed: bool = False) -> None:
+    """Feed one call's outcome to the model breaker and the Gemini engine breaker."""
+    latency = time.perf_counter() - started
+    model_breaker = get_breaker(f"gemini:{model}")
+    engine_breaker = get_breaker(GEMINI_ENGINE)
+    if error is None:
+        model_breaker.record_success(latency)
+        engine_breaker.record_success(latency)
+        return
+    model_breaker.record_failure(error, latency)
+    if engine_failed:
+        engine_breaker.record_failure(error, latency)
+    else:
+        # The service answered; only this model misbehaved
+        engine_breaker.record_success(latency)
+
+
+def _build_payload(image_data: str, prompt: str, image_mime: str) -> dict[str, Any]:
     return {
         "systemInstruction": {
             "parts": [
@@ -55,7 +110,7 @@ def _build_payload(image_base64: str, prompt: str, image_mime: str) -> dict[str,
                     {
                         "inlineData": {
                             "mimeType": image_mime,
-                            "data": image_base64,
+                            "data": image_data,
                         }
                     },
                     {
@@ -155,7 +210,7 @@ def _parse_objects(objects_data: Any) -> list[dict[str, Any]]:
 
 
 async def analyze_image_with_gemini(
-    image_base64: str,
+    image: ImageInput,
     prompt: str,
     image_mime: str = "image/jpeg",
 ) -> dict[str, Any]:
@@ -164,81 +219,294 @@ async def analyze_image_with_gemini(
     if not settings.gemini_api_key:
         return {"success": False, "error": "Gemini API key is not configured on the backend."}
 
-    last_error = "Gemini request failed."
-    async with httpx.AsyncClient(timeout=httpx.Timeout(45.0, connect=15.0)) as client:
-        for model in _candidate_models():
-            started = time.perf_counter()
-            try:
-                response = await client.post(
-                    f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent",
-                    params={"key": settings.gemini_api_key},
-                    json=_build_payload(image_base64, prompt, image_mime),
-                    headers={
-                        "Content-Type": "application/json",
-                        "Accept": "application/json",
-                    },
-                )
-            except httpx.ConnectError:
-                return {
-                    "success": False,
-                    "error": "Could not reach Gemini from the backend.",
-                }
-            except httpx.TimeoutException:
-                return {
-                    "success": False,
-                    "error": "Gemini request timed out on the backend.",
-                }
-            except Exception as exc:
-                last_error = str(exc)
-                break
+    if not get_breaker(GEMINI_ENGINE).allow():
+        return {"success": False, "error": "Gemini is temporarily unavailable (circuit open)."}
 
-            if response.status_code == 404:
-                last_error = f"Gemini model not found: {model}"
-                continue
+    # Encoded once and reused for every fallback model
+    image_data = image_base64(image)
+
+    last_error = "No Gemini model is currently available."
+    client = get_http_client(GEMINI)
+    attempted = False
+    for model in _usable_models():
+        if not get_breaker(f"gemini:{model}").allow():
+            continue
+        attempted = True
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent",
+                params={"key": settings.gemini_api_key},
+                json=_build_payload(image_data, prompt, image_mime),
+                headers={
+                    "Content-Type": "application/json",
+                    "Accept": "application/json",
+                },
+            )
+        except httpx.ConnectError:
+            _record_outcome(model, started, "connect error", engine_failed=True)
+            return {
+                "success": False,
+                "error": "Could not reach Gemini from the backend.",
+            }
+        except httpx.TimeoutException:
+            _record_outcome(model, started, "timeout", engine_failed=True)
+            return {
+                "success": False,
+                "error": "Gemini request timed out on the backend.",
+            }
+        except Exception as exc:
+            _record_outcome(model, started, str(exc), engine_failed=True)
+            last_error = str(exc)
+            break
+
+        if response.status_code == 404:
+            # Remembered, so later requests go straight to a model that exists
+            _mark_missing(model)
+            _record_outcome(model, started)
+            last_error = f"Gemini model not found: {model}"
+            continue
 
-            if response.status_code >= 400:
-                body = response.text[:500]
+        if response.status_code >= 400:
+            body = response.text[:500]
+            error = f"Gemini returned HTTP {response.status_code}: {body}"
+            if _is_upstream_failure(response.status_code):
+                _record_outcome(model, started, error, engine_failed=True)
+            else:
+                _record_outcome(model, started)
+            return {
+                "success": False,
+                "error": error,
+            }
+
+        try:
+            data = response.json()
+            prompt_feedback = data.get("promptFeedback") or {}
+            if prompt_feedback.get("blockReason"):
+                # The service answered; the request itself was refused
+                _record_outcome(model, started)
                 return {
                     "success": False,
-                    "error": f"Gemini returned HTTP {response.status_code}: {body}",
+                    "error": f"Gemini blocked the request: {prompt_feedback['blockReason']}",
                 }
 
-            try:
-                data = response.json()
-                prompt_feedback = data.get("promptFeedback") or {}
-                if prompt_feedback.get("blockReason"):
-                    return {
-                        "success": False,
-                        "error": f"Gemini blocked the request: {prompt_feedback['blockReason']}",
-                    }
+            response_text = _extract_candidate_text(data)
+            decoded = json.loads(response_text)
+            description = str(decoded.get("description", "")).strip() or "No scene description returned."
+            usage = data.get("usageMetadata") or {}
+            _record_outcome(model, started)
+
+            return {
+                "success": True,
+                "engine": "gemini",
+                "response": description,
+                "description": description,
+                "objects": _parse_objects(decoded.get("objects")),
+                "model": model,
+                "prompt_tokens": int(usage.get("promptTokenCount", 0) or 0),
+                "completion_tokens": int(usage.get("candidatesTokenCount", 0) or 0),
+                "inference_ms": int((time.perf_counter() - started) * 1000),
+            }
+        except Exception as exc:
+            _record_outcome(model, started, str(exc))
+            last_error = str(exc)
+            break
+
+    if not attempted:
+        get_breaker(GEMINI_ENGINE).release()
+    return {"success": False, "error": last_error}
 
-                response_text = _extract_candidate_text(data)
-                decoded = json.loads(response_text)
-                description = str(decoded.get("description", "")).strip() or "No scene description returned."
-                usage = data.get("usageMetadata") or {}
 
-                return {
-                    "success": True,
-                    "engine": "gemini",
-                    "response": description,
-                    "description": description,
-                    "objects": _parse_objects(decoded.get("objects")),
-                    "model": model,
-                    "prompt_tokens": int(usage.get("promptTokenCount", 0) or 0),
-                    "completion_tokens": int(usage.get("candidatesTokenCount", 0) or 0),
-                    "inference_ms": int((time.perf_counter() - started) * 1000),
-                }
-            except Exception as exc:
-                last_error = str(exc)
+_JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+class _StreamedStringField:
+    """Incrementally decodes one string field of a JSON object streamed as text."""
+
+    def __init__(self, name: str):
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(name))
+        self._text = ""
+        self._pos: int | None = None
+        self.complete = False
+
+    def feed(self, chunk: str) -> str:
+        """Add streamed text; returns the newly decoded part of the field value."""
+        self._text += chunk
+        if self.complete:
+            return ""
+        if self._pos is None:
+            match = self._pattern.search(self._text)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        text, pos = self._text, self._pos
+        decoded: list[str] = []
+        while pos < len(text):
+            char = text[pos]
+            if char == '"':
+                self.complete = True
                 break
+            if char == "\\":
+                # Wait for the rest of an escape split across chunks
+                if pos + 1 >= len(text):
+                    break
+                escape = text[pos + 1]
+                if escape == "u":
+                    if pos + 6 > len(text):
+                        break
+                    decoded.append(chr(int(text[pos + 2:pos + 6], 16)))
+                    pos += 6
+                else:
+                    decoded.append(_JSON_ESCAPES.get(escape, escape))
+                    pos += 2
+                continue
+            decoded.append(char)
+            pos += 1
 
-    return {"success": False, "error": last_error}
+        self._pos = pos
+        return "".join(decoded)
+
+
+async def stream_image_with_gemini(
+    image: ImageInput,
+    prompt: str,
+    image_mime: str = "image/jpeg",
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Analyze an image with Gemini's streamGenerateContent (SSE).
+
+    The JSON response is decoded as it arrives, so the description can be
+    spoken before the object list is complete.
+
+    Yields:
+        {"type": "text", "text": ...} description deltas, then a final
+        {"type": "done", ...} with the same fields analyze_image_with_gemini
+        returns, or {"type": "error", "error": ...}
+    """
+    settings = get_settings()
+
+    if not settings.gemini_api_key:
+        yield {"type": "error", "error": "Gemini API key is not configured on the backend."}
+        return
+
+    if not get_breaker(GEMINI_ENGINE).allow():
+        yield {"type": "error", "error": "Gemini is temporarily unavailable (circuit open)."}
+        return
+
+    image_data = image_base64(image)
+
+    last_error = "No Gemini model is currently available."
+    client = get_http_client(GEMINI)
+    attempted = False
+    for model in _usable_models():
+        if not get_breaker(f"gemini:{model}").allow():
+            continue
+        attempted = True
+        started = time.perf_counter()
+        description = _StreamedStringField("description")
+        response_text = ""
+        usage: dict[str, Any] = {}
+        finish_reason = None
+        try:
+            async with client.stream(
+                "POST",
+                f"https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent",
+                params={"key": settings.gemini_api_key, "alt": "sse"},
+                json=_build_payload(image_data, prompt, image_mime),
+                headers={
+                    "Content-Type": "application/json",
+                    "Accept": "text/event-stream",
+                },
+            ) as response:
+                if response.status_code == 404:
+                    _mark_missing(model)
+                    _record_outcome(model, started)
+                    last_error = f"Gemini model not found: {model}"
+                    continue
+
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode("utf-8", "replace")[:500]
+                    error = f"Gemini returned HTTP {response.status_code}: {body}"
+                    if _is_upstream_failure(response.status_code):
+                        _record_outcome(model, started, error, engine_failed=True)
+                    else:
+                        _record_outcome(model, started)
+                    yield {"type": "error", "error": error}
+                    return
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = json.loads(line[5:])
+
+                    block_reason = (chunk.get("promptFeedback") or {}).get("blockReason")
+                    if block_reason:
+                        _record_outcome(model, started)
+                        yield {"type": "error", "error": f"Gemini blocked the request: {block_reason}"}
+                        return
+
+                    usage = chunk.get("usageMetadata") or usage
+                    candidate = (chunk.get("candidates") or [{}])[0]
+                    finish_reason = candidate.get("finishReason") or finish_reason
+                    for part in ((candidate.get("content") or {}).get("parts") or []):
+                        text = (part or {}).get("text")
+                        if isinstance(text, str) and text:
+                            response_text += text
+                            delta = description.feed(text)
+                            if delta:
+                                yield {"type": "text", "text": delta}
+        except httpx.ConnectError:
+            _record_outcome(model, started, "connect error", engine_failed=True)
+            yield {"type": "error", "error": "Could not reach Gemini from the backend."}
+            return
+        except httpx.TimeoutException:
+            _record_outcome(model, started, "timeout", engine_failed=True)
+            yield {"type": "error", "error": "Gemini request timed out on the backend."}
+            return
+        except Exception as exc:
+            _record_outcome(model, started, str(exc))
+            last_error = str(exc)
+            break
+
+        _record_outcome(model, started)
+        if finish_reason and finish_reason not in {"STOP", "FINISH_REASON_UNSPECIFIED"}:
+            yield {"type": "error", "error": f"Gemini finished with {finish_reason}"}
+            return
+
+        try:
+            decoded = json.loads(response_text)
+        except ValueError:
+            decoded = {}
+        text = str(decoded.get("description", "")).strip() or "No scene description returned."
+
+        yield {
+            "type": "done",
+            "success": True,
+            "engine": "gemini",
+            "response": text,
+            "description": text,
+            "objects": _parse_objects(decoded.get("objects")),
+            "model": model,
+            "prompt_tokens": int(usage.get("promptTokenCount", 0) or 0),
+            "completion_tokens": int(usage.get("candidatesTokenCount", 0) or 0),
+            "inference_ms": int((time.perf_counter() - started) * 1000),
+        }
+        return
+
+    if not attempted:
+        get_breaker(GEMINI_ENGINE).release()
+    yield {"type": "error", "error": last_error}
 
 
 async def check_gemini_health() -> dict[str, Any]:
     settings = get_settings()
+    now = time.monotonic()
     return {
         "configured": bool(settings.gemini_api_key),
         "primaryModel": settings.gemini_model,
         "fallbackModel": settings.gemini_fallback_model,
+        "breaker": get_breaker(GEMINI_ENGINE).snapshot(),
+        "models": breaker_snapshots("gemini:"),
+        "missingModels": sorted(model for model, until in _missing_models.items() if until > now),
     }
\ No newline at end of file
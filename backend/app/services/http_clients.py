@@ -0,0 +1,102 @@
+"""
+Drishti AI - Shared HTTP Clients
+
+Application-scoped httpx clients for the upstream APIs (Gemini, Ollama,
+Google OAuth). Reusing one pooled client per upstream keeps TCP/TLS
+connections alive between requests instead of paying a handshake on every
+frame. Clients are opened in the app lifespan and closed on shutdown;
+outside the app (scripts) they are created on first use.
+"""
+
+import importlib.util
+from typing import Dict
+
+import httpx
+
+from app.config import get_settings
+
+
+GEMINI = "gemini"
+OLLAMA = "ollama"
+OAUTH = "oauth"
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_available() -> bool:
+    # httpx needs the optional h2 package (httpx[http2]) for HTTP/2
+    return importlib.util.find_spec("h2") is not None
+
+
+def _limits() -> httpx.Limits:
+    settings = get_settings()
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+
+
+def _create_client(name: str) -> httpx.AsyncClient:
+    settings = get_settings()
+
+    if name == GEMINI:
+        http2 = settings.gemini_http2 and _http2_available()
+        if settings.gemini_http2 and not http2:
+            print("⚠️ h2 not installed; Gemini requests use HTTP/1.1 (pip install 'httpx[http2]')")
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=_limits(),
+            timeout=httpx.Timeout(
+                settings.gemini_timeout_seconds,
+                connect=settings.gemini_connect_timeout_seconds,
+            ),
+        )
+
+    if name == OLLAMA:
+        return httpx.AsyncClient(
+            limits=_limits(),
+            timeout=httpx.Timeout(
+                settings.ollama_timeout_seconds,
+                connect=settings.ollama_connect_timeout_seconds,
+            ),
+        )
+
+    if name == OAUTH:
+        return httpx.AsyncClient(
+            limits=_limits(),
+            timeout=httpx.Timeout(settings.oauth_timeout_seconds),
+        )
+
+    raise ValueError(f"Unknown HTTP client: {name}")
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """
+    Shared client for an upstream, created on first use.
+
+    Args:
+        name: GEMINI, OLLAMA or OAUTH
+
+    Returns:
+        Pooled httpx.AsyncClient; callers must not close it
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _clients[name] = _create_client(name)
+    return client
+
+
+def open_http_clients() -> None:
+    """Create every upstream client up front (app startup)."""
+    for name in (GEMINI, OLLAMA, OAUTH):
+        get_http_client(name)
+
+
+async def close_http_clients() -> None:
+    """Close all clients and their pooled connections (app shutdown)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
@@ -0,0 +1,83 @@
+"""
+Drishti AI - Inference Executor
+
+Dedicated worker pool for CPU-bound face inference so it never runs on the
+event loop. Queue depth is bounded; callers past the limit get an
+InferenceBusyError, surfaced as HTTP 503 with Retry-After.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from app.config import get_settings
+
+
+class InferenceBusyError(Exception):
+    """Raised when the inference queue is full."""
+
+
+# ONNX Runtime releases the GIL during session.run, so threads give real
+# parallelism without duplicating the model in every worker process.
+_executor: Optional[ThreadPoolExecutor] = None
+_pending: int = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        settings = get_settings()
+        _executor = ThreadPoolExecutor(
+            max_workers=max(settings.face_inference_workers, 1),
+            thread_name_prefix="face-inference",
+        )
+    return _executor
+
+
+async def run_inference(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking inference call on the inference pool.
+
+    Args:
+        func: Synchronous function to run
+        *args, **kwargs: Arguments passed to func
+
+    Returns:
+        Result of func
+
+    Raises:
+        InferenceBusyError: If max queued + running calls is reached
+    """
+    global _pending
+
+    settings = get_settings()
+    if _pending >= max(settings.face_inference_max_queue, 1):
+        raise InferenceBusyError("Face recognition is busy, please retry shortly")
+
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+    finally:
+        _pending -= 1
+
+
+def get_inference_stats() -> dict:
+    """Return current queue depth and configured limits."""
+    settings = get_settings()
+    return {
+        "pending": _pending,
+        "workers": max(settings.face_inference_workers, 1),
+        "maxQueue": max(settings.face_inference_max_queue, 1),
+    }
+
+
+def shutdown_inference_executor() -> None:
+    """Stop the inference pool (called on application shutdown)."""
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
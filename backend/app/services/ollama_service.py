@@ -4,36 +4,59 @@ Drishti AI - Ollama Service
 Vision Language Model integration via Ollama API.
 """
 
+import json
+import time
 import httpx
-from typing import Optional
+from typing import AsyncIterator, Optional
 from app.config import get_settings
+from app.services.circuit_breaker import get_breaker
+from app.services.http_clients import OLLAMA, get_http_client
+from app.utils.images import ImageInput, image_base64, image_payload_size
 
 
-async def analyze_image(image_base64: str, prompt: str) -> dict:
+OLLAMA_ENGINE = "ollama"
+
+
+def ollama_available() -> bool:
+    """Whether the Ollama circuit breaker currently lets calls through."""
+    return get_breaker(OLLAMA_ENGINE).available()
+
+
+async def analyze_image(image: ImageInput, prompt: str) -> dict:
     """
     Analyze an image using Ollama vision model.
     
+    Calls are skipped while the Ollama circuit breaker is open.
+    
     Args:
-        image_base64: Base64 encoded image (without data URL prefix)
+        image: Base64 encoded image or raw image bytes (encoded once here,
+            since the Ollama API takes base64 in JSON)
         prompt: Text prompt for the model
         
     Returns:
         dict with success, response, model, and optional error
     """
-    settings = get_settings()
-    
-    if not image_base64:
+    if not image:
         return {"success": False, "error": "No image data provided"}
     
-    # Strip data URL prefix if present
-    if image_base64.startswith("data:"):
-        # Extract base64 portion after the comma
-        parts = image_base64.split(",", 1)
-        if len(parts) == 2:
-            image_base64 = parts[1]
+    breaker = get_breaker(OLLAMA_ENGINE)
+    if not breaker.allow():
+        return {"success": False, "error": "Ollama is temporarily unavailable (circuit open)"}
+    
+    started = time.perf_counter()
+    result = await _generate(image, prompt)
+    if result["success"]:
+        breaker.record_success(time.perf_counter() - started)
+    else:
+        breaker.record_failure(result["error"], time.perf_counter() - started)
+    return result
+
+
+async def _generate(image: ImageInput, prompt: str) -> dict:
+    settings = get_settings()
     
     # Basic sanity check
-    size_kb = len(image_base64) * 3 // 4 // 1024
+    size_kb = image_payload_size(image) // 1024
     if size_kb > 10000:  # > 10MB
         print(f"Warning: Large image payload (~{size_kb} KB)")
     
@@ -41,35 +64,35 @@ async def analyze_image(image_base64: str, prompt: str) -> dict:
         payload = {
             "model": settings.ollama_model,
             "prompt": prompt,
-            "images": [image_base64],
+            "images": [image_base64(image)],
             "stream": False
         }
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{settings.ollama_url}/api/generate",
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json"
-                }
-            )
-            
-            if response.status_code != 200:
-                return {
-                    "success": False,
-                    "error": f"Ollama returned status {response.status_code}"
-                }
-            
-            data = response.json()
-            
+        client = get_http_client(OLLAMA)
+        response = await client.post(
+            f"{settings.ollama_url}/api/generate",
+            json=payload,
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            }
+        )
+        
+        if response.status_code != 200:
             return {
-                "success": True,
-                "response": data.get("response", ""),
-                "model": settings.ollama_model,
-                "context": data.get("context")
+                "success": False,
+                "error": f"Ollama returned status {response.status_code}"
             }
-            
+        
+        data = response.json()
+        
+        return {
+            "success": True,
+            "response": data.get("response", ""),
+            "model": settings.ollama_model,
+            "context": data.get("context")
+        }
+        
     except httpx.ConnectError:
         return {
             "success": False,
@@ -82,9 +105,100 @@ async def analyze_image(image_base64: str, prompt: str) -> dict:
         }
 
 
+async def stream_analyze_image(image: ImageInput, prompt: str) -> AsyncIterator[dict]:
+    """
+    Analyze an image using Ollama's streaming generate mode.
+    
+    Args:
+        image: Base64 encoded image or raw image bytes
+        prompt: Text prompt for the model
+        
+    Yields:
+        {"type": "text", "text": ...} response deltas, then a final
+        {"type": "done", ...} result or {"type": "error", "error": ...}
+    """
+    if not image:
+        yield {"type": "error", "error": "No image data provided"}
+        return
+    
+    breaker = get_breaker(OLLAMA_ENGINE)
+    if not breaker.allow():
+        yield {"type": "error", "error": "Ollama is temporarily unavailable (circuit open)"}
+        return
+    
+    started = time.perf_counter()
+    async for event in _stream_generate(image, prompt):
+        if event["type"] == "done":
+            breaker.record_success(time.perf_counter() - started)
+        elif event["type"] == "error":
+            breaker.record_failure(event["error"], time.perf_counter() - started)
+        yield event
+
+
+async def _stream_generate(image: ImageInput, prompt: str) -> AsyncIterator[dict]:
+    settings = get_settings()
+    
+    payload = {
+        "model": settings.ollama_model,
+        "prompt": prompt,
+        "images": [image_base64(image)],
+        "stream": True
+    }
+    
+    text = ""
+    try:
+        async with get_http_client(OLLAMA).stream(
+            "POST",
+            f"{settings.ollama_url}/api/generate",
+            json=payload,
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            if response.status_code != 200:
+                yield {"type": "error", "error": f"Ollama returned status {response.status_code}"}
+                return
+            
+            # One JSON object per line; the last has done=true and the counters
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    yield {"type": "error", "error": data["error"]}
+                    return
+                
+                delta = data.get("response", "")
+                if delta:
+                    text += delta
+                    yield {"type": "text", "text": delta}
+                
+                if data.get("done"):
+                    yield {
+                        "type": "done",
+                        "success": True,
+                        "engine": "ollama",
+                        "response": text,
+                        "description": text,
+                        "objects": [],
+                        "model": settings.ollama_model,
+                        "prompt_tokens": int(data.get("prompt_eval_count", 0) or 0),
+                        "completion_tokens": int(data.get("eval_count", 0) or 0),
+                        "inference_ms": int((data.get("total_duration", 0) or 0) / 1e6)
+                    }
+                    return
+        
+        yield {"type": "error", "error": "Ollama stream ended before completion"}
+    except httpx.ConnectError:
+        yield {
+            "type": "error",
+            "error": f"Cannot connect to Ollama. Make sure Ollama is running on {settings.ollama_url}"
+        }
+    except Exception as e:
+        yield {"type": "error", "error": str(e)}
+
+
 async def check_ollama_health() -> dict:
     """
-    Check if Ollama is available and has the required model.
+    Check if Ollama is available and has the required model (live probe).
     
     Returns:
         dict with available, models, and hasRequiredModel
@@ -92,23 +206,25 @@ async def check_ollama_health() -> dict:
     settings = get_settings()
     
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{settings.ollama_url}/api/tags")
-            
-            if response.status_code != 200:
-                return {"available": False, "error": "Ollama not responding"}
-            
-            data = response.json()
-            models = [m.get("name", "") for m in data.get("models", [])]
-            
-            has_model = any(settings.ollama_model in m for m in models)
-            
-            return {
-                "available": True,
-                "models": models,
-                "hasRequiredModel": has_model
-            }
-            
+        response = await get_http_client(OLLAMA).get(
+            f"{settings.ollama_url}/api/tags",
+            timeout=settings.ollama_health_timeout_seconds
+        )
+        
+        if response.status_code != 200:
+            return {"available": False, "error": "Ollama not responding"}
+        
+        data = response.json()
+        models = [m.get("name", "") for m in data.get("models", [])]
+        
+        has_model = any(settings.ollama_model in m for m in models)
+        
+        return {
+            "available": True,
+            "models": models,
+            "hasRequiredModel": has_model
+        }
+        
     except Exception as e:
         return {
             "available": False,
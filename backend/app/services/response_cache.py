@@ -0,0 +1,156 @@
+"""
+Drishti AI - Vision Response Cache
+
+Caches vision model results for near-identical frames. Frames are keyed by
+a 64-bit difference hash (dHash) of a reduced grayscale decode, so a user
+standing still gets a hit even though every camera frame differs slightly
+in its bytes. A lookup matches the same caller and normalized prompt
+within a Hamming-distance tolerance; entries expire after a TTL and the
+cache is bounded by entry count and approximate size (LRU eviction).
+"""
+
+import copy
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.config import get_settings
+from app.utils.images import ImageInput, image_bytes
+
+
+# dHash compares horizontally adjacent pixels of a 9x8 thumbnail
+DHASH_SIZE = 8
+
+
+def dhash(image: ImageInput) -> Optional[int]:
+    """
+    64-bit difference hash of an encoded image (blocking, ~1 ms).
+
+    JPEGs are decoded at 1/8 scale straight to grayscale, which is all the
+    9x8 thumbnail needs.
+
+    Returns:
+        Hash as an int, or None if the image cannot be decoded
+    """
+    data = np.frombuffer(image_bytes(image), dtype=np.uint8)
+    gray = cv2.imdecode(data, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        return None
+
+    thumbnail = cv2.resize(gray, (DHASH_SIZE + 1, DHASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive prompt key."""
+    return re.sub(r"\s+", " ", prompt).strip().rstrip("?.!").lower()
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class _Entry:
+    def __init__(self, frame_hash: int, result: dict, size: int, expires_at: float):
+        self.frame_hash = frame_hash
+        self.result = result
+        self.size = size
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """LRU of vision results keyed by (scope, prompt, frame hash)."""
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, str, int], _Entry]" = OrderedDict()
+        # (scope, prompt) -> keys of its entries, so lookups only scan those
+        self._by_prompt: Dict[Tuple[str, str], set] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope: str, prompt: str, frame_hash: int) -> Optional[dict]:
+        """
+        Closest cached result within the Hamming tolerance.
+
+        Returns:
+            A copy of the cached result with "cached": True and zero token
+            counts, or None
+        """
+        settings = get_settings()
+        now = time.monotonic()
+        group = (scope, normalize_prompt(prompt))
+
+        best_key, best_distance = None, settings.response_cache_max_distance + 1
+        for key in list(self._by_prompt.get(group, ())):
+            entry = self._entries[key]
+            if entry.expires_at <= now:
+                self._remove(key)
+                continue
+            distance = _hamming(entry.frame_hash, frame_hash)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best_key)
+        result = copy.deepcopy(self._entries[best_key].result)
+        # Nothing was spent on this answer
+        result.update(cached=True, prompt_tokens=0, completion_tokens=0, inference_ms=0)
+        return result
+
+    def put(self, scope: str, prompt: str, frame_hash: int, result: dict) -> None:
+        """Store a successful result, evicting least recently used entries past the bounds."""
+        settings = get_settings()
+        group = (scope, normalize_prompt(prompt))
+        key = (group[0], group[1], frame_hash)
+
+        if key in self._entries:
+            self._remove(key)
+
+        size = len(json.dumps(result, default=str)) + len(group[1]) + 64
+        self._entries[key] = _Entry(
+            frame_hash, copy.deepcopy(result), size,
+            time.monotonic() + settings.response_cache_ttl_seconds
+        )
+        self._by_prompt.setdefault(group, set()).add(key)
+        self._bytes += size
+
+        while self._entries and (
+            len(self._entries) > max(settings.response_cache_max_entries, 1)
+            or self._bytes > settings.response_cache_max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        """Size and hit rate for health output."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+    def _remove(self, key: Tuple[str, str, int]) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        group = key[:2]
+        keys = self._by_prompt.get(group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_prompt[group]
+
+
+response_cache = ResponseCache()
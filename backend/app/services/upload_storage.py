@@ -0,0 +1,223 @@
+"""
+Drishti AI - Upload Storage
+
+Streams multipart uploads to disk in chunks without loading whole files
+into memory or blocking the event loop. The size limit is enforced and a
+SHA-256 digest computed while streaming; files are staged in a directory
+that is not served and only moved into /uploads once the caller accepts
+them. Abandoned staging files are removed at startup and by the upload GC.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import List, Optional
+
+import aiofiles
+from fastapi import UploadFile
+
+from app.config import get_settings
+
+
+UPLOADS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "uploads"))
+
+# Next to, not inside, the publicly mounted uploads directory; on the same
+# filesystem, so committing a staged file is an atomic rename
+STAGING_DIR = os.path.abspath(os.path.join(UPLOADS_DIR, "..", ".upload-staging"))
+
+# Staging files were once written into UPLOADS_DIR under this prefix
+LEGACY_STAGING_PREFIX = ".staging-"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def upload_file_path(public_path: str) -> Optional[str]:
+    """
+    Filesystem path of a public "/uploads/..." path.
+
+    Returns:
+        Absolute path inside UPLOADS_DIR, or None for paths outside it
+    """
+    relpath = public_path.split("/uploads/", 1)[-1].lstrip("/")
+    filepath = os.path.abspath(os.path.join(UPLOADS_DIR, relpath))
+    if os.path.commonpath([filepath, UPLOADS_DIR]) != UPLOADS_DIR:
+        return None
+    return filepath
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds max_file_size (surfaced as HTTP 413)."""
+
+
+class StagedUpload:
+    """An uploaded file written to a staging path, not yet part of /uploads."""
+
+    def __init__(self, original_name: Optional[str], path: str, size: int, sha256: str):
+        self.original_name = original_name or ""
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.committed = False
+
+    @property
+    def extension(self) -> str:
+        """Lower-case extension of the client filename, defaulting to jpg."""
+        if "." in self.original_name:
+            return self.original_name.rsplit(".", 1)[-1].lower()
+        return "jpg"
+
+    async def commit(self, filename: str) -> str:
+        """
+        Move the staged file into /uploads.
+
+        Args:
+            filename: Final path relative to the uploads directory
+
+        Returns:
+            Public path of the stored file ("/uploads/<filename>")
+        """
+        await asyncio.to_thread(os.replace, self.path, os.path.join(UPLOADS_DIR, filename))
+        self.committed = True
+        return f"/uploads/{filename}"
+
+    async def discard(self) -> None:
+        """Delete the staged file unless it was committed."""
+        if not self.committed:
+            await asyncio.to_thread(remove_quietly, self.path)
+
+
+def remove_quietly(path: str) -> None:
+    """Delete a file, ignoring errors (e.g. it is already gone)."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def remove_if_stale(filepath: str, grace_seconds: float) -> int:
+    """Delete a file not modified within the grace period; returns bytes freed."""
+    try:
+        stat = os.stat(filepath)
+        if time.time() - stat.st_mtime < grace_seconds:
+            return 0
+        os.remove(filepath)
+        return stat.st_size
+    except OSError:
+        return 0
+
+
+async def stage_upload(file: UploadFile, max_size: Optional[int] = None) -> StagedUpload:
+    """
+    Stream one upload to a staging file, hashing it on the way.
+
+    Args:
+        file: Incoming multipart file
+        max_size: Byte limit (defaults to settings.max_file_size)
+
+    Returns:
+        StagedUpload with size and SHA-256 digest
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds the limit; nothing is
+            left on disk
+    """
+    limit = max_size or get_settings().max_file_size
+    await asyncio.to_thread(os.makedirs, STAGING_DIR, exist_ok=True)
+    path = os.path.join(STAGING_DIR, uuid.uuid4().hex)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > limit:
+                    raise _too_large(file, limit)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        await asyncio.to_thread(remove_quietly, path)
+        raise
+
+    return StagedUpload(file.filename, path, size, digest.hexdigest())
+
+
+async def read_upload(file: UploadFile, max_size: Optional[int] = None) -> bytes:
+    """
+    Read an upload into memory in chunks, stopping as soon as it is too large.
+
+    For images that are processed in memory and never stored.
+
+    Args:
+        file: Incoming multipart file
+        max_size: Byte limit (defaults to settings.max_file_size)
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds the limit
+    """
+    limit = max_size or get_settings().max_file_size
+    content = bytearray()
+    while chunk := await file.read(CHUNK_SIZE):
+        if len(content) + len(chunk) > limit:
+            raise _too_large(file, limit)
+        content += chunk
+    return bytes(content)
+
+
+def _too_large(file: UploadFile, limit: int) -> UploadTooLargeError:
+    return UploadTooLargeError(f"{file.filename or 'Upload'} is larger than the {limit:,} byte limit")
+
+
+async def stage_uploads(files: List[UploadFile]) -> List[StagedUpload]:
+    """Stage several uploads in order; on failure none are left behind."""
+    staged: List[StagedUpload] = []
+    try:
+        for file in files:
+            staged.append(await stage_upload(file))
+    except BaseException:
+        await discard_uploads(staged)
+        raise
+    return staged
+
+
+async def discard_uploads(uploads: List[StagedUpload]) -> None:
+    """Delete every staged upload that was not committed."""
+    for upload in uploads:
+        await upload.discard()
+
+
+def _staging_files() -> List[str]:
+    files = []
+    if os.path.isdir(STAGING_DIR):
+        files.extend(os.path.join(STAGING_DIR, name) for name in os.listdir(STAGING_DIR))
+    if os.path.isdir(UPLOADS_DIR):
+        files.extend(
+            os.path.join(UPLOADS_DIR, name) for name in os.listdir(UPLOADS_DIR)
+            if name.startswith(LEGACY_STAGING_PREFIX)
+        )
+    return files
+
+
+async def clean_staging(grace_seconds: Optional[float] = None) -> int:
+    """
+    Delete staging files left behind by failed or crashed requests.
+
+    Files modified within the grace period may belong to an upload still in
+    progress (possibly in another worker) and are kept.
+
+    Args:
+        grace_seconds: Minimum age of deleted files (defaults to settings)
+
+    Returns:
+        Number of files removed
+    """
+    if grace_seconds is None:
+        grace_seconds = get_settings().upload_gc_grace_seconds
+
+    removed = 0
+    for filepath in await asyncio.to_thread(_staging_files):
+        if await asyncio.to_thread(remove_if_stale, filepath, grace_seconds):
+            removed += 1
+    return removed
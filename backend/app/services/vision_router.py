@@ -0,0 +1,165 @@
+"""
+Drishti AI - Vision Engine Routing
+
+Chooses how an analyze request uses the two vision engines:
+
+- sequential: Gemini, then Ollama only after Gemini fails
+- hedged: Gemini, plus Ollama once Gemini is slower than its recent p95
+  latency (or has failed); the first success wins and the other is cancelled
+- race: both at once; the first success wins
+
+Engines whose circuit breaker is open are left out, so a failing engine
+costs nothing until its breaker lets a probe through; without a Gemini API
+key every policy just calls Ollama.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+from app.config import get_settings
+from app.services.gemini_service import analyze_image_with_gemini, gemini_available
+from app.services.ollama_service import analyze_image, ollama_available
+from app.utils.images import ImageInput
+
+
+ROUTING_POLICIES = ("sequential", "hedged", "race")
+
+
+class LatencyWindow:
+    """Rolling window of successful request latencies (seconds)."""
+
+    def __init__(self, size: int):
+        self._samples = deque(maxlen=max(size, 1))
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th percentile, or None until enough samples exist."""
+        if len(self._samples) < 10:
+            return None
+        ordered = sorted(self._samples)
+        index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+
+_gemini_latency = LatencyWindow(get_settings().vision_latency_window)
+
+
+def hedge_delay() -> float:
+    """Seconds to wait for Gemini before hedging with Ollama."""
+    settings = get_settings()
+    observed = _gemini_latency.percentile(settings.vision_hedge_percentile)
+    if observed is None:
+        return settings.vision_hedge_delay_seconds
+    return min(
+        max(observed, settings.vision_hedge_min_delay_seconds),
+        settings.vision_hedge_max_delay_seconds
+    )
+
+
+async def _run_gemini(image: ImageInput, prompt: str, image_mime: str) -> dict:
+    started = time.perf_counter()
+    result = await analyze_image_with_gemini(image=image, prompt=prompt, image_mime=image_mime)
+    if result.get("success"):
+        _gemini_latency.record(time.perf_counter() - started)
+    return result
+
+
+async def _run_ollama(image: ImageInput, prompt: str) -> dict:
+    started = time.perf_counter()
+    result = await analyze_image(image, prompt)
+    if result.get("success"):
+        result["engine"] = "ollama"
+        result["description"] = result.get("response", "")
+        result["objects"] = []
+        result["prompt_tokens"] = 0
+        result["completion_tokens"] = 0
+        result["inference_ms"] = int((time.perf_counter() - started) * 1000)
+    return result
+
+
+def _combined_error(gemini: Optional[dict], ollama: dict) -> dict:
+    if gemini and gemini.get("error"):
+        return {
+            "success": False,
+            "error": f"Cloud vision failed: {gemini['error']}. Local backend fallback failed: {ollama.get('error', 'unknown error')}"
+        }
+    return ollama
+
+
+async def _first_success(tasks: dict) -> dict:
+    """
+    Wait for the first successful task and cancel the rest.
+
+    Args:
+        tasks: engine name -> running task
+
+    Returns:
+        The winning result, or a combined error once every task has failed
+    """
+    results = {}
+    pending = set(tasks.values())
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = next(n for n, t in tasks.items() if t is task)
+                results[name] = task.result()
+                if results[name].get("success"):
+                    return results[name]
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return _combined_error(results.get("gemini"), results.get("ollama", {"error": "not started"}))
+
+
+async def route_vision_analysis(image: ImageInput, prompt: str, image_mime: str) -> dict:
+    """
+    Analyze an image with the configured routing policy.
+
+    Returns:
+        Engine result (success, response, description, objects, model,
+        engine, token counts, inference_ms) or {"success": False, "error"}
+    """
+    settings = get_settings()
+
+    use_gemini = gemini_available()
+    use_ollama = ollama_available()
+    if not use_gemini and not use_ollama and settings.gemini_api_key:
+        return {"success": False, "error": "All vision engines are temporarily unavailable; retry shortly."}
+    if not use_gemini:
+        return await _run_ollama(image, prompt)
+    if not use_ollama:
+        return await _run_gemini(image, prompt, image_mime)
+
+    policy = settings.vision_routing_policy
+    if policy not in ROUTING_POLICIES:
+        policy = "sequential"
+
+    if policy == "sequential":
+        result = await _run_gemini(image, prompt, image_mime)
+        if result.get("success"):
+            return result
+        fallback = await _run_ollama(image, prompt)
+        return fallback if fallback.get("success") else _combined_error(result, fallback)
+
+    gemini = asyncio.create_task(_run_gemini(image, prompt, image_mime))
+
+    if policy == "hedged":
+        try:
+            # shield: a timed-out wait must not cancel the Gemini request
+            result = await asyncio.wait_for(asyncio.shield(gemini), hedge_delay())
+            if result.get("success"):
+                return result
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            gemini.cancel()
+            raise
+
+    ollama = asyncio.create_task(_run_ollama(image, prompt))
+    return await _first_success({"gemini": gemini, "ollama": ollama})
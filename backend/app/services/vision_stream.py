@@ -0,0 +1,162 @@
+"""
+Drishti AI - Streaming Vision Analysis
+
+Streams a vision model's description as whole sentences, so text-to-speech
+can start on the first sentence instead of waiting for the full completion.
+Alert keywords are checked after every sentence and reported as soon as
+the severity rises.
+"""
+
+import re
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.config import get_settings
+from app.services.alert_detector import analyze_for_alerts
+from app.services.gemini_service import gemini_available, stream_image_with_gemini
+from app.services.ollama_service import ollama_available, stream_analyze_image
+from app.utils.images import ImageInput
+
+
+# Sentence end: terminal punctuation (plus closing quotes/brackets) followed
+# by whitespace, so "3.5 m" or a chunk ending in "." does not split early
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*(?=\s)")
+
+# Abbreviations whose period does not end a sentence ("e.g. a chair")
+_ABBREVIATIONS = {"e.g", "i.e", "approx", "vs", "mr", "mrs", "ms", "dr", "st"}
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+
+class SentenceChunker:
+    """Buffers streamed text and releases complete sentences."""
+
+    def __init__(self, max_chars: int = 240):
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns the sentences it completed."""
+        self._buffer += text
+        sentences = []
+        while True:
+            cut = self._sentence_end()
+            if cut is None:
+                if len(self._buffer) <= self.max_chars:
+                    break
+                # Run-on text: break at the last space within the limit
+                cut = self._buffer.rfind(" ", 0, self.max_chars) + 1 or self.max_chars
+            sentence = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def _sentence_end(self) -> Optional[int]:
+        """Index just past the first sentence end in the buffer, if any."""
+        for match in _SENTENCE_END.finditer(self._buffer):
+            words = self._buffer[:match.start()].split()
+            if match.group() == "." and words and words[-1].lstrip("(\"'").lower() in _ABBREVIATIONS:
+                continue
+            return match.end()
+        return None
+
+    def flush(self) -> List[str]:
+        """Return whatever text is left once the stream has ended."""
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def _engine_streams(image: ImageInput, prompt: str, image_mime: str) -> list:
+    """
+    (label, stream) in fallback order: Gemini when configured, then Ollama.
+
+    Engines whose circuit breaker is open are skipped unless no engine is
+    healthy, in which case they fail fast with the breaker's error.
+    """
+    engines = []
+    if get_settings().gemini_api_key:
+        engines.append(("Cloud vision", gemini_available(), lambda: stream_image_with_gemini(image, prompt, image_mime)))
+    engines.append(("Local backend fallback", ollama_available(), lambda: stream_analyze_image(image, prompt)))
+
+    healthy = [engine for engine in engines if engine[1]] or engines
+    return [(label, open_stream()) for label, _, open_stream in healthy]
+
+
+async def stream_vision_analysis(
+    image: ImageInput,
+    prompt: str,
+    image_mime: str = "image/jpeg",
+    cached: Optional[dict] = None
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Stream an image analysis as sentence and alert events.
+
+    An engine that fails before producing any text falls back to the next
+    one, as the non-streaming path does; once sentences have been sent a
+    failure is reported instead, since they cannot be taken back. A cached
+    result is replayed as the same events without calling an engine.
+
+    Yields:
+        ("sentence", {"index", "text"}) for each sentence,
+        ("alert", alert analysis) whenever the detected severity rises,
+        then ("result", engine result) or ("error", {"error"})
+    """
+    max_chars = get_settings().vision_stream_max_sentence_chars
+    sentences: List[str] = []
+    alert_rank = 0
+    errors: List[Tuple[str, str]] = []
+
+    def emit(new_sentences: List[str]) -> List[Tuple[str, dict]]:
+        nonlocal alert_rank
+        events = []
+        for sentence in new_sentences:
+            events.append(("sentence", {"index": len(sentences), "text": sentence}))
+            sentences.append(sentence)
+
+        if new_sentences:
+            alert = analyze_for_alerts(" ".join(sentences))
+            rank = SEVERITY_RANK.get(alert["severity"], 0)
+            if alert["detected"] and rank > alert_rank:
+                alert_rank = rank
+                events.append(("alert", alert))
+        return events
+
+    if cached is not None:
+        chunker = SentenceChunker(max_chars)
+        for item in emit(chunker.feed(cached["description"]) + chunker.flush()):
+            yield item
+        yield "result", cached
+        return
+
+    for label, stream in _engine_streams(image, prompt, image_mime):
+        chunker = SentenceChunker(max_chars)
+        try:
+            async for event in stream:
+                if event["type"] == "text":
+                    for item in emit(chunker.feed(event["text"])):
+                        yield item
+                    continue
+
+                if event["type"] == "done":
+                    remaining = chunker.flush()
+                    if not sentences and not remaining:
+                        # Nothing was streamed (e.g. unparsable partial JSON)
+                        remaining = chunker.feed(event["description"]) + chunker.flush()
+                    for item in emit(remaining):
+                        yield item
+                    yield "result", event
+                    return
+
+                if sentences:
+                    yield "error", {"error": event["error"]}
+                    return
+                errors.append((label, event["error"]))
+                break
+        finally:
+            # Closes the upstream HTTP stream on fallback or client disconnect
+            await stream.aclose()
+
+    if len(errors) == 1:
+        yield "error", {"error": errors[0][1]}
+    else:
+        yield "error", {"error": ". ".join(f"{label} failed: {error}" for label, error in errors)}
@@ -0,0 +1,46 @@
+"""
+Drishti AI - Image Payload Utilities
+
+Image payloads arrive either as base64 text (JSON requests) or as raw
+bytes (multipart uploads). These helpers convert between the two only at
+the edge that needs it, so each payload is decoded or encoded at most once.
+"""
+
+import base64
+from typing import Union
+
+
+# Base64 string (optionally a data URL) or raw encoded image bytes
+ImageInput = Union[str, bytes, bytearray, memoryview]
+
+
+def strip_data_url(image_base64: str) -> str:
+    """Remove a "data:<mime>;base64," prefix if present."""
+    if image_base64.startswith("data:"):
+        parts = image_base64.split(",", 1)
+        if len(parts) == 2:
+            return parts[1]
+    return image_base64
+
+
+def image_bytes(image: ImageInput) -> Union[bytes, memoryview]:
+    """Encoded image bytes; base64 text is decoded, binary passes through uncopied."""
+    if isinstance(image, str):
+        return base64.b64decode(strip_data_url(image))
+    if isinstance(image, bytearray):
+        return memoryview(image)
+    return image
+
+
+def image_base64(image: ImageInput) -> str:
+    """Base64 text for JSON upstream APIs; base64 input passes through."""
+    if isinstance(image, str):
+        return strip_data_url(image)
+    return base64.b64encode(image).decode("ascii")
+
+
+def image_payload_size(image: ImageInput) -> int:
+    """Approximate size of the encoded image in bytes."""
+    if isinstance(image, str):
+        return len(strip_data_url(image)) * 3 // 4
+    return len(image)
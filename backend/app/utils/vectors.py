@@ -0,0 +1,43 @@
+"""
+Drishti AI - Vector Utilities
+
+Small numpy helpers for face embedding math.
+"""
+
+import numpy as np
+from typing import Tuple
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row, leaving all-zero rows unchanged."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def spherical_kmeans(
+    matrix: np.ndarray,
+    k: int,
+    iterations: int = 10,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cluster L2-normalized rows by cosine similarity.
+
+    Returns:
+        (k, dim) normalized centroids and the cluster index of each row
+    """
+    k = max(1, min(k, len(matrix)))
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        for c in range(k):
+            members = matrix[assignments == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = normalize_rows(centroids)
+
+    assignments = np.argmax(matrix @ centroids.T, axis=1)
+    return centroids.astype(np.float32), assignments
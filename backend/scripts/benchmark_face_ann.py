@@ -0,0 +1,84 @@
+"""
+Drishti AI - Face Gallery ANN Benchmark
+
+Measures recall@1 and per-query latency of the IVF index in FaceGallery
+against exact search on a synthetic gallery (clustered 512-dim vectors,
+several noisy photos per person).
+
+Usage (from the backend directory):
+    python -m scripts.benchmark_face_ann [--persons 500] [--photos 8] [--queries 500]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.face_gallery import FaceGallery, IVFIndex
+
+
+def _synthetic_gallery(persons: int, photos: int, dim: int, noise: float, rng):
+    identities = rng.normal(size=(persons, dim)).astype(np.float32)
+    known_persons = [
+        {
+            "id": str(i),
+            "name": f"person-{i}",
+            "relationship": "",
+            "face_embeddings": identities[i] + noise * rng.normal(size=(photos, dim)),
+        }
+        for i in range(persons)
+    ]
+    return identities, known_persons
+
+
+def _timed_match(gallery: FaceGallery, queries: np.ndarray):
+    started = time.perf_counter()
+    results = [gallery.match(query) for query in queries]
+    elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    return [person["id"] for person, _ in results], elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FaceGallery IVF index vs exact search")
+    parser.add_argument("--persons", type=int, default=500)
+    parser.add_argument("--photos", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--noise", type=float, default=0.8)
+    parser.add_argument("--probes", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    identities, known_persons = _synthetic_gallery(args.persons, args.photos, args.dim, args.noise, rng)
+    query_ids = rng.integers(0, args.persons, size=args.queries)
+    queries = identities[query_ids] + args.noise * rng.normal(size=(args.queries, args.dim))
+
+    # Exact search: disable automatic index building
+    os.environ["FACE_ANN_MIN_ROWS"] = "0"
+    get_settings.cache_clear()
+    gallery = FaceGallery.from_persons(known_persons)
+    exact_ids, exact_ms = _timed_match(gallery, queries)
+    accuracy = np.mean([p == str(q) for p, q in zip(exact_ids, query_ids)])
+
+    print(f"Gallery: {len(gallery)} rows ({args.persons} persons x {args.photos} photos), dim {args.dim}")
+    print(f"{'mode':<16}{'recall@1':>10}{'ms/query':>10}")
+    print(f"{'exact':<16}{1.0:>10.3f}{exact_ms:>10.3f}   (identity accuracy {accuracy:.3f})")
+
+    started = time.perf_counter()
+    gallery.index = IVFIndex.build(gallery.matrix, n_lists=int(np.sqrt(len(gallery))))
+    build_s = time.perf_counter() - started
+
+    for n_probe in [int(p) for p in args.probes.split(",")]:
+        os.environ["FACE_ANN_N_PROBE"] = str(n_probe)
+        get_settings.cache_clear()
+        ann_ids, ann_ms = _timed_match(gallery, queries)
+        recall = np.mean([a == e for a, e in zip(ann_ids, exact_ids)])
+        print(f"{f'ivf n_probe={n_probe}':<16}{recall:>10.3f}{ann_ms:>10.3f}")
+
+    print(f"\nIVF build: {len(gallery.index.lists)} lists in {build_s:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
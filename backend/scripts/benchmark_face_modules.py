@@ -0,0 +1,103 @@
+"""
+Drishti AI - Face Module Benchmark
+
+Compares load time, per-image latency and resident memory of InsightFace
+FaceAnalysis configurations (full pack vs. detection + recognition only).
+Each configuration runs in its own process so RSS numbers do not mix.
+
+Usage (from the backend directory):
+    python -m scripts.benchmark_face_modules [--pack buffalo_l] [--image path.jpg] [--runs 50]
+"""
+
+import argparse
+import multiprocessing
+import statistics
+import time
+
+
+CONFIGURATIONS = {
+    "full-pack": None,
+    "detection+recognition": ["detection", "recognition"],
+}
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (Linux), falling back to peak RSS."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_configuration(pack, allowed_modules, image_path, det_size, runs, queue):
+    import cv2
+    from insightface.app import FaceAnalysis
+
+    if image_path:
+        image = cv2.imread(image_path)
+    else:
+        from insightface.data import get_image
+        image = get_image("t1")  # Group photo bundled with insightface
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    app = FaceAnalysis(name=pack, allowed_modules=allowed_modules, providers=["CPUExecutionProvider"])
+    app.prepare(ctx_id=0, det_size=(det_size, det_size))
+    load_s = time.perf_counter() - started
+
+    # Warm-up call is excluded from latency numbers
+    faces = app.get(image)
+
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        app.get(image)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    queue.put({
+        "modules": sorted(app.models.keys()),
+        "faces": len(faces),
+        "load_s": load_s,
+        "rss_mb": _rss_mb() - rss_before,
+        "median_ms": statistics.median(latencies),
+        "p95_ms": latencies[max(int(len(latencies) * 0.95) - 1, 0)],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark InsightFace module configurations")
+    parser.add_argument("--pack", default="buffalo_l")
+    parser.add_argument("--image", default=None, help="Image with faces (defaults to insightface sample)")
+    parser.add_argument("--det-size", type=int, default=640)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"Pack: {args.pack}, det_size: {args.det_size}, runs: {args.runs}\n")
+    print(f"{'configuration':<24}{'faces':>6}{'load s':>9}{'RSS MB':>9}{'median ms':>11}{'p95 ms':>9}")
+
+    for name, allowed_modules in CONFIGURATIONS.items():
+        queue = context.Queue()
+        process = context.Process(
+            target=_run_configuration,
+            args=(args.pack, allowed_modules, args.image, args.det_size, args.runs, queue),
+        )
+        process.start()
+        result = queue.get()
+        process.join()
+
+        print(
+            f"{name:<24}{result['faces']:>6}{result['load_s']:>9.2f}{result['rss_mb']:>9.0f}"
+            f"{result['median_ms']:>11.1f}{result['p95_ms']:>9.1f}"
+            f"   ({', '.join(result['modules'])})"
+        )
+
+
+if __name__ == "__main__":
+    main()
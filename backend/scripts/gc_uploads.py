@@ -0,0 +1,57 @@
+"""
+Drishti AI - Upload Garbage Collection
+
+Deletes content-addressed upload blobs (/uploads/blobs) that no alert,
+known person or unexpired audit frame references any more, plus abandoned
+staging files. Files younger than the grace period are kept; audit frame
+records past ANALYZE_FRAME_RETENTION_DAYS are deleted. Legacy flat files in /uploads are
+never touched.
+
+Usage (from the backend directory):
+    python -m scripts.gc_uploads [--grace-seconds N] [--dry-run]
+"""
+
+import argparse
+import asyncio
+
+from app.database import close_db, init_db, is_database_available
+from app.services.blob_store import collect_garbage
+
+
+async def run(grace_seconds, dry_run: bool) -> None:
+    await init_db()
+    if not is_database_available():
+        # Without references every blob would look unreferenced
+        print("MongoDB unavailable; not collecting")
+        return
+
+    try:
+        stats = await collect_garbage(dry_run=dry_run, grace_seconds=grace_seconds)
+    finally:
+        await close_db()
+
+    action = "Would delete" if dry_run else "Deleted"
+    print(
+        f"Scanned {stats['scanned']} blobs ({stats['referenced']} referenced). "
+        f"{action} {stats['deleted']} blobs, {stats['freedBytes'] / 1024:.0f} KB; "
+        f"kept {stats['recent']} recent unreferenced blobs"
+    )
+    if not dry_run:
+        print(
+            f"Removed {stats['stagingRemoved']} abandoned staging files and "
+            f"{stats['auditFramesExpired']} expired audit frame records"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete unreferenced upload blobs")
+    parser.add_argument("--grace-seconds", type=float, default=None,
+                        help="Keep files younger than this (default: UPLOAD_GC_GRACE_SECONDS)")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.grace_seconds, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Drishti AI - Face Embedding Migration
+
+Converts KnownPerson.face_embeddings stored as BSON arrays of doubles into
+packed little-endian binary (see app.models.known_person.pack_embedding),
+and backfills the stored embedding_count that list endpoints project.
+
+Usage (from the backend directory):
+    python -m scripts.migrate_face_embeddings [--dtype float32|float16] [--dry-run]
+"""
+
+import argparse
+
+from bson.binary import Binary
+from pymongo import MongoClient, UpdateOne
+
+from app.config import get_settings
+from app.database import _resolve_db_name
+from app.models.known_person import EMBEDDING_DTYPES, pack_embedding
+
+
+def migrate(dtype: str, batch_size: int, dry_run: bool) -> None:
+    settings = get_settings()
+    client = MongoClient(settings.mongo_uri, tlsAllowInvalidCertificates=True)
+    db = client[_resolve_db_name(settings.mongo_uri, settings.mongo_db_name)]
+    collection = db["known_persons"]
+
+    # Documents whose first embedding is still a float array, or that
+    # predate the stored embedding_count
+    query = {"$or": [
+        {"face_embeddings.0": {"$type": "array"}},
+        {"embedding_count": {"$exists": False}},
+    ]}
+    total = collection.count_documents(query)
+    print(f"Found {total} known persons to migrate")
+
+    migrated = 0
+    converted = 0
+    bytes_before = 0
+    bytes_after = 0
+    operations = []
+
+    for doc in collection.find(query, {"face_embeddings": 1}):
+        embeddings = doc.get("face_embeddings") or []
+        update = {"embedding_count": len(embeddings)}
+
+        if embeddings and isinstance(embeddings[0], list):
+            packed = [pack_embedding(e, dtype) for e in embeddings]
+            # 8 bytes per double plus ~8 bytes of BSON type/key overhead per element
+            bytes_before += sum(len(e) * 16 for e in embeddings)
+            bytes_after += sum(len(p) for p in packed)
+            update["face_embeddings"] = [Binary(p) for p in packed]
+            update["embedding_dtype"] = dtype
+            converted += 1
+
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        migrated += 1
+
+        if len(operations) >= batch_size:
+            if not dry_run:
+                collection.bulk_write(operations, ordered=False)
+            operations = []
+            print(f"  {migrated}/{total}")
+
+    if operations and not dry_run:
+        collection.bulk_write(operations, ordered=False)
+
+    action = "Would convert" if dry_run else "Converted"
+    print(
+        f"{action} {converted} documents: ~{bytes_before / 1024:.0f} KB -> "
+        f"{bytes_after / 1024:.0f} KB of embedding data; "
+        f"embedding_count set on {migrated} documents"
+    )
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack face embeddings into binary storage and backfill embedding_count")
+    parser.add_argument("--dtype", choices=sorted(EMBEDDING_DTYPES), default="float32")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    migrate(args.dtype, args.batch_size, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
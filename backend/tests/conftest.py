@@ -0,0 +1,75 @@
+"""
+Drishti AI - Test Fixtures
+
+Shared pytest fixtures. MongoDB is replaced by mongomock-motor, so the
+suite needs no running database.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.config import get_settings
+from app.models.alert import Alert
+from app.models.audit_frame import AuditFrame
+from app.models.known_person import KnownPerson
+from app.models.user import User
+
+
+@pytest.fixture
+def uploads_dir(tmp_path, monkeypatch):
+    """Point the upload and blob stores at a temporary directory."""
+    from app.services import blob_store, upload_storage
+
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    monkeypatch.setattr(upload_storage, "UPLOADS_DIR", str(uploads))
+    monkeypatch.setattr(upload_storage, "STAGING_DIR", str(tmp_path / ".upload-staging"))
+    monkeypatch.setattr(blob_store, "UPLOADS_DIR", str(uploads))
+    monkeypatch.setattr(blob_store, "BLOBS_DIR", str(uploads / "blobs"))
+    return uploads
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """Application settings; attributes set through monkeypatch are restored after the test."""
+    return get_settings()
+
+
+@pytest.fixture
+def db():
+    """
+    Beanie initialized on a fresh in-memory database.
+
+    A plain fixture because async fixtures fail with the pinned pytest 8.3 /
+    pytest-asyncio 0.23.0; mongomock-motor is not bound to an event loop,
+    so the database is usable from the test's own loop.
+    """
+    client = AsyncMongoMockClient()
+    database = client["drishti_test"]
+    asyncio.run(init_beanie(database=database, document_models=[Alert, AuditFrame, KnownPerson, User]))
+    return database
+
+
+@pytest.fixture
+def user(db):
+    """A saved user that get_current_user returns for every request."""
+    from app.main import app
+    from app.middleware.auth import get_current_user
+
+    current = User(email="user@example.com", name="Test User")
+    asyncio.run(current.insert())
+    app.dependency_overrides[get_current_user] = lambda: current
+    yield current
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def api():
+    """HTTP client calling the app in-process (the lifespan, and so MongoDB, is not started)."""
+    from app.main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
@@ -0,0 +1,92 @@
+"""
+Drishti AI - Audit Frame Retention Tests
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.audit_frame import AuditFrame
+from app.routers import model as model_router
+from app.services.blob_store import collect_garbage, store_bytes, wait_for_pending_writes
+
+
+def _age(uploads_dir, path: str, seconds: float) -> None:
+    filepath = os.path.join(uploads_dir, path[len("/uploads/"):])
+    past = datetime.now().timestamp() - seconds
+    os.utime(filepath, (past, past))
+
+
+def _exists(uploads_dir, path: str) -> bool:
+    return os.path.exists(os.path.join(uploads_dir, path[len("/uploads/"):]))
+
+
+@pytest.mark.asyncio
+async def test_gc_keeps_audit_frames_until_retention_ends(db, uploads_dir, settings, monkeypatch):
+    monkeypatch.setattr(settings, "analyze_frame_retention_days", 30)
+
+    kept = await store_bytes(b"kept frame", "jpeg")
+    expired = await store_bytes(b"expired frame", "jpeg")
+    orphan = await store_bytes(b"orphan frame", "jpeg")
+    await AuditFrame(image_ref=kept, reason="sample").insert()
+    await AuditFrame(
+        image_ref=expired, reason="always", created_at=datetime.utcnow() - timedelta(days=31)
+    ).insert()
+    for path in (kept, expired, orphan):
+        _age(uploads_dir, path, 7200)
+
+    stats = await collect_garbage(grace_seconds=3600)
+
+    assert stats["deleted"] == 2 and stats["auditFramesExpired"] == 1
+    assert _exists(uploads_dir, kept)
+    assert not _exists(uploads_dir, expired) and not _exists(uploads_dir, orphan)
+    assert [frame.image_ref for frame in await AuditFrame.find_all().to_list()] == [kept]
+
+
+@pytest.mark.asyncio
+async def test_gc_keeps_audit_frames_by_default(db, uploads_dir):
+    old = await store_bytes(b"old frame", "jpeg")
+    await AuditFrame(
+        image_ref=old, reason="always", created_at=datetime.utcnow() - timedelta(days=365)
+    ).insert()
+    _age(uploads_dir, old, 7200)
+
+    stats = await collect_garbage(grace_seconds=3600)
+
+    assert stats["deleted"] == 0 and stats["auditFramesExpired"] == 0
+    assert _exists(uploads_dir, old)
+
+
+@pytest.mark.asyncio
+async def test_frame_is_saved_without_database(db, uploads_dir, monkeypatch):
+    monkeypatch.setattr(model_router, "is_database_available", lambda: False)
+
+    saved = await model_router._save_audit_frame(b"frame bytes", "image/jpeg", "always", None, None)
+    await wait_for_pending_writes()
+    _age(uploads_dir, saved, 7200)
+    await collect_garbage(grace_seconds=3600)
+
+    assert saved.startswith("/uploads/frames/")
+    assert _exists(uploads_dir, saved)
+    assert await AuditFrame.find_all().to_list() == []
+
+
+@pytest.mark.asyncio
+async def test_sampled_frame_is_recorded(db, uploads_dir, settings, monkeypatch):
+    monkeypatch.setattr(settings, "analyze_frame_persistence", "alert")
+    monkeypatch.setattr(settings, "analyze_frame_sample_rate", 1.0)
+    monkeypatch.setattr(model_router, "is_database_available", lambda: True)
+
+    response = await model_router._finish_analysis(
+        {"success": True, "response": "A quiet room with a table.", "model": "test"},
+        b"frame bytes", "image/jpeg", "session-1", None, None
+    )
+    await wait_for_pending_writes()
+
+    frames = await AuditFrame.find_all().to_list()
+    assert response["savedImageUrl"] is not None
+    assert len(frames) == 1
+    assert frames[0].image_ref == response["savedImageUrl"]
+    assert frames[0].reason == "sample" and frames[0].session_id == "session-1"
+    assert _exists(uploads_dir, response["savedImageUrl"])
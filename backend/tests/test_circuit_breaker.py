@@ -0,0 +1,146 @@
+"""
+Drishti AI - Circuit Breaker Tests
+"""
+
+import httpx
+import pytest
+
+from app.services import circuit_breaker, gemini_service
+from app.services.circuit_breaker import CircuitBreaker, get_breaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; advance it by adding to clock["now"]."""
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(gemini_service, "_missing_models", {})
+    return clock
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(5):
+        breaker.record_failure("503", 0.1)
+
+
+def test_breaker_opens_at_failure_rate(clock, settings):
+    breaker = CircuitBreaker("test")
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    breaker.record_failure("503", 0.1)
+    breaker.record_failure("503", 0.1)
+    assert breaker.state == circuit_breaker.CLOSED
+
+    breaker.record_failure("503", 0.1)
+
+    assert breaker.state == circuit_breaker.OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["lastError"] == "503"
+
+
+def test_breaker_opens_on_slow_calls(clock, settings):
+    breaker = CircuitBreaker("test")
+    breaker.record_success(0.1)
+    for _ in range(4):
+        breaker.record_success(settings.vision_breaker_slow_call_seconds + 1)
+
+    assert breaker.state == circuit_breaker.OPEN
+
+
+def test_half_open_lets_one_probe_through(clock, settings):
+    breaker = CircuitBreaker("test")
+    _trip(breaker)
+    clock["now"] += settings.vision_breaker_open_seconds
+
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success(0.1)
+
+    assert breaker.state == circuit_breaker.CLOSED
+    assert breaker.allow()
+
+
+def test_unreported_probe_expires_and_release_frees_it(clock, settings):
+    breaker = CircuitBreaker("test")
+    _trip(breaker)
+    clock["now"] += settings.vision_breaker_open_seconds
+    assert breaker.allow()
+
+    clock["now"] += settings.vision_breaker_open_seconds
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.available()
+
+
+def test_failed_probes_double_the_cool_down_up_to_the_cap(clock, settings):
+    breaker = CircuitBreaker("test")
+    _trip(breaker)
+    cool_downs = [breaker.snapshot()["retryInSeconds"]]
+    for _ in range(5):
+        clock["now"] += cool_downs[-1]
+        assert breaker.allow()
+        breaker.record_failure("503", 0.1)
+        cool_downs.append(breaker.snapshot()["retryInSeconds"])
+
+    assert cool_downs == [30.0, 60.0, 120.0, 240.0, 300.0, 300.0]
+
+
+def test_missing_models_are_skipped_until_the_ttl_ends(clock, settings):
+    model = gemini_service._candidate_models()[0]
+
+    gemini_service._mark_missing(model)
+
+    assert model not in gemini_service._usable_models()
+    clock["now"] += settings.gemini_missing_model_ttl_seconds
+    assert model in gemini_service._usable_models()
+
+
+class _FakeClient:
+    def __init__(self, response: httpx.Response):
+        self.response = response
+        self.calls = 0
+
+    async def post(self, *args, **kwargs) -> httpx.Response:
+        self.calls += 1
+        return self.response
+
+
+def _half_open_engine(clock, settings, monkeypatch, response: httpx.Response) -> _FakeClient:
+    monkeypatch.setattr(settings, "gemini_api_key", "test-key")
+    client = _FakeClient(response)
+    monkeypatch.setattr(gemini_service, "get_http_client", lambda name: client)
+    _trip(get_breaker(gemini_service.GEMINI_ENGINE))
+    clock["now"] += settings.vision_breaker_open_seconds
+    return client
+
+
+@pytest.mark.asyncio
+async def test_blocked_request_closes_the_engine_probe(clock, settings, monkeypatch):
+    client = _half_open_engine(
+        clock, settings, monkeypatch,
+        httpx.Response(200, json={"promptFeedback": {"blockReason": "SAFETY"}})
+    )
+
+    result = await gemini_service.analyze_image_with_gemini(b"frame", "Describe")
+
+    assert not result["success"] and "SAFETY" in result["error"]
+    assert client.calls == 1
+    assert get_breaker(gemini_service.GEMINI_ENGINE).state == circuit_breaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_engine_probe_is_released_when_no_model_is_usable(clock, settings, monkeypatch):
+    client = _half_open_engine(clock, settings, monkeypatch, httpx.Response(200, json={}))
+    for model in gemini_service._candidate_models():
+        gemini_service._mark_missing(model)
+
+    result = await gemini_service.analyze_image_with_gemini(b"frame", "Describe")
+
+    assert not result["success"]
+    assert client.calls == 0
+    engine = get_breaker(gemini_service.GEMINI_ENGINE)
+    assert engine.state == circuit_breaker.HALF_OPEN and engine.available()
@@ -0,0 +1,83 @@
+"""
+Drishti AI - Face Match Calibration Tests
+"""
+
+import numpy as np
+import pytest
+
+from app.services.face_gallery import FaceGallery
+
+
+def _at_cosine(cosine: float, dim: int = 8) -> np.ndarray:
+    """Unit vector whose cosine similarity to the first axis is `cosine`."""
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[0] = cosine
+    vector[1] = np.sqrt(1 - cosine ** 2)
+    return vector
+
+
+def _gallery(impostor_cosine: float, genuine=None) -> FaceGallery:
+    base = _at_cosine(1.0)
+    other = _at_cosine(impostor_cosine)
+    return FaceGallery.from_persons([
+        {"id": "a", "name": "a", "face_embeddings": [base, base], "genuine_similarity": genuine},
+        {"id": "b", "name": "b", "face_embeddings": [other, other], "genuine_similarity": genuine},
+    ])
+
+
+@pytest.fixture(autouse=True)
+def bounds(settings, monkeypatch):
+    monkeypatch.setattr(settings, "face_match_min_confidence", 0.65)
+    monkeypatch.setattr(settings, "face_match_max_confidence", 0.8)
+    monkeypatch.setattr(settings, "face_match_margin", 0.03)
+    monkeypatch.setattr(settings, "face_ann_min_rows", 0)
+
+
+def test_single_person_gallery_uses_the_floor():
+    base = _at_cosine(1.0)
+    gallery = FaceGallery.from_persons([{"id": "a", "name": "a", "face_embeddings": [base, base]}])
+    assert gallery.threshold == pytest.approx(0.65)
+
+
+def test_threshold_sits_above_impostor_similarity():
+    # Impostor cosine 0.45 -> confidence 0.725, between floor and ceiling
+    assert _gallery(0.45).threshold == pytest.approx(0.725, abs=1e-4)
+
+
+def test_threshold_moves_halfway_to_genuine_similarity():
+    # Halfway between impostor 0.45 and genuine 0.65 -> cosine 0.55 -> 0.775
+    assert _gallery(0.45, genuine=0.65).threshold == pytest.approx(0.775, abs=1e-4)
+
+
+def test_threshold_is_clipped_to_floor_and_ceiling():
+    assert _gallery(0.0).threshold == pytest.approx(0.65)
+    assert _gallery(0.9).threshold == pytest.approx(0.8)
+    assert _gallery(0.45, genuine=0.95).threshold == pytest.approx(0.8)
+
+
+def test_decide_rejects_a_near_tie_between_two_persons():
+    gallery = _gallery(0.0)
+    a, b = gallery.persons
+
+    tie = gallery.decide([(a, 0.90), (b, 0.88)])
+    assert not tie["identified"] and tie["person"] is None
+    assert tie["margin"] == pytest.approx(0.02)
+
+    clear = gallery.decide([(a, 0.90), (b, 0.70)])
+    assert clear["identified"] and clear["person"] is a
+
+
+def test_decide_applies_threshold_and_override():
+    gallery = _gallery(0.0)
+    a = gallery.persons[0]
+
+    assert not gallery.decide([(a, 0.60)])["identified"]
+    assert gallery.decide([(a, 0.60)], threshold=0.55)["identified"]
+    assert gallery.decide([])["identified"] is False
+
+
+def test_search_returns_top_k_distinct_persons():
+    gallery = _gallery(0.0)
+    candidates = gallery.search_many([_at_cosine(0.99)], k=2)[0]
+    assert [person["id"] for person, _ in candidates] == ["a", "b"]
+    assert candidates[0][1] > candidates[1][1]
@@ -0,0 +1,108 @@
+"""
+Drishti AI - Face Gallery Tests
+"""
+
+import numpy as np
+import pytest
+
+from app.models.known_person import KnownPerson
+from app.services import face_gallery
+from app.services.face_gallery import FaceGallery, get_user_gallery, invalidate_user_gallery, update_cached_gallery
+
+
+def _cluster(center: int, count: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    """Embeddings scattered tightly around one axis."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(scale=0.05, size=(count, dim)).astype(np.float32)
+    vectors[:, center] += 1.0
+    return vectors
+
+
+def _person(person_id: str, embeddings: np.ndarray) -> dict:
+    return {"id": person_id, "name": person_id, "relationship": "friend", "face_embeddings": embeddings}
+
+
+def test_match_when_probed_ivf_list_is_empty(settings, monkeypatch):
+    monkeypatch.setattr(settings, "face_ann_min_rows", 4)
+    monkeypatch.setattr(settings, "face_ann_n_probe", 1)
+    gallery = FaceGallery.from_persons([
+        _person("a", _cluster(0, 4, seed=1)),
+        _person("b", _cluster(1, 4, seed=2)),
+    ])
+    assert gallery.index is not None
+
+    # Removing "a" empties the cluster closest to a query near its photos
+    gallery.set_person_rows({"id": "a", "name": "a"}, [])
+    query = _cluster(0, 1, seed=3)[0]
+    assert len(gallery.index.candidates(query / np.linalg.norm(query), 1)) == 0
+
+    person, confidence = gallery.match(query)
+    assert person["id"] == "b"
+    assert 0.0 <= confidence < 0.8
+    assert gallery.search_many([query], k=2)[0][0][0]["id"] == "b"
+
+
+def test_with_person_rows_leaves_original_untouched(settings, monkeypatch):
+    monkeypatch.setattr(settings, "face_ann_min_rows", 4)
+    gallery = FaceGallery.from_persons([
+        _person("a", _cluster(0, 4, seed=1)),
+        _person("b", _cluster(1, 4, seed=2)),
+    ])
+    lists_before = [rows.copy() for rows in gallery.index.lists]
+
+    updated = gallery.with_person_rows({"id": "c", "name": "c"}, _cluster(2, 3, seed=4))
+
+    assert len(gallery) == 8 and len(gallery.persons) == 2
+    assert all(np.array_equal(a, b) for a, b in zip(gallery.index.lists, lists_before))
+    assert len(updated) == 11
+    assert updated.match(_cluster(2, 1, seed=5)[0])[0]["id"] == "c"
+    assert gallery.match(_cluster(2, 1, seed=5)[0])[0]["id"] != "c"
+
+
+@pytest.mark.asyncio
+async def test_update_cached_gallery_swaps_in_updated_copy(db, settings, monkeypatch):
+    monkeypatch.setattr(settings, "face_match_mode", "embeddings")
+    invalidate_user_gallery("u1")
+
+    first = KnownPerson(name="a", relationship="friend", added_by="u1", for_user="u1")
+    for embedding in _cluster(0, 3, seed=1):
+        first.add_face_embedding(embedding)
+    await first.insert()
+    cached = await get_user_gallery("u1")
+
+    second = KnownPerson(name="b", relationship="friend", added_by="u1", for_user="u1")
+    for embedding in _cluster(1, 3, seed=2):
+        second.add_face_embedding(embedding)
+    await second.insert()
+    await update_cached_gallery("u1", second)
+    updated = await get_user_gallery("u1")
+
+    assert updated is not cached
+    assert len(cached.persons) == 1
+    assert updated.match(_cluster(1, 1, seed=3)[0])[0]["id"] == str(second.id)
+
+
+@pytest.mark.asyncio
+async def test_gallery_versions_do_not_grow_with_users(db, settings, monkeypatch):
+    monkeypatch.setattr(settings, "face_gallery_cache_size", 2)
+    for n in range(5):
+        await get_user_gallery(f"user-{n}")
+        invalidate_user_gallery(f"user-{n}")
+
+    assert face_gallery._gallery_versions == {}
+    assert face_gallery._gallery_loads == {}
+
+
+@pytest.mark.asyncio
+async def test_gallery_load_that_raced_a_write_is_not_cached(db, monkeypatch):
+    real_run_inference = face_gallery.run_inference
+
+    async def run_inference_during_write(func, *args, **kwargs):
+        invalidate_user_gallery("racer")
+        return await real_run_inference(func, *args, **kwargs)
+
+    monkeypatch.setattr(face_gallery, "run_inference", run_inference_during_write)
+    await get_user_gallery("racer")
+
+    assert "racer" not in face_gallery._gallery_cache
+    assert face_gallery._gallery_versions == {}
@@ -0,0 +1,109 @@
+"""
+Drishti AI - Face Tracking Tests
+"""
+
+import numpy as np
+import pytest
+
+from app.services import face_tracking
+from app.services.face_tracking import FaceTrackCache, bbox_iou
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(face_tracking.time, "monotonic", fake)
+    return fake
+
+
+def _embedding(axis: int, dim: int = 8) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[axis] = 1.0
+    return vector
+
+
+ASHA = [({"id": "asha"}, 0.9)]
+RAVI = [({"id": "ravi"}, 0.8)]
+
+
+def test_bbox_iou():
+    assert bbox_iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1.0
+    assert bbox_iou([0, 0, 10, 10], [20, 20, 30, 30]) == 0.0
+    assert bbox_iou([0, 0, 10, 10], [5, 0, 15, 10]) == pytest.approx(1 / 3)
+
+
+def test_associate_matches_overlapping_detections_one_to_one(clock):
+    cache = FaceTrackCache()
+    left = cache.record("s1", None, [0, 0, 10, 10], _embedding(0), ASHA)
+    right = cache.record("s1", None, [50, 0, 60, 10], _embedding(1), RAVI)
+
+    matched = cache.associate("s1", [[51, 0, 61, 10], [1, 0, 11, 10], [200, 200, 210, 210]])
+
+    assert matched == [right, left, None]
+    # Another session never sees these tracks
+    assert cache.associate("s2", [[1, 0, 11, 10]]) == [None]
+
+
+def test_track_serves_identity_until_refresh_is_due(clock, settings, monkeypatch):
+    monkeypatch.setattr(settings, "face_track_refresh_frames", 3)
+    cache = FaceTrackCache()
+    track = cache.record("s1", None, [0, 0, 10, 10], _embedding(0), ASHA)
+
+    for _ in range(2):
+        (matched,) = cache.associate("s1", [[1, 0, 11, 10]])
+        assert matched is track and not track.needs_recognition()
+        cache.touch(track, [1, 0, 11, 10])
+    cache.touch(track, [1, 0, 11, 10])
+    assert track.needs_recognition()
+
+    clock.now += 0.1
+    cache.record("s1", track, [1, 0, 11, 10], _embedding(0), ASHA)
+    assert track.frames_since_recognition == 0 and not track.needs_recognition()
+    clock.now += settings.face_track_refresh_seconds
+    assert track.needs_recognition()
+
+
+def test_refresh_with_different_embedding_starts_a_new_track(clock):
+    cache = FaceTrackCache()
+    track = cache.record("s1", None, [0, 0, 10, 10], _embedding(0), ASHA)
+
+    # Same place, different face: the old identity must not stick
+    replaced = cache.record("s1", track, [0, 0, 10, 10], _embedding(1), RAVI)
+
+    assert replaced is not track and replaced.candidates == RAVI
+    assert cache.associate("s1", [[0, 0, 10, 10]]) == [replaced]
+
+
+def test_fast_moving_face_continues_its_track_by_embedding(clock):
+    cache = FaceTrackCache()
+    track = cache.record("s1", None, [0, 0, 10, 10], _embedding(0), ASHA)
+
+    (matched,) = cache.associate("s1", [[100, 0, 110, 10]])
+    assert matched is None
+    assert cache.record("s1", None, [100, 0, 110, 10], _embedding(0), ASHA) is track
+
+
+def test_tracks_expire_after_ttl(clock, settings):
+    cache = FaceTrackCache()
+    cache.record("s1", None, [0, 0, 10, 10], _embedding(0), ASHA)
+
+    clock.now += settings.face_track_ttl_seconds
+    assert cache.associate("s1", [[0, 0, 10, 10]]) == [None]
+
+
+def test_sessions_are_bounded(clock, settings, monkeypatch):
+    monkeypatch.setattr(settings, "face_track_max_sessions", 2)
+    cache = FaceTrackCache()
+    for session in ("s1", "s2", "s3"):
+        cache.record(session, None, [0, 0, 10, 10], _embedding(0), ASHA)
+
+    assert cache.associate("s1", [[0, 0, 10, 10]]) == [None]
+    assert cache.associate("s3", [[0, 0, 10, 10]])[0] is not None
@@ -0,0 +1,39 @@
+"""
+Drishti AI - Known Person Model Tests
+"""
+
+import numpy as np
+import pytest
+
+from app.models.known_person import KnownPerson
+
+
+def _person(**fields) -> KnownPerson:
+    return KnownPerson(name="Asha", relationship="friend", added_by="u1", for_user="u1", **fields)
+
+
+@pytest.mark.asyncio
+async def test_new_person_uses_configured_dtype(db, settings, monkeypatch):
+    monkeypatch.setattr(settings, "face_embedding_dtype", "float16")
+
+    # Create routes build an empty person, then add embeddings one by one
+    person = _person()
+    person.add_face_embedding(np.full(512, 0.1))
+    await person.insert()
+
+    stored = await KnownPerson.get(person.id)
+    assert stored.embedding_dtype == "float16"
+    assert len(stored.face_embeddings[0]) == 512 * 2
+    np.testing.assert_allclose(stored.embedding_matrix()[0], 0.1, atol=1e-3)
+
+
+@pytest.mark.asyncio
+async def test_existing_person_keeps_its_dtype(db, settings, monkeypatch):
+    person = _person(face_embeddings=[[0.1] * 512], embedding_dtype="float32")
+    await person.insert()
+    monkeypatch.setattr(settings, "face_embedding_dtype", "float16")
+
+    stored = await KnownPerson.get(person.id)
+    stored.add_face_embedding(np.full(512, 0.2))
+    assert stored.embedding_dtype == "float32"
+    assert [len(e) for e in stored.face_embeddings] == [512 * 4, 512 * 4]
@@ -0,0 +1,67 @@
+"""
+Drishti AI - Known Person List Endpoint Tests
+"""
+
+import numpy as np
+import pytest
+
+from app.models.known_person import KnownPerson
+
+
+async def _person(name: str, for_user: str, photos: int = 0) -> KnownPerson:
+    person = KnownPerson(name=name, relationship="friend", added_by=for_user, for_user=for_user)
+    for _ in range(photos):
+        person.add_face_embedding(np.full(512, 0.1))
+    await person.insert()
+    return person
+
+
+@pytest.mark.asyncio
+async def test_list_relatives_reports_embeddings_without_loading_them(user, api):
+    enrolled = await _person("Asha", str(user.id), photos=2)
+    pending = await _person("Ravi", str(user.id))
+    await _person("Someone else's", "other-user", photos=1)
+
+    response = await api.get("/api/known-persons")
+
+    assert response.status_code == 200
+    relatives = {r["id"]: r for r in response.json()}
+    assert set(relatives) == {str(enrolled.id), str(pending.id)}
+    assert relatives[str(enrolled.id)]["has_face_embeddings"] is True
+    assert relatives[str(pending.id)]["has_face_embeddings"] is False
+    assert all("face_embeddings" not in r for r in relatives.values())
+
+
+@pytest.mark.asyncio
+async def test_get_relative_summary(user, api):
+    enrolled = await _person("Asha", str(user.id), photos=1)
+
+    response = await api.get(f"/api/known-persons/{enrolled.id}")
+
+    assert response.status_code == 200
+    assert response.json()["has_face_embeddings"] is True
+
+
+@pytest.mark.asyncio
+async def test_favorites_keep_order_and_report_embeddings(user, api):
+    first = await _person("Asha", str(user.id), photos=1)
+    second = await _person("Ravi", str(user.id))
+    user.favorite_persons = [str(second.id), str(first.id), "not-an-id"]
+    await user.save()
+
+    response = await api.get("/api/favorites")
+
+    assert response.status_code == 200
+    favorites = response.json()["favorites"]
+    assert [f["id"] for f in favorites] == [str(second.id), str(first.id)]
+    assert [f["has_face_embeddings"] for f in favorites] == [False, True]
+
+
+@pytest.mark.asyncio
+async def test_embedding_count_follows_reembedding(db):
+    person = await _person("Asha", "u1", photos=3)
+    person.replace_face_embeddings([np.full(512, 0.2)], [1.0], "buffalo_l")
+    await person.save()
+
+    summary = await KnownPerson.get_summary(str(person.id))
+    assert summary.embedding_count == 1
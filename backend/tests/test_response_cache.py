@@ -0,0 +1,144 @@
+"""
+Drishti AI - Vision Response Cache Tests
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from app.models.user import User
+from app.routers import model as model_router
+from app.services import response_cache as cache_module
+from app.services.response_cache import ResponseCache, _hamming, dhash, normalize_prompt
+
+
+# Frame hashes at least 32 bits apart, so lookups never match a neighbour
+FAR_HASHES = (0, (1 << 32) - 1, (1 << 64) - 1)
+
+
+def _frame(seed: int, noise: int = 0) -> bytes:
+    """A 256x256 JPEG of random 9x8 blocks, optionally with pixel noise."""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (8, 9), dtype=np.uint8)
+    image = cv2.resize(blocks, (288, 256), interpolation=cv2.INTER_NEAREST).astype(np.int16)
+    if noise:
+        image += np.random.default_rng(seed + 1000).integers(-noise, noise + 1, image.shape, dtype=np.int16)
+    ok, encoded = cv2.imencode(".jpg", np.clip(image, 0, 255).astype(np.uint8))
+    assert ok
+    return encoded.tobytes()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock for TTLs; advance it by adding to clock["now"]."""
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: clock["now"])
+    return clock
+
+
+def _result(text: str) -> dict:
+    return {"success": True, "response": text, "model": "test", "prompt_tokens": 100}
+
+
+def test_dhash_tolerates_noise_and_separates_scenes():
+    base = dhash(_frame(1))
+
+    assert _hamming(base, dhash(_frame(1, noise=6))) <= 4
+    assert _hamming(base, dhash(_frame(2))) > 16
+    assert dhash(b"not an image") is None
+
+
+def test_prompts_match_regardless_of_case_spacing_and_punctuation():
+    assert normalize_prompt("  What is\nahead?  ") == normalize_prompt("what is ahead")
+
+
+def test_lookup_uses_the_hamming_tolerance(clock, settings, monkeypatch):
+    monkeypatch.setattr(settings, "response_cache_max_distance", 4)
+    cache = ResponseCache()
+    cache.put("user:a", "Describe", 0b0, _result("A hallway."))
+
+    hit = cache.get("user:a", "describe.", 0b1111)
+
+    assert hit["response"] == "A hallway."
+    assert hit["cached"] and hit["prompt_tokens"] == 0
+    assert cache.get("user:a", "Describe", 0b11111) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_the_ttl(clock, settings):
+    cache = ResponseCache()
+    cache.put("user:a", "Describe", 42, _result("A hallway."))
+
+    clock["now"] += settings.response_cache_ttl_seconds - 1
+    assert cache.get("user:a", "Describe", 42) is not None
+
+    clock["now"] += 1
+    assert cache.get("user:a", "Describe", 42) is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_entry_bound_evicts_least_recently_used(clock, settings, monkeypatch):
+    monkeypatch.setattr(settings, "response_cache_max_entries", 2)
+    cache = ResponseCache()
+    cache.put("user:a", "Describe", FAR_HASHES[0], _result("first"))
+    cache.put("user:a", "Describe", FAR_HASHES[1], _result("second"))
+    cache.get("user:a", "Describe", FAR_HASHES[0])
+
+    cache.put("user:a", "Describe", FAR_HASHES[2], _result("third"))
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("user:a", "Describe", FAR_HASHES[0])["response"] == "first"
+    assert cache.get("user:a", "Describe", FAR_HASHES[1]) is None
+
+
+def test_byte_bound_evicts_oldest_entries(clock, settings, monkeypatch):
+    cache = ResponseCache()
+    cache.put("user:a", "Describe", FAR_HASHES[0], _result("x" * 100))
+    entry_size = cache.stats()["bytes"]
+    monkeypatch.setattr(settings, "response_cache_max_bytes", entry_size * 2)
+
+    cache.put("user:a", "Describe", FAR_HASHES[1], _result("y" * 100))
+    cache.put("user:a", "Describe", FAR_HASHES[2], _result("z" * 100))
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= entry_size * 2
+    assert cache.get("user:a", "Describe", FAR_HASHES[0]) is None
+
+
+def test_cache_scope_is_per_user_then_per_session(db):
+    user = User(email="user@example.com", name="Test User")
+
+    assert model_router._cache_scope(user, "session-1") == f"user:{user.id}"
+    assert model_router._cache_scope(None, "session-1") == "session:session-1"
+    assert model_router._cache_scope(None, None) is None
+
+
+@pytest.mark.asyncio
+async def test_cached_answers_are_never_shared_across_users(db, settings, monkeypatch):
+    monkeypatch.setattr(settings, "analyze_frame_persistence", "alert")
+    monkeypatch.setattr(model_router, "response_cache", ResponseCache())
+    calls = []
+
+    async def route(image, prompt, image_mime):
+        calls.append(prompt)
+        return _result(f"Answer {len(calls)}.")
+
+    monkeypatch.setattr(model_router, "route_vision_analysis", route)
+    alice = await User(email="alice@example.com", name="Alice").insert()
+    bob = await User(email="bob@example.com", name="Bob").insert()
+    frame = _frame(1)
+
+    async def analyze(session_id, user):
+        return await model_router._analyze_image(frame, "Describe", "image/jpeg", session_id, user)
+
+    first = await analyze("shared-session", alice)
+    repeat = await analyze("shared-session", alice)
+    other_user = await analyze("shared-session", bob)
+    anonymous = await analyze("shared-session", None)
+    no_session = await analyze(None, None)
+
+    assert repeat["cached"] and repeat["response"] == first["response"]
+    assert not other_user["cached"] and other_user["response"] != first["response"]
+    assert not anonymous["cached"] and anonymous["response"] not in (first["response"], other_user["response"])
+    assert not no_session["cached"]
+    assert len(calls) == 4
@@ -0,0 +1,66 @@
+"""
+Drishti AI - Upload Storage Tests
+"""
+
+import os
+import time
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+
+from app.services import upload_storage
+from app.services.upload_storage import UploadTooLargeError, clean_staging, read_upload, stage_upload
+
+
+def _upload(size: int) -> UploadFile:
+    return UploadFile(BytesIO(b"x" * size), filename="frame.jpg")
+
+
+@pytest.mark.asyncio
+async def test_read_upload_within_limit():
+    assert await read_upload(_upload(3000), max_size=3000) == b"x" * 3000
+
+
+@pytest.mark.asyncio
+async def test_read_upload_rejects_oversized(monkeypatch):
+    monkeypatch.setattr("app.services.upload_storage.CHUNK_SIZE", 1024)
+    with pytest.raises(UploadTooLargeError, match="3,000 byte limit"):
+        await read_upload(_upload(3001), max_size=3000)
+
+
+def _age(path, seconds: float) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+@pytest.mark.asyncio
+async def test_staged_upload_is_not_under_public_uploads(uploads_dir):
+    staged = await stage_upload(_upload(100))
+
+    assert os.path.commonpath([staged.path, str(uploads_dir)]) != str(uploads_dir)
+    assert os.listdir(uploads_dir) == []
+    assert await staged.commit("frame.jpg") == "/uploads/frame.jpg"
+    assert os.listdir(uploads_dir) == ["frame.jpg"]
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_leaves_nothing_behind(uploads_dir):
+    with pytest.raises(UploadTooLargeError):
+        await stage_upload(_upload(3001), max_size=3000)
+
+    assert upload_storage._staging_files() == []
+    assert os.listdir(uploads_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_clean_staging_removes_only_stale_files(uploads_dir):
+    fresh = await stage_upload(_upload(10))
+    stale = await stage_upload(_upload(10))
+    legacy = uploads_dir / ".staging-0123abcd"
+    legacy.write_bytes(b"partial")
+    _age(stale.path, 7200)
+    _age(legacy, 7200)
+
+    assert await clean_staging(grace_seconds=3600) == 2
+    assert upload_storage._staging_files() == [fresh.path]
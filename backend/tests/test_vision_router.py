@@ -0,0 +1,56 @@
+"""
+Drishti AI - Vision Routing Tests
+"""
+
+import pytest
+
+from app.services import vision_router
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    """Fake Gemini and Ollama; set the results each engine returns on the dict."""
+    results = {"gemini": {"success": True}, "ollama": {"success": True}}
+    calls = []
+
+    async def gemini(image, prompt, image_mime):
+        calls.append("gemini")
+        return dict(results["gemini"])
+
+    async def ollama(image, prompt):
+        calls.append("ollama")
+        return dict(results["ollama"])
+
+    monkeypatch.setattr(vision_router, "analyze_image_with_gemini", gemini)
+    monkeypatch.setattr(vision_router, "analyze_image", ollama)
+    monkeypatch.setattr(vision_router, "gemini_available", lambda: True)
+    monkeypatch.setattr(vision_router, "ollama_available", lambda: True)
+    results["calls"] = calls
+    return results
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("policy", ["sequential", "hedged", "race"])
+async def test_ollama_fallback_wins_when_gemini_fails(engines, settings, monkeypatch, policy):
+    monkeypatch.setattr(settings, "vision_routing_policy", policy)
+    engines["gemini"] = {"success": False, "error": "503 from Gemini"}
+    engines["ollama"] = {"success": True, "response": "A hallway.", "model": "llava"}
+
+    result = await vision_router.route_vision_analysis(b"frame", "Describe", "image/jpeg")
+
+    assert result["success"]
+    assert result["engine"] == "ollama"
+    assert result["description"] == "A hallway."
+    assert sorted(engines["calls"]) == ["gemini", "ollama"]
+
+
+@pytest.mark.asyncio
+async def test_sequential_reports_both_failures(engines, settings, monkeypatch):
+    monkeypatch.setattr(settings, "vision_routing_policy", "sequential")
+    engines["gemini"] = {"success": False, "error": "503 from Gemini"}
+    engines["ollama"] = {"success": False, "error": "connection refused"}
+
+    result = await vision_router.route_vision_analysis(b"frame", "Describe", "image/jpeg")
+
+    assert not result["success"]
+    assert "503 from Gemini" in result["error"] and "connection refused" in result["error"]
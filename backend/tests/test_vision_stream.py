@@ -0,0 +1,92 @@
+"""
+Drishti AI - Streaming Vision Analysis Tests
+"""
+
+import json
+
+import pytest
+
+from app.services import vision_stream
+from app.services.gemini_service import _StreamedStringField
+from app.services.vision_stream import SentenceChunker
+
+
+def _feed_all(field: _StreamedStringField, chunks) -> str:
+    return "".join(field.feed(chunk) for chunk in chunks)
+
+
+def test_streamed_field_decodes_escapes_split_across_chunks():
+    field = _StreamedStringField("description")
+    chunks = ['{"descr', 'iption": "A \\', '"wet floor\\', '" sign, caf\\u0', '0e9 ahead\\', 'n', '", "objects": []}']
+
+    assert _feed_all(field, chunks) == 'A "wet floor" sign, café ahead\n'
+    assert field.complete
+
+
+def test_streamed_field_ignores_text_after_the_value():
+    field = _StreamedStringField("description")
+
+    assert field.feed('{"description": "Done."') == "Done."
+    assert field.feed(', "other": "more"}') == ""
+
+
+def test_chunker_keeps_decimals_and_abbreviations_in_one_sentence():
+    chunker = SentenceChunker()
+
+    sentences = chunker.feed("A chair is 3.5 m ahead, e.g. near the door. Dr. Rao is ")
+    sentences += chunker.feed("waving. ")
+
+    assert sentences == ["A chair is 3.5 m ahead, e.g. near the door.", "Dr. Rao is waving."]
+
+
+def test_chunker_waits_for_whitespace_and_flushes_trailing_text():
+    chunker = SentenceChunker()
+
+    assert chunker.feed("The path is clear.") == []
+    assert chunker.feed(" A door") == ["The path is clear."]
+    assert chunker.flush() == ["A door"]
+    assert chunker.flush() == []
+
+
+def test_chunker_splits_run_on_text_at_a_space():
+    chunker = SentenceChunker(max_chars=20)
+
+    assert chunker.feed("one two three four five six") == ["one two three four"]
+    assert chunker.flush() == ["five six"]
+
+
+def _parse_sse(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_sends_sentences_then_alert_then_final(api, settings, monkeypatch):
+    monkeypatch.setattr(settings, "analyze_frame_persistence", "alert")
+    text = "A hallway with a wall. Watch out, stairs ahead on the left."
+
+    async def engine_stream():
+        for start in range(0, len(text), 7):
+            yield {"type": "text", "text": text[start:start + 7]}
+        yield {"type": "done", "success": True, "response": text, "description": text, "model": "test"}
+
+    monkeypatch.setattr(
+        vision_stream, "_engine_streams", lambda image, prompt, image_mime: [("Test", engine_stream())]
+    )
+
+    response = await api.post(
+        "/api/model/analyze/stream",
+        json={"image": "A" * 64, "prompt": "Describe the scene"}
+    )
+
+    assert response.status_code == 200
+    events = _parse_sse(response.text)
+    assert [event for event, _ in events] == ["sentence", "alert", "sentence", "alert", "final"]
+    assert events[0][1] == {"index": 0, "text": "A hallway with a wall."}
+    assert events[1][1]["severity"] == "medium"
+    assert events[2][1] == {"index": 1, "text": "Watch out, stairs ahead on the left."}
+    assert events[3][1]["severity"] == "high"
+    assert events[4][1]["success"] and events[4][1]["response"] == text